@@ -24,25 +24,29 @@ except ImportError:
     print >> sys.stderr, 'e.g.:    sudo apt-get install python-qt4'
     sys.exit(-1)
 
-
-# Import cola modules
+# Import cola modules.  The views for each sub-command are imported
+# when the sub-command is run.
 import cola
 from cola import cmds
 from cola import git
 from cola import guicmds
 from cola import inotify
 from cola import i18n
+from cola import profiler
 from cola import qtcompat
 from cola import qtutils
 from cola import resources
 from cola import signals
+from cola import tasks
 from cola import utils
 from cola import version
 from cola.decorators import memoize
-from cola.main.view import MainView
-from cola.main.controller import MainController
 from cola.widgets import cfgactions
-from cola.widgets import startup
+
+profiler.milestone('imports')
+
+# How often to check whether startup has finished, in milliseconds
+STARTUP_POLL_INTERVAL = 10
 
 
 def setup_environment():
@@ -225,6 +229,21 @@ def parse_args(context):
                       metavar='PATH',
                       default='')
 
+    # Reports the time spent importing modules and building widgets
+    parser.add_option('--startup-profile',
+                      help='Report where startup time is spent.',
+                      dest='startup_profile',
+                      action='store_true',
+                      default=False)
+
+    # Used by extras/bench_startup.py
+    parser.add_option('--startup-timings',
+                      help=('Write startup milestones to FILE as JSON '
+                            'and exit once startup has finished.'),
+                      dest='startup_timings',
+                      metavar='FILE',
+                      default=None)
+
     if context == 'dag':
         parser.add_option('-c', '--count',
                           help='Number of commits to display.',
@@ -271,13 +290,19 @@ def main(context):
     signal.signal(signal.SIGINT, signal.SIG_DFL)
 
     # Initialize the app
+    profiler.begin('ColaApplication')
     app = ColaApplication(sys.argv)
+    profiler.end('ColaApplication')
+    profiler.milestone('application')
 
     # Ensure that we're working in a valid git repository.
     # If not, try to find one.  When found, chdir there.
     model = cola.model()
+    profiler.begin('set_worktree')
     valid = model.set_worktree(repo) and not opts.prompt
+    profiler.end('set_worktree')
     while not valid:
+        from cola.widgets import startup
         startup_dlg = startup.StartupDialog(app.activeWindow())
         gitdir = startup_dlg.find_git_repo()
         if not gitdir:
@@ -286,8 +311,10 @@ def main(context):
 
     # Finally, go to the root of the git repo
     os.chdir(model.git.worktree())
+    profiler.milestone('worktree')
 
     # Show the GUI
+    profiler.begin('view: ' + context)
     if context == 'archive':
         from cola.widgets.archive import GitArchiveDialog
         model.update_status()
@@ -337,19 +364,28 @@ def main(context):
         from cola.widgets.createtag import create_tag
         view = create_tag()
     else:
+        from cola.main.view import MainView
+        from cola.main.controller import MainController
         view = MainView(model, qtutils.active_window())
         ctl = MainController(model, view)
+    profiler.end('view: ' + context)
 
     # Install UI wrappers for command objects
     cfgactions.install_command_wrapper()
     guicmds.install_command_wrapper()
 
     # Make sure that we start out on top
+    profiler.begin('show')
+    view.installEventFilter(FirstPaintFilter(view))
     view.show()
     view.raise_()
+    profiler.end('show')
+    profiler.milestone('view')
 
     # Scan for the first time
     task = _start_update_thread(model)
+    guicmds.update_path_index()
+    guicmds.update_search_index()
 
     # Start the inotify thread
     inotify.start()
@@ -359,6 +395,9 @@ def main(context):
     msg_timer.connect(msg_timer, SIGNAL('timeout()'), _send_msg)
     msg_timer.start(0)
 
+    if opts.startup_profile or opts.startup_timings:
+        startup_timer = _watch_startup(opts)
+
     # Start the event loop
     result = app.exec_()
 
@@ -380,15 +419,44 @@ def _start_update_thread(model):
     git-cola should startup as quickly as possible.
 
     """
-    class UpdateTask(QtCore.QRunnable):
-        def run(self):
-            model.update_status(update_index=True)
-
-    # Hold onto a reference to prevent PyQt from dereferencing
-    task = UpdateTask()
-    QtCore.QThreadPool.globalInstance().start(task)
-
-    return task
+    task = tasks.FunctionTask(_update_status, model)
+    return tasks.submit(task, queue=tasks.STATUS, key='update_status')
+
+
+def _update_status(model):
+    profiler.milestone('refresh_started')
+    model.update_status(update_index=True)
+    profiler.milestone('refresh_finished')
+
+
+def _watch_startup(opts):
+    """Report on startup once the view is painted and populated"""
+    timer = QtCore.QTimer()
+
+    def check():
+        if not (profiler.reached('refresh_finished') and
+                profiler.reached('first_paint')):
+            return
+        timer.stop()
+        if opts.startup_profile:
+            profiler.report()
+            profiler.disable()
+        if opts.startup_timings:
+            profiler.write_milestones(opts.startup_timings)
+            QtCore.QCoreApplication.instance().quit()
+
+    timer.connect(timer, SIGNAL('timeout()'), check)
+    timer.start(STARTUP_POLL_INTERVAL)
+    return timer
+
+
+class FirstPaintFilter(QtCore.QObject):
+    """Records the first_paint milestone when a widget is first painted"""
+    def eventFilter(self, obj, event):
+        if event.type() == QtCore.QEvent.Paint:
+            profiler.milestone('first_paint')
+            obj.removeEventFilter(self)
+        return False
 
 
 def _send_msg():
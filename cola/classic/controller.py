@@ -11,8 +11,6 @@ from cola import signals
 from cola.widgets.selectcommits import select_commits
 from cola.classic.view import Browser
 from cola.classic.model import GitRepoModel
-from cola.classic.model import GitRepoEntryManager
-from cola.compat import set
 
 
 def widget(parent, update=True):
@@ -35,11 +33,8 @@ class ClassicController(QtCore.QObject):
         QtCore.QObject.__init__(self, view)
         self.model = cola.model()
         self.view = view
-        self.updated = set()
         self.connect(view, SIGNAL('history(QStringList)'),
                      self.view_history)
-        self.connect(view, SIGNAL('expanded(QModelIndex)'),
-                     self.query_model)
         self.connect(view, SIGNAL('difftool_predecessor'),
                      self.difftool_predecessor)
 
@@ -48,19 +43,6 @@ class ClassicController(QtCore.QObject):
         entries = map(unicode, entries)
         cola.notifier().broadcast(signals.visualize_paths, entries)
 
-    def query_model(self, model_index):
-        """Update information about a directory as it is expanded."""
-        item = self.view.item_from_index(model_index)
-        path = item.path
-        if path in self.updated:
-            return
-        self.updated.add(path)
-        GitRepoEntryManager.entry(path).update()
-        entry = GitRepoEntryManager.entry
-        for row in xrange(item.rowCount()):
-            path = item.child(row, 0).path
-            entry(path).update()
-
     def difftool_predecessor(self, paths):
         """Prompt for an older commit and launch difftool against it."""
         args = ['--'] + paths
@@ -1,5 +1,7 @@
 import os
+import threading
 import time
+import weakref
 
 from PyQt4 import QtCore
 from PyQt4 import QtGui
@@ -11,9 +13,12 @@ from cola import gitcfg
 from cola import core
 from cola import utils
 from cola import qtutils
-from cola import version
+from cola import tasks
 from cola import resources
+from cola import signals
 from cola.compat import set
+from cola.models import lastmodified
+from cola.models import statusindex
 
 
 # Custom event type for GitRepoInfoEvents
@@ -31,37 +36,55 @@ class Columns(object):
 
 
 class GitRepoModel(QtGui.QStandardItemModel):
-    """Provides an interface into a git repository for browsing purposes."""
+    """Provides an interface into a git repository for browsing purposes.
+
+    Directories are populated when they are first expanded.  The paths
+    are kept in an in-memory trie so that model items are only created
+    for entries that can be seen.
+
+    """
     def __init__(self, parent):
         QtGui.QStandardItemModel.__init__(self, parent)
         self._interesting_paths = self._get_paths()
         self._known_paths = set()
+        self._dirs = set()
+        self._subdirs = {}
+        self._files = {}
+        self._populated = set()
+        # Keeps the shared entries used by this model's rows alive
+        self._entries = {}
+
+        # Pending lookups are cancelled when the view is torn down
+        owner = self._task_owner = object()
+        self.connect(parent, SIGNAL('destroyed()'),
+                     lambda: tasks.cancel(owner=owner))
+        # Entries from a previous repository are not looked up again
+        GitRepoEntryManager.watch_repo()
 
         self.connect(self, SIGNAL('updated'), self._updated_callback)
         model = cola.model()
         model.add_observer(model.message_updated, self._model_updated)
-        self._dir_rows = {}
         self.setColumnCount(len(Columns.ALL))
         for idx, header in enumerate(Columns.ALL):
             self.setHeaderData(idx, Qt.Horizontal,
                                QtCore.QVariant(self.tr(header.title())))
 
-        self._direntries = {'': self.invisibleRootItem()}
         self._initialize()
 
     def _create_column(self, col, path):
         """Creates a StandardItem for use in a treeview cell."""
         # GitRepoNameItem is the only one that returns a custom type(),
         # so we use to infer selections.
+        entry = self.entry(path)
         if col == Columns.NAME:
-            return GitRepoNameItem(path)
-        return GitRepoItem(col, path)
+            return GitRepoNameItem(path, entry)
+        return GitRepoItem(col, entry)
 
     def _create_row(self, path):
         """Return a list of items representing a row."""
         return [self._create_column(c, path) for c in Columns.ALL]
 
-    def _add_file(self, parent, path, insert=False):
+    def _add_file(self, parent, path):
         """Add a file entry to the model."""
 
         # Create model items
@@ -70,26 +93,7 @@ class GitRepoModel(QtGui.QStandardItemModel):
         # Use a standard file icon for the name field
         row_items[0].setIcon(qtutils.file_icon())
 
-        if not insert:
-            # Add file paths at the end of the list
-            parent.appendRow(row_items)
-            self.entry(path).update_name()
-            self._known_paths.add(path)
-            return
-        # Entries exist so try to find an a good insertion point
-        done = False
-        for idx in xrange(parent.rowCount()):
-            child = parent.child(idx, 0)
-            if child.rowCount() > 0:
-                continue
-            if path < child.path:
-                parent.insertRow(idx, row_items)
-                done = True
-                break
-
-        # No adequate place found so simply append
-        if not done:
-            parent.appendRow(row_items)
+        parent.appendRow(row_items)
         self.entry(path).update_name()
         self._known_paths.add(path)
 
@@ -102,10 +106,7 @@ class GitRepoModel(QtGui.QStandardItemModel):
         # Use a standard directory icon
         row_items[0].setIcon(qtutils.dir_icon())
 
-        # Insert directories before file paths
-        row = self._dir_rows.setdefault(parent, 0)
-        parent.insertRow(row, row_items)
-        self._dir_rows[parent] += 1
+        parent.appendRow(row_items)
 
         # Update the 'name' column for this entry
         self.entry(path).update_name()
@@ -119,9 +120,7 @@ class GitRepoModel(QtGui.QStandardItemModel):
 
     def _get_paths(self):
         """Return paths of interest; e.g. paths with a status."""
-        model = cola.model()
-        paths = set(model.staged + model.unstaged)
-        return cola.utils.add_parents(paths)
+        return cola.model().status_index.paths(statusindex.CHANGED)
 
     def _model_updated(self):
         """Observes model changes and updates paths accordingly."""
@@ -130,106 +129,137 @@ class GitRepoModel(QtGui.QStandardItemModel):
     def _updated_callback(self):
         old_paths = self._interesting_paths
         new_paths = self._get_paths()
-        for path in new_paths.union(old_paths):
-            if path not in self._known_paths:
-                continue
-            self.entry(path).update()
+        paths = [path for path in new_paths.union(old_paths)
+                 if path in self._known_paths]
+        # A newer refresh supersedes a pending one
+        GitRepoEntryManager.update(paths,
+                                   key=(self._task_owner, 'refresh'),
+                                   owner=self._task_owner)
 
         self._interesting_paths = new_paths
 
     def _initialize(self):
-        """Iterate over the cola model and create GitRepoItems."""
+        """Index the cola model's paths and populate the top level."""
+        dirs = self._dirs
+        subdirs = self._subdirs
+        files = self._files
         for path in cola.model().everything():
-            self.add_file(path)
-
-    def add_file(self, path, insert=False):
-        """Add a file to the model."""
-        dirname = utils.dirname(path)
-        if dirname in self._direntries:
-            parent = self._direntries[dirname]
-        else:
-            parent = self._create_dir_entry(dirname, self._direntries)
-            self._direntries[dirname] = parent
-        self._add_file(parent, path, insert=insert)
-
-    def _create_dir_entry(self, dirname, direntries):
-        """
-        Create a directory entry for the model.
+            dirname = utils.dirname(path)
+            files.setdefault(dirname, []).append(path)
+            # Register new directories with their parent directories
+            while dirname and dirname not in dirs:
+                dirs.add(dirname)
+                parent = utils.dirname(dirname)
+                subdirs.setdefault(parent, []).append(dirname)
+                dirname = parent
+        self._populate(self.invisibleRootItem(), '')
+
+    def _populate(self, parent, dirname):
+        """Create rows for a directory's entries, directories first."""
+        self._populated.add(dirname)
+        paths = sorted(self._subdirs.get(dirname, ()))
+        for path in paths:
+            self.add_directory(parent, path)
+        files = self._files.get(dirname, ())
+        for path in files:
+            self._add_file(parent, path)
+        # Calculate info for the new, visible entries in a single batch
+        GitRepoEntryManager.update(paths + list(files),
+                                   priority=tasks.PRIORITY_VISIBLE,
+                                   owner=self._task_owner)
+
+    def _unpopulated_dir(self, index):
+        """Return the path for an index's unpopulated directory, or None"""
+        if not index.isValid() or index.column() != 0:
+            return None
+        item = self.itemFromIndex(index)
+        if item is None:
+            return None
+        path = item.path
+        if path in self._dirs and path not in self._populated:
+            return path
+        return None
+
+    def hasChildren(self, index=QtCore.QModelIndex()):
+        if self._unpopulated_dir(index) is not None:
+            return True
+        return QtGui.QStandardItemModel.hasChildren(self, index)
 
-        This ensures that directories are always listed before files.
+    def canFetchMore(self, index):
+        return self._unpopulated_dir(index) is not None
 
-        """
-        entries = dirname.split('/')
-        curdir = []
-        parent = self.invisibleRootItem()
-        curdir_append = curdir.append
-        self_add_directory = self.add_directory
-        for entry in entries:
-            curdir_append(entry)
-            path = '/'.join(curdir)
-            if path in direntries:
-                parent = direntries[path]
-            else:
-                grandparent = parent
-                parent = self_add_directory(grandparent, path)
-                direntries[path] = parent
-        return parent
+    def fetchMore(self, index):
+        path = self._unpopulated_dir(index)
+        if path is not None:
+            self._populate(self.itemFromIndex(index), path)
 
     def entry(self, path):
         """Return the GitRepoEntry for a path."""
-        return GitRepoEntryManager.entry(path)
-
-
-class GitRepoEntryManager(object):
-    """
-    Provides access to static instances of GitRepoEntry and model data.
-    """
-    static_entries = {}
-
-    @classmethod
-    def entry(cls, path, _static_entries=static_entries):
-        """Return a static instance of a GitRepoEntry."""
         try:
-            e = _static_entries[path]
+            return self._entries[path]
         except KeyError:
-            e = _static_entries[path] = GitRepoEntry(path)
-        return e
-
+            e = self._entries[path] = GitRepoEntryManager.entry(path)
+            return e
 
-class TaskRunner(object):
-    """Manages QRunnable task instances to avoid python's garbage collector
 
-    When PyQt stops referencing a QRunnable instance Python cleans it up
-    which leads to segfaults, e.g. the dreaded "C++ object has gone away".
+class GitRepoEntryManager(object):
+    """
+    Provides access to shared instances of GitRepoEntry and model data.
 
-    This class keeps track of tasks and cleans up references to them as they
-    complete.
+    Entries are shared by every model that shows a path.  Each model
+    keeps the entries for its rows alive, and only weak references are
+    kept here, so an entry goes away with the last model that uses it.
 
     """
-    singleton = None
+    static_entries = weakref.WeakValueDictionary()
+    _lock = threading.Lock()
+    _watching = False
 
     @classmethod
-    def instance(cls):
-        if cls.singleton is None:
-            cls.singleton = TaskRunner()
-        return cls.singleton
+    def entry(cls, path):
+        """Return the shared GitRepoEntry for a path, creating it if needed"""
+        cls._lock.acquire()
+        try:
+            e = cls.static_entries.get(path)
+            if e is None:
+                e = cls.static_entries[path] = GitRepoEntry(path)
+            return e
+        finally:
+            cls._lock.release()
 
-    def __init__(self):
-        self.tasks = set()
-        self.threadpool = QtCore.QThreadPool.globalInstance()
-        self.notifier = QtCore.QObject()
-        self.notifier.connect(self.notifier, SIGNAL('task_done'), self.task_done)
+    @classmethod
+    def find(cls, path):
+        """Return the existing GitRepoEntry for a path, or None"""
+        cls._lock.acquire()
+        try:
+            return cls.static_entries.get(path)
+        finally:
+            cls._lock.release()
 
-    def run(self, task):
-        self.tasks.add(task)
-        self.threadpool.start(task)
+    @classmethod
+    def clear(cls, *args):
+        """Forget all entries, e.g. when another repository is opened"""
+        cls._lock.acquire()
+        try:
+            cls.static_entries.clear()
+        finally:
+            cls._lock.release()
 
-    def task_done(self, task):
-        if task in self.tasks:
-            self.tasks.remove(task)
+    @classmethod
+    def watch_repo(cls):
+        """Clear the entries whenever another repository is opened"""
+        if cls._watching:
+            return
+        cls._watching = True
+        cola.notifier().connect(signals.open_repo, cls.clear)
 
-    def cleanup_task(self, task):
-        self.notifier.emit(SIGNAL('task_done'), task)
+    @classmethod
+    def update(cls, paths, key=None, priority=tasks.PRIORITY_NORMAL,
+               owner=None):
+        """Schedule a single GitRepoInfoTask to calculate info for paths."""
+        if paths:
+            tasks.submit(GitRepoInfoTask(paths), queue=tasks.METADATA,
+                         key=key, priority=priority, owner=owner)
 
 
 class GitRepoEntry(QtCore.QObject):
@@ -239,22 +269,19 @@ class GitRepoEntry(QtCore.QObject):
     Emits signal names matching those defined in Columns.
 
     """
-    def __init__(self, path):
-        QtCore.QObject.__init__(self)
+    def __init__(self, path, parent=None):
+        QtCore.QObject.__init__(self, parent)
         self.path = path
 
     def update_name(self):
         """Emits a signal corresponding to the entry's name."""
         # 'name' is cheap to calculate so simply emit a signal
         self.emit(SIGNAL(Columns.NAME), utils.basename(self.path))
-        if '/' not in self.path:
-            self.update()
 
     def update(self):
-        """Starts a GitRepoInfoTask to calculate info for entries."""
+        """Starts a GitRepoInfoTask to calculate info for the entry."""
         # GitRepoInfoTask handles expensive lookups
-        task = GitRepoInfoTask(self.path)
-        TaskRunner.instance().run(task)
+        GitRepoEntryManager.update([self.path])
 
     def event(self, e):
         """Receive GitRepoInfoEvents and emit corresponding Qt signals."""
@@ -265,51 +292,60 @@ class GitRepoEntry(QtCore.QObject):
         return QtCore.QObject.event(self, e)
 
 
-# Support older versions of PyQt
-if version.check('pyqt_qrunnable', QtCore.PYQT_VERSION_STR):
-    QRunnable = QtCore.QRunnable
-else:
-    class QRunnable(object):
-        pass
-
-class GitRepoInfoTask(QRunnable):
-    """Handles expensive git lookups for a path."""
-    def __init__(self, path):
-        QRunnable.__init__(self)
-        self.path = path
+class GitRepoInfoTask(tasks.Task):
+    """Handles expensive git lookups for a batch of paths."""
+    def __init__(self, paths):
+        tasks.Task.__init__(self)
+        self.paths = paths
         self._cfg = gitcfg.instance()
-        self._data = {}
+        self._data = None
 
-    def data(self, key):
+    def data(self, path, key):
         """
         Return git data for a path.
 
-        Supported keys are 'date', 'message', and 'author'
+        Supported keys are 'date', 'message', and 'author'.
+        The last commit for every path in the batch is read from the
+        persistent last-modified index, which walks history at most once.
 
         """
-        if not self._data:
-            log_line = cola.model().git.log('-1', '--', self.path,
-                                            M=True,
-                                            all=False,
-                                            no_color=True,
-                                            pretty='format:%ar%x01%s%x01%an')
-            if log_line:
-                log_line = core.decode(log_line)
-                date, message, author = log_line.split(chr(0x01), 2)
-                self._data['date'] = date
-                self._data['message'] = message
-                self._data['author'] = author
-            else:
-                self._data['date'] = self.date()
-                self._data['message'] = '-'
-                self._data['author'] = self._cfg.get('user.name', 'unknown')
-        return self._data[key]
-
-    def name(self):
+        if self._data is None:
+            self._data = {}
+            commits = lastmodified.instance().lookup(self.paths,
+                                                     self.untracked())
+            now = time.time()
+            for p in self.paths:
+                try:
+                    commit = commits[p]
+                except KeyError:
+                    self._data[p] = {
+                        'date': self.date(p),
+                        'message': '-',
+                        'author': self._cfg.get('user.name', 'unknown'),
+                    }
+                    continue
+                self._data[p] = {
+                    'date': lastmodified.relative_date(commit.timestamp,
+                                                       now=now),
+                    'message': commit.subject,
+                    'author': commit.author,
+                }
+        return self._data[path][key]
+
+    def untracked(self):
+        """Return the paths that the status index lists as untracked"""
+        index = cola.model().status_index
+        untracked = statusindex.UNTRACKED
+        # Untracked directories are listed as "dir/" when collapsed
+        return [p for p in self.paths
+                if index.row(untracked, p) is not None or
+                index.row(untracked, p + '/') is not None]
+
+    def name(self, path):
         """Calculate the name for an entry."""
-        return utils.basename(self.path)
+        return utils.basename(path)
 
-    def date(self):
+    def date(self, path):
         """
         Returns a relative date for a file path.
 
@@ -317,60 +353,62 @@ class GitRepoInfoTask(QRunnable):
         'git log' information.
 
         """
-        encpath = core.encode(self.path)
-        st = os.stat(encpath)
-        elapsed = time.time() - st.st_mtime
-        minutes = int(elapsed / 60.)
-        if minutes < 60:
-            return '%d minutes ago' % minutes
-        hours = int(elapsed / 60. / 60.)
-        if hours < 24:
-            return '%d hours ago' % hours
-        return '%d days ago' % int(elapsed / 60. / 60. / 24.)
-
-    def status(self):
-        """Return the status for the entry's path."""
+        encpath = core.encode(path)
+        try:
+            st = os.stat(encpath)
+        except OSError:
+            return '-'
+        return lastmodified.relative_date(st.st_mtime)
 
-        model = cola.model()
-        unmerged = utils.add_parents(set(model.unmerged))
-        modified = utils.add_parents(set(model.modified))
-        staged = utils.add_parents(set(model.staged))
-        untracked = utils.add_parents(set(model.untracked))
-        upstream_changed = utils.add_parents(set(model.upstream_changed))
+    def status(self, path):
+        """Return the status for a path."""
+        flags = cola.model().status_index.status(path)
 
-        if self.path in unmerged:
+        if flags & statusindex.UNMERGED:
             return (resources.icon('sigil-unmerged.png'),
                     qtutils.tr('Unmerged'))
-        if self.path in modified and self.path in staged:
+        if flags & statusindex.MODIFIED and flags & statusindex.STAGED:
             return (resources.icon('sigil-partial.png'),
                     qtutils.tr('Partially Staged'))
-        if self.path in modified:
+        if flags & statusindex.MODIFIED:
             return (resources.icon('sigil-modified.png'),
                     qtutils.tr('Modified'))
-        if self.path in staged:
+        if flags & statusindex.STAGED:
             return (resources.icon('sigil-staged.png'),
                     qtutils.tr('Staged'))
-        if self.path in upstream_changed:
+        if flags & statusindex.UPSTREAM_CHANGED:
             return (resources.icon('sigil-upstream.png'),
                     qtutils.tr('Changed Upstream'))
-        if self.path in untracked:
+        if flags & statusindex.UNTRACKED:
             return (None, '?')
         return (None, '')
 
     def run(self):
         """Perform expensive lookups and post corresponding events."""
         app = QtGui.QApplication.instance()
-        entry = GitRepoEntryManager.entry(self.path)
-        app.postEvent(entry,
-                GitRepoInfoEvent(Columns.MESSAGE, self.data('message')))
-        app.postEvent(entry,
-                GitRepoInfoEvent(Columns.AGE, self.data('date')))
-        app.postEvent(entry,
-                GitRepoInfoEvent(Columns.WHO, self.data('author')))
-        app.postEvent(entry,
-                GitRepoInfoEvent(Columns.STATUS, self.status()))
-
-        TaskRunner.instance().cleanup_task(self)
+        for path in self.paths:
+            if self.cancelled:
+                return
+            # Entries are only created on the main thread; a missing
+            # entry means that no row displays the path anymore.
+            entry = GitRepoEntryManager.find(path)
+            if entry is None:
+                continue
+            try:
+                app.postEvent(entry,
+                        GitRepoInfoEvent(Columns.MESSAGE,
+                                         self.data(path, 'message')))
+                app.postEvent(entry,
+                        GitRepoInfoEvent(Columns.AGE,
+                                         self.data(path, 'date')))
+                app.postEvent(entry,
+                        GitRepoInfoEvent(Columns.WHO,
+                                         self.data(path, 'author')))
+                app.postEvent(entry,
+                        GitRepoInfoEvent(Columns.STATUS, self.status(path)))
+            except RuntimeError:
+                # The entry was destroyed while the task was running
+                continue
 
 
 class GitRepoInfoEvent(QtCore.QEvent):
@@ -393,11 +431,10 @@ class GitRepoItem(QtGui.QStandardItem):
     One is created for each column -- Name, Status, Age, etc.
 
     """
-    def __init__(self, column, path):
+    def __init__(self, column, entry):
         QtGui.QStandardItem.__init__(self)
         self.setEditable(False)
         self.setDragEnabled(False)
-        entry = GitRepoEntryManager.entry(path)
         if column == Columns.STATUS:
             QtCore.QObject.connect(entry, SIGNAL(column), self.set_status)
         else:
@@ -416,8 +453,8 @@ class GitRepoNameItem(GitRepoItem):
     """Subclass GitRepoItem to provide a custom type()."""
     TYPE = QtGui.QStandardItem.UserType + 1
 
-    def __init__(self, path):
-        GitRepoItem.__init__(self, Columns.NAME, path)
+    def __init__(self, path, entry):
+        GitRepoItem.__init__(self, Columns.NAME, entry)
         self.path = path
 
     def type(self):
@@ -7,7 +7,7 @@ from PyQt4.QtCore import SIGNAL
 import cola
 from cola import qtutils
 from cola import signals
-from cola import utils
+from cola.models import statusindex
 from cola.models.selection import State
 from cola.widgets import defs
 from cola.widgets import standard
@@ -166,20 +166,17 @@ class RepoTreeView(standard.TreeView):
         state = State(staged, unmerged, modified, untracked)
 
         paths = self.selected_paths()
-        model = cola.model()
-        model_staged = utils.add_parents(set(model.staged))
-        model_modified = utils.add_parents(set(model.modified))
-        model_unmerged = utils.add_parents(set(model.unmerged))
-        model_untracked = utils.add_parents(set(model.untracked))
+        index = cola.model().status_index
 
         for path in paths:
-            if path in model_unmerged:
+            flags = index.status(path)
+            if flags & statusindex.UNMERGED:
                 unmerged.append(path)
-            elif path in model_untracked:
+            elif flags & statusindex.UNTRACKED:
                 untracked.append(path)
-            elif path in model_staged:
+            elif flags & statusindex.STAGED:
                 staged.append(path)
-            elif path in model_modified:
+            elif flags & statusindex.MODIFIED:
                 modified.append(path)
             else:
                 staged.append(path)
@@ -218,38 +215,34 @@ class RepoTreeView(standard.TreeView):
         """Return selected staged paths."""
         if not selection:
             selection = self.selected_paths()
-        staged = utils.add_parents(set(cola.model().staged))
-        return [p for p in selection if p in staged]
+        index = cola.model().status_index
+        return [p for p in selection if index.has(p, statusindex.STAGED)]
 
     def selected_modified_paths(self, selection=None):
         """Return selected modified paths."""
         if not selection:
             selection = self.selected_paths()
-        model = cola.model()
-        modified = utils.add_parents(set(model.modified))
-        return [p for p in selection if p in modified]
+        index = cola.model().status_index
+        return [p for p in selection if index.has(p, statusindex.MODIFIED)]
 
     def selected_unstaged_paths(self, selection=None):
         """Return selected unstaged paths."""
         if not selection:
             selection = self.selected_paths()
-        model = cola.model()
-        modified = utils.add_parents(set(model.modified))
-        untracked = utils.add_parents(set(model.untracked))
-        unstaged = modified.union(untracked)
-        return [p for p in selection if p in unstaged]
+        index = cola.model().status_index
+        unstaged = statusindex.MODIFIED | statusindex.UNTRACKED
+        return [p for p in selection if index.has(p, unstaged)]
 
     def selected_tracked_paths(self, selection=None):
         """Return selected tracked paths."""
         if not selection:
             selection = self.selected_paths()
-        model = cola.model()
+        index = cola.model().status_index
         staged = set(self.selected_staged_paths())
         modified = set(self.selected_modified_paths())
-        untracked = utils.add_parents(set(model.untracked))
         tracked = staged.union(modified)
         return [p for p in selection
-                if p not in untracked or p in tracked]
+                if not index.has(p, statusindex.UNTRACKED) or p in tracked]
 
     def _create_action(self, name, tooltip, slot, shortcut=None):
         """Create an action with a shortcut, tooltip, and callback slot."""
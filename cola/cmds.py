@@ -1,4 +1,5 @@
 import os
+import shutil
 import sys
 import platform
 from fnmatch import fnmatch
@@ -313,7 +314,11 @@ class Delete(Command):
         for filename in self.filenames:
             if filename:
                 try:
-                    os.remove(filename)
+                    if filename.endswith('/'):
+                        # A collapsed untracked directory
+                        shutil.rmtree(core.encode(filename))
+                    else:
+                        os.remove(filename)
                     rescan=True
                 except:
                     _factory.prompt_user(signals.information,
@@ -441,6 +446,16 @@ class Edit(Command):
         utils.fork(utils.shell_split(editor) + opts)
 
 
+class ExpandUntracked(Command):
+    """List the contents of untracked directories."""
+    def __init__(self, paths):
+        Command.__init__(self)
+        self.paths = paths
+
+    def do(self):
+        self.model.expand_untracked(self.paths)
+
+
 class FormatPatch(Command):
     """Output a patch series given all revisions and a selected subset."""
     def __init__(self, to_export, revs):
@@ -902,6 +917,7 @@ def register():
         signals.diffstat: Diffstat,
         signals.difftool: Difftool,
         signals.edit: Edit,
+        signals.expand_untracked: ExpandUntracked,
         signals.format_patch: FormatPatch,
         signals.ignore: Ignore,
         signals.load_commit_message: LoadCommitMessage,
@@ -8,6 +8,7 @@ cmdlock = threading.Lock()
 import cola
 from cola import core
 from cola import signals
+from cola.compat import set
 from cola.decorators import memoize
 
 GIT_COLA_TRACE = os.getenv('GIT_COLA_TRACE', '')
@@ -46,79 +47,108 @@ def read_git_file(f):
     return None
 
 
+# Paths beneath $GIT_DIR that are shared by every worktree.  cola's own
+# files stay per-worktree because some of them depend on HEAD.
+COMMON_PATHS = set(('branches', 'config', 'hooks', 'info', 'objects',
+                    'packed-refs', 'refs', 'remotes', 'shallow'))
+
+# Repositories found by discover(), keyed by path and environment
+_discovered = {}
+
+
+def discover(path):
+    """Return (git_dir, worktree, common_dir) for the repository at path
+
+    The directories are resolved by a single `git rev-parse`, so that
+    .git files, linked worktrees, $GIT_DIR and $GIT_WORK_TREE behave
+    exactly as they do for git.  Results are memoized per path.  None is
+    returned when path is not inside a repository; that is not memoized
+    so that a repository created later is found.
+
+    """
+    path = os.path.abspath(path)
+    key = (path, os.getenv('GIT_DIR'), os.getenv('GIT_WORK_TREE'))
+    try:
+        return _discovered[key]
+    except KeyError:
+        pass
+    result = _rev_parse_dirs(path)
+    if result is not None:
+        _discovered[key] = result
+    return result
+
+
+def _rev_parse_dirs(path):
+    try:
+        status, out = Git.execute(['git', 'rev-parse',
+                                   '--git-dir', '--git-common-dir',
+                                   '--show-toplevel'],
+                                  cwd=path, with_status=True)
+    except OSError:
+        return None
+    lines = out.splitlines()
+    if len(lines) < 2:
+        return None
+    git_dir = os.path.join(path, lines[0])
+    if lines[1] == '--git-common-dir':
+        # git older than 2.5 echoes options that it does not know
+        common_dir = git_dir
+    else:
+        common_dir = os.path.join(path, lines[1])
+    if len(lines) > 2 and status == 0:
+        worktree = lines[2]
+    else:
+        # Bare repositories do not have a worktree
+        worktree = git_dir
+    return (os.path.normpath(git_dir), os.path.normpath(worktree),
+            os.path.normpath(common_dir))
+
+
 class Git(object):
     """
     The Git class manages communication with the Git binary
     """
     def __init__(self):
         self._git_cwd = None #: The working directory used by execute()
-        self._worktree = None
-        self._git_file_path = None
+        self._path = None
+        self._dirs = None
+        self._valid = False
         self.set_worktree(os.getcwd())
 
     def set_worktree(self, path):
-        self._git_dir = path
-        self._git_file_path = None
-        self._worktree = None
-        self.worktree()
+        """Use the repository at path; it is discovered on first use"""
+        self._path = os.path.abspath(path)
+        self._dirs = None
+
+    def _discover(self):
+        if self._dirs is None:
+            dirs = discover(self._path)
+            self._valid = dirs is not None
+            if dirs is None:
+                # Not a repository; paths resolve relative to path
+                dirs = (self._path, self._path, self._path)
+            if dirs[1] == self._path:
+                self.set_cwd(None)
+            else:
+                self.set_cwd(dirs[1])
+            self._dirs = dirs
+        return self._dirs
 
     def worktree(self):
-        if self._worktree:
-            return self._worktree
-        self.git_dir()
-        if self._git_dir:
-            curdir = self._git_dir
-        else:
-            curdir = os.getcwd()
-
-        if is_git_dir(os.path.join(curdir, '.git')):
-            return curdir
-
-        # Handle bare repositories
-        if (len(os.path.basename(curdir)) > 4
-                and curdir.endswith('.git')):
-            return curdir
-        if 'GIT_WORK_TREE' in os.environ:
-            self._worktree = os.getenv('GIT_WORK_TREE')
-        if not self._worktree or not os.path.isdir(self._worktree):
-            if self._git_dir:
-                gitparent = os.path.join(os.path.abspath(self._git_dir), '..')
-                self._worktree = os.path.abspath(gitparent)
-                self.set_cwd(self._worktree)
-        return self._worktree
+        return self._discover()[1]
 
     def is_valid(self):
-        return self._git_dir and is_git_dir(self._git_dir)
+        self._discover()
+        return self._valid
 
     def git_path(self, *paths):
-        if self._git_file_path is None:
-            return os.path.join(self.git_dir(), *paths)
-        else:
-            return os.path.join(self._git_file_path, *paths)
+        git_dir, worktree, common_dir = self._discover()
+        if paths and paths[0] in COMMON_PATHS:
+            return os.path.join(common_dir, *paths)
+        return os.path.join(git_dir, *paths)
 
     def git_dir(self):
-        if self.is_valid():
-            return self._git_dir
-        if 'GIT_DIR' in os.environ:
-            self._git_dir = os.getenv('GIT_DIR')
-        if self._git_dir:
-            curpath = os.path.abspath(self._git_dir)
-        else:
-            curpath = os.path.abspath(os.getcwd())
-        # Search for a .git directory
-        while curpath:
-            if is_git_dir(curpath):
-                self._git_dir = curpath
-                break
-            gitpath = os.path.join(curpath, '.git')
-            if is_git_dir(gitpath):
-                self._git_dir = gitpath
-                break
-            curpath, dummy = os.path.split(curpath)
-            if not dummy:
-                break
-        self._git_file_path = read_git_file(self._git_dir)
-        return self._git_dir
+        return self._discover()[0]
 
     def set_cwd(self, path):
         """Sets the current directory."""
@@ -133,6 +163,7 @@ class Git(object):
     def execute(command,
                 cwd=None,
                 istream=None,
+                input_data=None,
                 with_exceptions=False,
                 with_raw_output=False,
                 with_status=False,
@@ -147,6 +178,10 @@ class Git(object):
         ``istream``
             Readable filehandle passed to subprocess.Popen.
 
+        ``input_data``
+            A string that is written to the command's stdin.
+            Takes precedence over ``istream``.
+
         ``cwd``
             The working directory when running commands.
             Default: os.getcwd()
@@ -174,6 +209,9 @@ class Git(object):
         if not cwd:
             cwd = os.getcwd()
 
+        if input_data is not None:
+            istream = subprocess.PIPE
+
         extra = {}
         if sys.platform == 'win32':
             command = map(replace_carot, command)
@@ -193,7 +231,7 @@ class Git(object):
                                         stdout=subprocess.PIPE,
                                         **extra)
                 # Wait for the process to return
-                out, err = proc.communicate()
+                out, err = proc.communicate(input_data)
                 status = proc.returncode
                 break
             except OSError, e:
@@ -273,7 +311,7 @@ class Git(object):
         # Handle optional arguments prior to calling transform_kwargs
         # otherwise they'll end up in args, which is bad.
         _kwargs = dict(cwd=self._git_cwd)
-        execute_kwargs = ('cwd', 'istream',
+        execute_kwargs = ('cwd', 'istream', 'input_data',
                           'with_exceptions',
                           'with_raw_output',
                           'with_status',
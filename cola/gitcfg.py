@@ -44,6 +44,25 @@ def _cache_key():
     return mtimes
 
 
+def _attr_cache_key(config, attr_files):
+    """Return mtimes for the files that can affect gitattributes lookups"""
+    git_inst = config.git
+    paths = ['.gitattributes',
+             git_inst.git_path('info', 'attributes'),
+             git_inst.git_path('HEAD')]
+    attributesfile = config.get('core.attributesfile')
+    if attributesfile:
+        paths.append(os.path.expanduser(attributesfile))
+    paths.extend(sorted(attr_files))
+    mtimes = []
+    for path in paths:
+        try:
+            mtimes.append(os.stat(core.encode(path)).st_mtime)
+        except OSError:
+            mtimes.append(None)
+    return mtimes
+
+
 class GitConfig(observable.Observable):
     """Encapsulate access to git-config values."""
 
@@ -63,6 +82,8 @@ class GitConfig(observable.Observable):
         self._config_files = {}
         self._value_cache = {}
         self._attr_cache = {}
+        self._attr_cache_key = None
+        self._attr_files = set()
         self._find_config_files()
 
     def reset(self):
@@ -76,6 +97,8 @@ class GitConfig(observable.Observable):
         self._config_files.clear()
         self._value_cache = {}
         self._attr_cache = {}
+        self._attr_cache_key = None
+        self._attr_files = set()
         self._find_config_files()
 
     def user(self):
@@ -246,28 +269,57 @@ class GitConfig(observable.Observable):
     def file_encoding(self, path):
         if not self.is_per_file_attrs_enabled():
             return None
+        self._update_attr_cache()
         cache = self._attr_cache
         try:
             value = cache[path]
         except KeyError:
-            value = cache[path] = self._file_encoding(path)
+            self._read_file_encodings([path])
+            value = cache.get(path)
         return value
 
-    def _file_encoding(self, path):
-        """Return the file encoding for a path"""
-        status, out = self.git.check_attr('encoding', '--', path,
+    def update_file_encodings(self, paths):
+        """Resolve the encoding attribute for many paths at once
+
+        This is called when the status is refreshed so that later
+        file_encoding() calls are served from the cache.
+
+        """
+        if not self.is_per_file_attrs_enabled():
+            return
+        for path in paths:
+            if path == '.gitattributes' or path.endswith('/.gitattributes'):
+                self._attr_files.add(path)
+        self._update_attr_cache()
+        cache = self._attr_cache
+        uncached = [p for p in paths if p not in cache]
+        if uncached:
+            self._read_file_encodings(uncached)
+
+    def _update_attr_cache(self):
+        """Clear the attribute cache when .gitattributes files change"""
+        cache_key = _attr_cache_key(self, self._attr_files)
+        if cache_key != self._attr_cache_key:
+            self._attr_cache_key = cache_key
+            self._attr_cache = {}
+
+    def _read_file_encodings(self, paths):
+        """Query the encoding attribute for paths using a single git call"""
+        cache = self._attr_cache
+        for path in paths:
+            cache[path] = None
+        input_data = '\0'.join([core.encode(p) for p in paths]) + '\0'
+        status, out = self.git.check_attr('encoding', z=True, stdin=True,
+                                          input_data=input_data,
                                           with_status=True)
-        if status != 0:
-            return None
-        out = core.decode(out)
-        header = '%s: encoding: ' % path
-        if out.startswith(header):
-            encoding = out[len(header):].strip()
-            if (encoding != 'unspecified' and
-                    encoding != 'unset' and
-                    encoding != 'set'):
-                return encoding
-        return None
+        if status != 0 or not out:
+            return
+        fields = out.split('\0')
+        for idx in xrange(0, len(fields) - 2, 3):
+            path, attr, value = fields[idx:idx+3]
+            if value in ('unspecified', 'unset', 'set'):
+                continue
+            cache[core.decode(path)] = core.decode(value)
 
     guitool_opts = ('cmd', 'needsfile', 'noconsole', 'norescan', 'confirm',
                     'argprompt', 'revprompt', 'revunmerged', 'title', 'prompt')
@@ -44,7 +44,7 @@ def _parse_diff_filenames(diff_zstr):
         return []
 
 
-def all_files():
+def all_files(git=git):
     """Return the names of all files in the repository"""
     ls_files = git.ls_files(z=True)
     if ls_files:
@@ -151,6 +151,22 @@ def all_refs(split=False, git=git):
         return local_branches + remote_branches + tags
 
 
+def ref_tips(git=git):
+    """Return the sorted commits at the tips of every ref and HEAD"""
+    # Tags that point to trees or blobs are skipped
+    out = git.rev_list(no_walk=True, all=True)
+    return sorted(set(out.split()))
+
+
+def reachable(old, new, git=git):
+    """Return True when every commit in old is reachable from new"""
+    if not old:
+        return True
+    args = list(old) + ['--not'] + list(new)
+    status, out = git.rev_list(n=1, with_status=True, *args)
+    return status == 0 and not out.strip()
+
+
 def tracked_branch(branch=None, config=None):
     """Return the remote branch associated with 'branch'."""
     if config is None:
@@ -171,14 +187,105 @@ def tracked_branch(branch=None, config=None):
     return None
 
 
-def untracked_files(git=git):
-    """Returns a sorted list of untracked files."""
-    ls_files = git.ls_files(z=True, others=True, exclude_standard=True)
+# Limits the number of pathspecs passed to a single git command
+MAX_PATHSPECS = 512
+
+
+def untracked_files(git=git, paths=None, directory=False):
+    """Returns a sorted list of untracked files.
+
+    When `directory` is True, a directory that contains only untracked
+    files is listed as a single "dir/" entry, like `git status` does.
+    `paths` limits the listing to the given pathspecs.
+
+    """
+    args = []
+    if paths:
+        args = ['--'] + [core.encode(p) for p in paths]
+    ls_files = git.ls_files(z=True, others=True, exclude_standard=True,
+                            directory=directory,
+                            no_empty_directory=directory, *args)
     if ls_files:
         return core.decode(ls_files[:-1]).split('\0')
     return []
 
 
+def literal_pathspec(path):
+    """Return a pathspec that only matches path itself"""
+    if version.check('pathspec-literal', version.git_version()):
+        return ':(literal)' + path
+    return path
+
+
+def untracked_directory(dirname, git=git):
+    """Return the untracked entries directly inside an untracked directory
+
+    Subdirectories are listed as collapsed "dir/" entries.
+
+    """
+    try:
+        children = os.listdir(core.encode(dirname))
+    except OSError:
+        return []
+    prefix = dirname.rstrip('/') + '/'
+    paths = [prefix + core.decode(child) for child in sorted(children)]
+    pathspecs = [literal_pathspec(path) for path in paths]
+    # Names with wildcards can match other paths when git does not
+    # understand literal pathspecs
+    known = set(paths)
+    entries = []
+    for start in xrange(0, len(paths), MAX_PATHSPECS):
+        chunk = pathspecs[start:start+MAX_PATHSPECS]
+        entries.extend([entry for entry in
+                        untracked_files(git=git, directory=True, paths=chunk)
+                        if entry.rstrip('/') in known])
+    return entries
+
+
+def expand_untracked(entries, expanded, git=git):
+    """Replace collapsed directory entries in `expanded` by their contents"""
+    if not expanded:
+        return entries
+    result = []
+    for entry in entries:
+        if entry.endswith('/') and entry in expanded:
+            result.extend(expand_untracked(untracked_directory(entry, git=git),
+                                           expanded, git=git))
+        else:
+            result.append(entry)
+    return result
+
+
+def untracked_mode():
+    """Return the status.showUntrackedFiles mode: 'no', 'normal' or 'all'
+
+    Every untracked file is listed unless the mode is configured.
+
+    """
+    mode = config.get('status.showuntrackedfiles', 'all')
+    if mode is False:
+        # gitcfg converts "no" into False
+        return 'no'
+    if mode not in ('normal', 'all'):
+        mode = 'all'
+    return mode
+
+
+def worktree_untracked(expanded=()):
+    """Return the untracked files to display in the status
+
+    Untracked directories are collapsed when status.showUntrackedFiles
+    is 'normal'.  Directories listed in `expanded` show their contents.
+
+    """
+    mode = untracked_mode()
+    if mode == 'no':
+        return []
+    if mode == 'all':
+        return untracked_files()
+    return expand_untracked(untracked_files(directory=True), set(expanded))
+
+
 def tag_list():
     """Return a list of tags."""
     tags = for_each_ref_basename('refs/tags')
@@ -359,9 +466,100 @@ def export_patchset(start, end, output='patches', **kwargs):
                             **kwargs)
 
 
+# Paths passed per command when git cannot read pathspecs from stdin
+SLICE_SIZE = 42
+
+
+def _nul_terminated(paths):
+    return ''.join([core.encode(path) + '\0' for path in paths])
+
+
+def _sliced(paths, fn, size=SLICE_SIZE):
+    """Call fn on slices of paths and combine the (status, output) results"""
+    status = 0
+    outlines = []
+    while paths:
+        newstatus, out = fn(paths[:size])
+        status = status or newstatus
+        if out:
+            outlines.append(out)
+        paths = paths[size:]
+    return (status, '\n'.join(outlines))
+
+
+def have_pathspec_from_file():
+    """Return True when git can read pathspecs from stdin"""
+    return version.check('pathspec-from-file', version.git_version())
+
+
+def add_paths(paths, git=git):
+    """Stage additions, modifications and removals of paths
+
+    Every path is fed to a single `git update-index` through stdin, so
+    that staging many paths runs one process.  Untracked directories,
+    which update-index does not descend into, are added by `git add`.
+    `git add` is also used when update-index refuses a path.
+
+    """
+    paths = list(set(paths))
+    if not paths:
+        return (0, '')
+    files = [p for p in paths if not p.endswith('/')]
+    dirs = [p for p in paths if p.endswith('/')]
+    status = 0
+    outlines = []
+    if files:
+        status, out = git.update_index('--verbose', '--add', '--remove',
+                                       '-z', '--stdin',
+                                       input_data=_nul_terminated(files),
+                                       with_stderr=True, with_status=True)
+        if status != 0:
+            dirs = paths
+        elif out:
+            outlines.append(out)
+    if dirs:
+        status, out = _add(dirs, git=git)
+        if out:
+            outlines.append(out)
+    return (status, '\n'.join(outlines))
+
+
+def _add(paths, git=git):
+    if have_pathspec_from_file():
+        return git.add('--verbose', '--pathspec-from-file=-',
+                       '--pathspec-file-nul',
+                       input_data=_nul_terminated(paths),
+                       with_stderr=True, with_status=True)
+    return _sliced(paths, lambda x: git.add('--verbose', '--',
+                                            with_stderr=True,
+                                            with_status=True, *x))
+
+
+def reset_paths(paths, head='HEAD', git=git):
+    """Reset the index entries of paths to their state in head
+
+    No revision is passed when head is None, so that git resets to HEAD
+    and also handles an unborn branch by removing the paths.
+
+    """
+    paths = list(set(paths))
+    if not paths:
+        return (0, '')
+    if head is None:
+        revs = []
+    else:
+        revs = [head]
+    if have_pathspec_from_file():
+        args = ['-q', '--pathspec-from-file=-', '--pathspec-file-nul'] + revs
+        return git.reset(input_data=_nul_terminated(paths),
+                         with_stderr=True, with_status=True, *args)
+    return _sliced(paths, lambda x: git.reset('-q', with_stderr=True,
+                                              with_status=True,
+                                              *(revs + ['--'] + x)))
+
+
 def unstage_paths(args, head='HEAD'):
-    status, output = git.reset(head, '--', with_status=True,
-                               *set(args))
+    status, output = reset_paths(args, head=head)
     if status == 128:
         # handle git init: we have to use 'git rm --cached'
         # detect this condition by checking if the file is still staged
@@ -373,8 +571,9 @@ def unstage_paths(args, head='HEAD'):
 def untrack_paths(args, head='HEAD'):
     if not args:
         return (-1, 'Nothing to do')
-    return git.update_index('--', force_remove=True,
-                            with_status=True, *set(args))
+    return git.update_index('--force-remove', '-z', '--stdin',
+                            input_data=_nul_terminated(set(args)),
+                            with_status=True)
 
 
 def worktree_state(head='HEAD'):
@@ -392,9 +591,13 @@ def worktree_state(head='HEAD'):
            state.get('upstream_changed', []))
 
 
-def worktree_state_dict(head='HEAD', update_index=False):
+def worktree_state_dict(head='HEAD', update_index=False,
+                        expanded_untracked=()):
     """Return a dict of files in various states of being
 
+    `expanded_untracked` lists the untracked directories whose contents
+    should be listed.
+
     :rtype: dict, keys are staged, unstaged, untracked, unmerged,
             changed_upstream, and submodule.
 
@@ -413,7 +616,7 @@ def worktree_state_dict(head='HEAD', update_index=False):
         modified.remove(path)
 
     submodules = submodules.union(more_submods)
-    untracked = untracked_files()
+    untracked = worktree_untracked(expanded=expanded_untracked)
 
     # Look for upstream modified files if this is a tracking branch
     upstream_changed = diff_upstream(head)
@@ -434,55 +637,92 @@ def worktree_state_dict(head='HEAD', update_index=False):
 
 
 def diff_index(head, cached=True):
-    decode = core.decode
-    submodules = set()
-    staged = []
-    unmerged = []
-
     status, output = git.diff_index(head, cached=cached,
                                     z=True, with_status=True)
     if status != 0:
         # handle git init
-        return all_files(), unmerged, submodules
-
-    while output:
-        rest, output = output.split('\0', 1)
-        name, output = output.split('\0', 1)
-        status = rest[-1]
-        name = decode(name)
-        if '160000' in rest[1:14]:
-            submodules.add(name)
-        elif status  in 'DAMT':
-            staged.append(name)
-        elif status == 'U':
-            unmerged.append(name)
-
-    return staged, unmerged, submodules
+        return all_files(), [], set()
+    return _parse_diff_status(output)
 
 
 def diff_worktree():
-    modified = []
-    submodules = set()
-
     status, output = git.diff_files(z=True, with_status=True)
     if status != 0:
         # handle git init
+        modified = []
         ls_files = core.decode(git.ls_files(modified=True, z=True))
         if ls_files:
             modified = ls_files[:-1].split('\0')
-        return modified, submodules
+        return modified, set()
+    modified, unmerged, submodules = _parse_diff_status(output)
+    return modified, submodules
+
+
+def _parse_diff_status(output):
+    """Parse `git diff-index -z` and `git diff-files -z` output
 
+    Returns the lists of changed and unmerged paths and the set of
+    changed submodules.
+
+    """
+    decode = core.decode
+    changed = []
+    unmerged = []
+    submodules = set()
     while output:
         rest, output = output.split('\0', 1)
         name, output = output.split('\0', 1)
         status = rest[-1]
-        name = core.decode(name)
+        name = decode(name)
         if '160000' in rest[1:14]:
             submodules.add(name)
         elif status in 'DAMT':
-            modified.append(name)
+            changed.append(name)
+        elif status == 'U':
+            unmerged.append(name)
+    return changed, unmerged, submodules
 
-    return modified, submodules
+
+def worktree_state_paths(paths, head='HEAD', git=git):
+    """Return the worktree state of paths and everything beneath them
+
+    Only the given paths are examined, so this is much cheaper than
+    worktree_state_dict() after an operation that touched a few paths.
+    None is returned when the state cannot be limited to paths, e.g.
+    before the first commit or when untracked directories are collapsed.
+
+    :rtype: dict, keys are staged, modified, unmerged, untracked and
+            submodules.
+
+    """
+    if not paths or len(paths) > MAX_PATHSPECS:
+        return None
+    mode = untracked_mode()
+    if mode == 'normal':
+        return None
+    # Literal pathspecs keep names such as "*.c" from matching other files
+    pathspecs = [literal_pathspec(path) for path in paths]
+    args = ['--'] + pathspecs
+    status, output = git.diff_index(head, cached=True, z=True,
+                                    with_status=True, *args)
+    if status != 0:
+        return None
+    staged, unmerged, submodules = _parse_diff_status(output)
+    status, output = git.diff_files(z=True, with_status=True, *args)
+    if status != 0:
+        return None
+    modified, ignored, more_submods = _parse_diff_status(output)
+    unmerged_set = set(unmerged)
+    modified = [path for path in modified if path not in unmerged_set]
+    if mode == 'no':
+        untracked = []
+    else:
+        untracked = untracked_files(git=git, paths=pathspecs)
+    return {'staged': staged,
+            'modified': modified,
+            'unmerged': unmerged,
+            'untracked': untracked,
+            'submodules': submodules.union(more_submods)}
 
 
 def diff_upstream(head):
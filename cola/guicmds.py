@@ -7,10 +7,11 @@ from cola import gitcmds
 from cola import qt
 from cola import qtutils
 from cola import signals
+from cola import tasks
 from cola.git import git
-from cola.widgets.browse import BrowseDialog
-from cola.widgets.combodlg import ComboDialog
-from cola.widgets.selectcommits import select_commits
+from cola.models import commitindex
+from cola.models import pathindex
+from cola.models import snapshot
 
 
 def install_command_wrapper():
@@ -30,6 +31,8 @@ class CommandWrapper(object):
 
 def choose_from_combo(title, items):
     """Quickly choose an item from a list using a combo box"""
+    from cola.widgets.combodlg import ComboDialog
+
     return ComboDialog(qtutils.active_window(), title=title, items=items).selected()
 
 
@@ -65,14 +68,19 @@ def diff_revision():
 
 def browse_current():
     """Launch the 'Browse Current Branch' dialog."""
+    from cola.widgets.browse import BrowseDialog
+
     branch = gitcmds.current_branch()
     BrowseDialog.browse(branch)
 
 
 def browse_other():
     """Prompt for a branch and inspect content at that point in time."""
+    from cola.widgets.browse import BrowseDialog
+
     # Prompt for a branch to browse
-    branch = choose_from_combo('Browse Revision...', gitcmds.all_refs())
+    branch = choose_from_combo('Browse Revision...',
+                               snapshot.instance().all_refs())
     if not branch:
         return
     BrowseDialog.browse(branch)
@@ -89,6 +97,8 @@ def checkout_branch():
 
 def cherry_pick():
     """Launch the 'Cherry-Pick' dialog."""
+    from cola.widgets.selectcommits import select_commits
+
     revs, summaries = gitcmds.log_helper(all=True)
     commits = select_commits('Cherry-Pick Commit',
                              revs, summaries, multiselect=False)
@@ -157,6 +167,8 @@ def clone_repo(spawn=True):
 
 def export_patches():
     """Run 'git format-patch' on a list of commits."""
+    from cola.widgets.selectcommits import select_commits
+
     revs, summaries = gitcmds.log_helper()
     to_export = select_commits('Export Patches', revs, summaries)
     if not to_export:
@@ -238,3 +250,21 @@ def review_branch():
         return
     merge_base = gitcmds.merge_base_parent(branch)
     difftool.diff_commits(qtutils.active_window(), merge_base, branch)
+
+
+def update_path_index():
+    """Update the changed-path filters in the background."""
+    if not pathindex.enabled():
+        return None
+    task = tasks.FunctionTask(pathindex.update)
+    return tasks.submit(task, queue=tasks.METADATA, key='pathindex',
+                        priority=tasks.PRIORITY_LOW)
+
+
+def update_search_index():
+    """Update the commit message and identity index in the background."""
+    if not commitindex.enabled():
+        return None
+    task = tasks.FunctionTask(commitindex.update)
+    return tasks.submit(task, queue=tasks.METADATA, key='commitindex',
+                        priority=tasks.PRIORITY_LOW)
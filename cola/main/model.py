@@ -3,13 +3,15 @@
 """
 
 import os
-import copy
 
 from cola import core
 from cola import git
 from cola import gitcfg
 from cola import gitcmds
+from cola import utils
 from cola.compat import set
+from cola.models import snapshot
+from cola.models.statusindex import StatusIndex
 from cola.observable import Observable
 from cola.decorators import memoize
 
@@ -36,6 +38,7 @@ class MainModel(Observable):
     message_head_changed = 'head_changed'
     message_mode_about_to_change = 'mode_about_to_change'
     message_mode_changed = 'mode_changed'
+    message_paths_changed = 'paths_changed'
     message_updated = 'updated'
 
     # States
@@ -82,6 +85,9 @@ class MainModel(Observable):
         self.unmerged = []
         self.upstream_changed = []
         self.submodules = set()
+        self.status_index = StatusIndex()
+        # Untracked directories whose contents are listed
+        self.expanded_untracked = set()
 
         self.local_branches = []
         self.remote_branches = []
@@ -115,6 +121,8 @@ class MainModel(Observable):
 
     def set_worktree(self, worktree):
         self.git.set_worktree(worktree)
+        snapshot.instance().invalidate()
+        self.expanded_untracked = set()
         is_valid = self.git.is_valid()
         if is_valid:
             basename = os.path.basename(self.git.worktree())
@@ -164,12 +172,99 @@ class MainModel(Observable):
 
     def update_file_status(self, update_index=False):
         self.notify_observers(self.message_about_to_update)
+        snapshot.instance().invalidate()
         self._update_files(update_index=update_index)
         self.notify_observers(self.message_updated)
 
+    def update_path_status(self, paths):
+        """Refresh the status of paths after they were staged or unstaged"""
+        self.notify_observers(self.message_about_to_update)
+        self._update_path_status(paths)
+        self.notify_observers(self.message_updated)
+
+    def _update_path_status(self, paths):
+        """Apply the new status of paths to the status lists
+
+        Only paths, and everything beneath them, are examined by git.
+        The whole status is refreshed when that is not possible.
+        Observers of message_paths_changed receive the paths whose status
+        changed.
+
+        """
+        snapshot.instance().invalidate()
+        old_index = self.status_index
+        touched = self._update_paths(paths)
+        if touched is None:
+            self._update_files()
+            touched = old_index.paths().union(self.status_index.paths())
+        new_index = self.status_index
+        changed = [path for path in touched
+                   if old_index.status(path) != new_index.status(path)]
+        changed.sort()
+        self.notify_observers(self.message_paths_changed, changed)
+
+    def _update_paths(self, paths):
+        """Update the status lists for paths; return the paths involved
+
+        Returns None when the status cannot be limited to paths.
+
+        """
+        roots = set([path.rstrip('/') for path in paths])
+        if '' in roots or '.' in roots:
+            return None
+        state = gitcmds.worktree_state_paths(paths, head=self.head,
+                                             git=self.git)
+        if state is None:
+            return None
+
+        def covered(path):
+            path = path.rstrip('/')
+            while path:
+                if path in roots:
+                    return True
+                path = utils.dirname(path)
+            return False
+
+        touched = set()
+        lists = {}
+        for name in ('staged', 'modified', 'unmerged', 'untracked'):
+            kept = []
+            for path in getattr(self, name):
+                if covered(path):
+                    touched.add(path)
+                else:
+                    kept.append(path)
+            new = [path for path in state[name] if covered(path)]
+            touched.update(new)
+            lists[name] = sorted(kept + new)
+
+        submodules = set([path for path in self.submodules
+                          if not covered(path)])
+        submodules.update([path for path in state['submodules']
+                           if covered(path)])
+
+        self.staged = lists['staged']
+        self.modified = lists['modified']
+        self.unmerged = lists['unmerged']
+        self.untracked = lists['untracked']
+        self.submodules = submodules
+        self._update_status_index()
+        _config.update_file_encodings([path for path in touched
+                                       if not path.endswith('/')])
+        return touched
+
+    def expand_untracked(self, paths):
+        """List the contents of collapsed untracked directories"""
+        dirs = [p for p in paths if p.endswith('/')]
+        if not dirs:
+            return
+        self.expanded_untracked.update(dirs)
+        self.update_file_status()
+
     def update_status(self, update_index=False):
         # Give observers a chance to respond
         self.notify_observers(self.message_about_to_update)
+        snapshot.instance().invalidate()
         self._update_files(update_index=update_index)
         self._update_refs()
         self._update_branches_and_tags()
@@ -177,14 +272,25 @@ class MainModel(Observable):
         self.notify_observers(self.message_updated)
 
     def _update_files(self, update_index=False):
-        state = gitcmds.worktree_state_dict(head=self.head,
-                                            update_index=update_index)
+        state = gitcmds.worktree_state_dict(
+                head=self.head, update_index=update_index,
+                expanded_untracked=self.expanded_untracked)
         self.staged = state.get('staged', [])
         self.modified = state.get('modified', [])
         self.unmerged = state.get('unmerged', [])
         self.untracked = state.get('untracked', [])
         self.submodules = state.get('submodules', set())
         self.upstream_changed = state.get('upstream_changed', [])
+        self._update_status_index()
+        # Resolve per-file encodings for all paths in a single call
+        _config.update_file_encodings(self.staged + self.unstaged)
+
+    def _update_status_index(self):
+        self.status_index = StatusIndex(staged=self.staged,
+                                        modified=self.modified,
+                                        unmerged=self.unmerged,
+                                        untracked=self.untracked,
+                                        upstream_changed=self.upstream_changed)
 
     def _update_refs(self):
         self.remotes = self.git.remote().splitlines()
@@ -194,10 +300,11 @@ class MainModel(Observable):
         self.currentbranch = gitcmds.current_branch()
 
     def _update_branches_and_tags(self):
-        local_branches, remote_branches, tags = gitcmds.all_refs(split=True)
-        self.local_branches = local_branches
-        self.remote_branches = remote_branches
-        self.tags = tags
+        refs = snapshot.instance().all_refs(split=True)
+        local_branches, remote_branches, tags = refs
+        self.local_branches = list(local_branches)
+        self.remote_branches = list(remote_branches)
+        self.tags = list(tags)
 
     def delete_branch(self, branch):
         return self.git.branch(branch,
@@ -205,49 +312,29 @@ class MainModel(Observable):
                                with_stderr=True,
                                with_status=True)
 
-    def _sliced_op(self, input_items, map_fn, size=42):
-        items = copy.copy(input_items)
-        full_status = 0
-        full_output = []
-        while len(items) > 0:
-            status, output = map_fn(items[:size])
-            full_status = full_status or status
-            full_output.append(output)
-            items = items[size:]
-        return (full_status, '\n'.join(full_output))
-
-    def _sliced_add(self, input_items, size=42):
-        lambda_fn = lambda x: self.git.add('--',
-                                           v=True,
-                                           with_stderr=True,
-                                           with_status=True,
-                                           *x)
-        return self._sliced_op(input_items, lambda_fn)
-
     def stage_modified(self):
-        status, output = self._sliced_add(self.modified)
-        self.update_file_status()
+        paths = self.modified
+        status, output = gitcmds.add_paths(paths, git=self.git)
+        self.update_path_status(paths)
         return (status, output)
 
     def stage_untracked(self):
-        status, output = self._sliced_add(self.untracked)
-        self.update_file_status()
+        paths = self.untracked
+        status, output = gitcmds.add_paths(paths, git=self.git)
+        self.update_path_status(paths)
         return (status, output)
 
     def reset(self, *items):
-        lambda_fn = lambda x: self.git.reset('--',
-                                             with_stderr=True,
-                                             with_status=True,
-                                             *x)
-        status, output = self._sliced_op(items, lambda_fn)
-        self.update_file_status()
+        status, output = gitcmds.reset_paths(items, head=None, git=self.git)
+        self.update_path_status(items)
         return (status, output)
 
     def unstage_all(self):
+        paths = self.staged + self.unmerged
         status, output = self.git.reset(self.head, '--', '.',
                                         with_stderr=True,
                                         with_status=True)
-        self.update_file_status()
+        self.update_path_status(paths)
         return (status, output)
 
     def stage_all(self):
@@ -404,12 +491,8 @@ class MainModel(Observable):
         return bool(self.git.branch(r=True, contains=head))
 
     def everything(self):
-        """Returns a sorted list of all files, including untracked files."""
-        ls_files = self.git.ls_files(z=True,
-                                     cached=True,
-                                     others=True,
-                                     exclude_standard=True)
-        return sorted(map(core.decode, [f for f in ls_files.split('\0') if f]))
+        """Returns a sorted tuple of all files, including untracked files."""
+        return snapshot.instance().everything()
 
     def stage_paths(self, paths):
         """Stages add/removals to git."""
@@ -417,29 +500,9 @@ class MainModel(Observable):
             self.stage_all()
             return
 
-        add = []
-        remove = []
-
-        for path in set(paths):
-            if os.path.exists(core.encode(path)):
-                add.append(path)
-            else:
-                remove.append(path)
-
         self.notify_observers(self.message_about_to_update)
-
-        # `git add -u` doesn't work on untracked files
-        if add:
-            self._sliced_add(add)
-
-        # If a path doesn't exist then that means it should be removed
-        # from the index.   We use `git add -u` for that.
-        if remove:
-            while remove:
-                self.git.add('--', u=True, with_stderr=True, *remove[:42])
-                remove = remove[42:]
-
-        self._update_files()
+        gitcmds.add_paths(paths, git=self.git)
+        self._update_path_status(paths)
         self.notify_observers(self.message_updated)
 
     def unstage_paths(self, paths):
@@ -447,11 +510,11 @@ class MainModel(Observable):
             self.unstage_all()
             return
         gitcmds.unstage_paths(paths, head=self.head)
-        self.update_file_status()
+        self.update_path_status(paths)
 
     def untrack_paths(self, paths):
         status, out = gitcmds.untrack_paths(paths, head=self.head)
-        self.update_file_status()
+        self.update_path_status(paths)
         return status, out
 
     def getcwd(self):
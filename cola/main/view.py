@@ -11,21 +11,17 @@ import cola
 from cola import core
 from cola import gitcmds
 from cola import guicmds
-from cola import merge
 from cola import signals
 from cola import gitcfg
+from cola import profiler
 from cola import qtutils
 from cola import qtcompat
 from cola import qt
 from cola import resources
 from cola import settings
-from cola import stash
+from cola import tasks
 from cola import utils
 from cola import version
-from cola.bookmarks import manage_bookmarks
-from cola.classic import cola_classic
-from cola.classic import classic_widget
-from cola.dag import git_dag
 from cola.git import git
 from cola.prefs import PreferencesModel
 from cola.prefs import preferences
@@ -40,22 +36,34 @@ from cola.qtutils import emit
 from cola.qtutils import log
 from cola.qtutils import relay_signal
 from cola.qtutils import tr
+from cola.utils import lazy_callable
 from cola.widgets import cfgactions
-from cola.widgets import editremotes
-from cola.widgets import remote
-from cola.widgets.about import launch_about_dialog
-from cola.widgets.about import show_shortcuts
-from cola.widgets.archive import GitArchiveDialog
 from cola.widgets.commitmsg import CommitMessageEditor
-from cola.widgets.compare import compare_branches
-from cola.widgets.createtag import create_tag
-from cola.widgets.createbranch import create_new_branch
 from cola.widgets.diff import DiffEditor
-from cola.widgets.recent import browse_recent
 from cola.widgets.status import StatusWidget
-from cola.widgets.search import search
 from cola.widgets.standard import MainWindow
 
+# Dialogs and tools are imported when they are first used
+abort_merge = lazy_callable('cola.merge', 'abort_merge')
+browse_recent = lazy_callable('cola.widgets.recent', 'browse_recent')
+cola_classic = lazy_callable('cola.classic', 'cola_classic')
+compare_branches = lazy_callable('cola.widgets.compare', 'compare_branches')
+create_new_branch = lazy_callable('cola.widgets.createbranch',
+                                  'create_new_branch')
+create_tag = lazy_callable('cola.widgets.createtag', 'create_tag')
+edit_remotes = lazy_callable('cola.widgets.editremotes', 'edit')
+fetch = lazy_callable('cola.widgets.remote', 'fetch')
+git_dag = lazy_callable('cola.dag', 'git_dag')
+launch_about_dialog = lazy_callable('cola.widgets.about',
+                                    'launch_about_dialog')
+local_merge = lazy_callable('cola.merge', 'local_merge')
+manage_bookmarks = lazy_callable('cola.bookmarks', 'manage_bookmarks')
+pull = lazy_callable('cola.widgets.remote', 'pull')
+push = lazy_callable('cola.widgets.remote', 'push')
+search = lazy_callable('cola.widgets.search', 'search')
+show_shortcuts = lazy_callable('cola.widgets.about', 'show_shortcuts')
+stash = lazy_callable('cola.stash', 'stash')
+
 
 class MainView(MainWindow):
     def __init__(self, model, parent):
@@ -82,9 +90,12 @@ class MainView(MainWindow):
         self.classic_dockable = (cfg.get('cola.browserdockable') or
                                  cfg.get('cola.classicdockable'))
         if self.classic_dockable:
+            # The browser is built when its dock is first shown
             self.classicdockwidget = create_dock('Browser', self)
-            self.classicwidget = classic_widget(self)
-            self.classicdockwidget.setWidget(self.classicwidget)
+            self.classicwidget = None
+            self.connect(self.classicdockwidget,
+                         SIGNAL('visibilityChanged(bool)'),
+                         self._classic_visibility_changed)
 
         # "Actions" widget
         self.actionsdockwidget = create_dock('Action', self)
@@ -101,8 +112,10 @@ class MainView(MainWindow):
         self.actionsdockwidget.setWidget(self.actionsdockwidgetcontents)
 
         # "Repository Status" widget
+        profiler.begin('StatusWidget')
         self.statusdockwidget = create_dock('Status', self)
         self.statusdockwidget.setWidget(StatusWidget(self))
+        profiler.end('StatusWidget')
 
         # "Commit Message Editor" widget
         self.position_label = QtGui.QLabel()
@@ -113,7 +126,9 @@ class MainView(MainWindow):
         titlebar = self.commitdockwidget.titleBarWidget()
         titlebar.add_corner_widget(self.position_label)
 
+        profiler.begin('CommitMessageEditor')
         self.commitmsgeditor = CommitMessageEditor(model, self)
+        profiler.end('CommitMessageEditor')
         relay_signal(self, self.commitmsgeditor, SIGNAL(signals.amend_mode))
         relay_signal(self, self.commitmsgeditor, SIGNAL(signals.signoff))
         relay_signal(self, self.commitmsgeditor,
@@ -126,8 +141,10 @@ class MainView(MainWindow):
         self.logdockwidget.setWidget(logwidget)
 
         # "Diff Viewer" widget
+        profiler.begin('DiffEditor')
         self.diffdockwidget = create_dock('Diff', self)
         self.diff_editor = DiffEditor(self.diffdockwidget)
+        profiler.end('DiffEditor')
         self.diffdockwidget.setWidget(self.diff_editor)
 
         # All Actions
@@ -158,7 +175,7 @@ class MainView(MainWindow):
                 QtGui.QKeySequence.Preferences, 'Ctrl+O')
 
         self.menu_edit_remotes = add_action(self,
-                'Edit Remotes...', lambda: editremotes.edit().exec_())
+                'Edit Remotes...', lambda: edit_remotes().exec_())
         self.menu_rescan = add_action(self,
                 'Rescan', emit(self, signals.rescan_and_refresh), 'Ctrl+R')
         self.menu_rescan.setIcon(qtutils.reload_icon())
@@ -182,24 +199,24 @@ class MainView(MainWindow):
         self.menu_grep = add_action(self,
                 'Grep', guicmds.grep)
         self.menu_merge_local = add_action(self,
-                'Merge...', merge.local_merge)
+                'Merge...', local_merge)
 
         self.menu_merge_abort = add_action(self,
-                'Abort Merge...', merge.abort_merge)
+                'Abort Merge...', abort_merge)
 
         self.menu_fetch = add_action(self,
-                'Fetch...', remote.fetch)
+                'Fetch...', fetch)
         self.menu_push = add_action(self,
-                'Push...', remote.push)
+                'Push...', push)
         self.menu_pull = add_action(self,
-                'Pull...', remote.pull)
+                'Pull...', pull)
 
         self.menu_open_repo = add_action(self,
                 'Open...', guicmds.open_repo)
         self.menu_open_repo.setIcon(qtutils.open_icon())
 
         self.menu_stash = add_action(self,
-                'Stash...', stash.stash, 'Alt+Shift+S')
+                'Stash...', stash, 'Alt+Shift+S')
 
         self.menu_clone_repo = add_action(self,
                 'Clone...', guicmds.clone_repo)
@@ -407,10 +424,10 @@ class MainView(MainWindow):
         # Add button callbacks
         connect_button(self.rescan_button,
                        emit(self, signals.rescan_and_refresh))
-        connect_button(self.fetch_button, remote.fetch)
-        connect_button(self.push_button, remote.push)
-        connect_button(self.pull_button, remote.pull)
-        connect_button(self.stash_button, stash.stash)
+        connect_button(self.fetch_button, fetch)
+        connect_button(self.push_button, push)
+        connect_button(self.pull_button, pull)
+        connect_button(self.stash_button, stash)
 
         connect_button(self.stage_button, self.stage)
         connect_button(self.unstage_button, self.unstage)
@@ -456,6 +473,13 @@ class MainView(MainWindow):
     # Accessors
     mode = property(lambda self: self.model.mode)
 
+    def _classic_visibility_changed(self, visible):
+        if not visible or self.classicwidget is not None:
+            return
+        from cola.classic import classic_widget
+        self.classicwidget = classic_widget(self)
+        self.classicdockwidget.setWidget(self.classicwidget)
+
     def _config_updated(self, source, config, value):
         if config == 'cola.fontdiff':
             # The diff font
@@ -485,17 +509,17 @@ class MainView(MainWindow):
 
     def _start_config_actions_task(self):
         """Do the expensive "get_config_actions()" call in the background"""
-        class ConfigActionsTask(QtCore.QRunnable):
+        class ConfigActionsTask(tasks.Task):
             def __init__(self, sender):
-                QtCore.QRunnable.__init__(self)
+                tasks.Task.__init__(self)
                 self._sender = sender
             def run(self):
                 names = cfgactions.get_config_actions()
                 self._sender.emit(SIGNAL('install_config_actions'), names)
 
         task = ConfigActionsTask(self)
-        QtCore.QThreadPool.globalInstance().start(task)
-        return task
+        return tasks.submit(task, queue=tasks.ACTIONS,
+                            key='install_config_actions')
 
     def _install_config_actions(self, names):
         """Install .gitconfig-defined actions"""
@@ -581,6 +605,7 @@ class MainView(MainWindow):
             connect_action(action, focusdock)
 
     def save_archive(self):
+        from cola.widgets.archive import GitArchiveDialog
         ref = git.rev_parse('HEAD')
         shortref = ref[:7]
         GitArchiveDialog.save(ref, shortref, self)
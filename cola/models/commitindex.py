@@ -0,0 +1,271 @@
+"""Provides an inverted index of commit messages and identities."""
+
+import re
+import threading
+
+from cola import core
+from cola import gitcfg
+from cola import gitcmds
+from cola import utils
+from cola.compat import set
+from cola.decorators import memoize
+from cola.git import git
+from cola.models import jsonfile
+from cola.models.completion import CompletionIndex
+from cola.models.lastmodified import read_tokens
+
+# Bumped whenever the on-disk index format changes
+INDEX_VERSION = 2
+
+# Indexed fields
+MESSAGE = 'message'
+AUTHOR = 'author'
+COMMITTER = 'committer'
+FIELDS = (MESSAGE, AUTHOR, COMMITTER)
+
+# Marks the start of each commit in the log output
+COMMIT_MARKER = '\x01'
+# Separates the fields of each commit
+FIELD_SEPARATOR = '\x02'
+
+# Queries containing these characters can match text that does not
+# contain their literal words, so they cannot use the index
+REGEX_CHARS = set('\\[](){}?*+|')
+
+WORD_REGEX = re.compile(r'\w+', re.UNICODE)
+
+
+@memoize
+def instance():
+    """Return the static CommitIndex instance"""
+    return CommitIndex()
+
+
+def enabled():
+    """Return True when the search index is enabled by cola.searchindex"""
+    return gitcfg.instance().get('cola.searchindex', False) is True
+
+
+def update():
+    """Bring the commit index up to date with the current refs"""
+    instance().sync()
+
+
+def words(text):
+    """Return the lowercase words in text"""
+    return WORD_REGEX.findall(text.lower())
+
+
+def query_words(query):
+    """Return the words that any match for query must contain
+
+    Returns None when the query uses regular expression syntax that
+    makes the words optional.
+
+    """
+    for char in query:
+        if char in REGEX_CHARS:
+            return None
+    result = words(query)
+    if not result:
+        return None
+    return result
+
+
+class CommitIndex(object):
+    """Maps the words in commit messages and identities to commits.
+
+    The index covers every commit reachable from `git log --all`.  It is
+    stored in $GIT_DIR/cola/commitindex.json together with the ref tips
+    it was built from.  Only commits that are new since then are read
+    when the refs move.  The index is rebuilt when a previously indexed
+    tip is no longer reachable, e.g. after a rebase.
+
+    The index only narrows a query down to candidate commits.  git still
+    applies the query to those candidates, so results match a full
+    `git log --all` search exactly.  Identities are indexed both as
+    written and after applying the mailmap, because --author and
+    --committer only use the mailmap when git is configured to.
+
+    """
+    def __init__(self, git=git):
+        self.git = git
+        self.tips = []
+        self.commits = []
+        self.postings = dict([(field, {}) for field in FIELDS])
+        self._file = None
+        self._vocabulary = {}
+        self._lock = threading.Lock()
+
+    def path(self):
+        return self.git.git_path('cola', 'commitindex.json')
+
+    def candidates(self, field, query):
+        """Return the commits that may match query in field
+
+        Returns None when the query cannot be answered by the index, and
+        when the index is busy or out of date.  The index is never synced
+        here, so that searches do not wait for it; sync() is run in the
+        background instead.
+
+        """
+        query = query_words(query)
+        if query is None:
+            return None
+        if not self._lock.acquire(False):
+            return None
+        try:
+            if self._file != self.path():
+                return None
+            if gitcmds.ref_tips(git=self.git) != self.tips:
+                return None
+            result = None
+            for word in query:
+                ids = self._lookup(field, word)
+                if result is None:
+                    result = ids
+                else:
+                    result.intersection_update(ids)
+                if not result:
+                    break
+            # git sorts the candidates by date
+            commits = self.commits
+            return [commits[i] for i in result]
+        finally:
+            self._lock.release()
+
+    def sync(self):
+        """Bring the index up to date with the current refs"""
+        self._lock.acquire()
+        try:
+            self._sync()
+        finally:
+            self._lock.release()
+
+    def _lookup(self, field, word):
+        """Return the ids of commits with a token containing word"""
+        postings = self.postings[field]
+        vocabulary = self._vocabulary.get(field)
+        if vocabulary is None:
+            vocabulary = self._vocabulary[field] = CompletionIndex(postings)
+        result = set()
+        items = vocabulary.items
+        for idx in vocabulary.candidates(word, case_sensitive=True):
+            value = postings[items[idx]]
+            if type(value) is not list:
+                # Postings are decoded on first use
+                value = postings[items[idx]] = [int(i) for i in value.split()]
+            result.update(value)
+        return result
+
+    def _sync(self):
+        """Bring the index up to date with the current refs"""
+        path = self.path()
+        if path != self._file:
+            self._file = path
+            self.load()
+        tips = gitcmds.ref_tips(git=self.git)
+        if tips == self.tips:
+            return
+        removed = set(self.tips).difference(tips)
+        if removed and not gitcmds.reachable(removed, tips, git=self.git):
+            self._reset()
+        if self.tips:
+            args = tips + ['--not'] + self.tips
+        else:
+            args = ['--all']
+        self._add_commits(args)
+        self.tips = tips
+        self._vocabulary = {}
+        self.save()
+
+    def _reset(self):
+        self.tips = []
+        self.commits = []
+        self.postings = dict([(field, {}) for field in FIELDS])
+
+    def _add_commits(self, args):
+        """Index the commits listed by `git log args`"""
+        postings = self.postings
+        commits = self.commits
+        for sha1, fields in log_commits(args):
+            commit_id = len(commits)
+            commits.append(sha1)
+            for field in FIELDS:
+                field_postings = postings[field]
+                for token in set(words(fields[field])):
+                    try:
+                        value = field_postings[token]
+                    except KeyError:
+                        field_postings[token] = [commit_id]
+                        continue
+                    if type(value) is not list:
+                        value = field_postings[token] = [
+                                int(i) for i in value.split()]
+                    value.append(commit_id)
+
+    def load(self):
+        """Load the index from disk"""
+        self._reset()
+        values = jsonfile.read(self._file)
+        if type(values) is not dict or values.get('version') != INDEX_VERSION:
+            return
+        try:
+            postings = dict([(field, values['postings'][field])
+                             for field in FIELDS])
+            self.commits = list(values['commits'])
+            self.tips = list(values['tips'])
+            self.postings = postings
+        except (KeyError, TypeError):
+            self._reset()
+
+    def save(self):
+        """Write the index to disk"""
+        postings = {}
+        for field in FIELDS:
+            postings[field] = dict([(token, _encode_ids(ids))
+                                    for token, ids
+                                    in self.postings[field].iteritems()])
+        values = {
+            'version': INDEX_VERSION,
+            'tips': self.tips,
+            'commits': self.commits,
+            'postings': postings,
+        }
+        jsonfile.write(self._file, values)
+
+
+def _encode_ids(ids):
+    """Encode a posting list as a compact string"""
+    if type(ids) is not list:
+        return ids
+    return ' '.join([str(i) for i in ids])
+
+
+def log_commits(args):
+    """Yield (sha1, fields) for each commit listed by `git log args`"""
+    identities = ('%aN <%aE> %an <%ae>', '%cN <%cE> %cn <%ce>')
+    cmd = ['git', 'log', '-z', '--no-color',
+           '--pretty=format:' + COMMIT_MARKER +
+           FIELD_SEPARATOR.join(('%H',) + identities + ('%B',))]
+    cmd.extend([core.encode(arg) for arg in args])
+    proc = utils.start_command(cmd)
+    proc.stdin.close()
+    try:
+        for token in read_tokens(proc.stdout):
+            token = token.lstrip(COMMIT_MARKER)
+            try:
+                sha1, author, committer, message = token.split(
+                        FIELD_SEPARATOR, 3)
+            except ValueError:
+                continue
+            yield sha1, {
+                MESSAGE: core.decode(message),
+                AUTHOR: core.decode(author),
+                COMMITTER: core.decode(committer),
+            }
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
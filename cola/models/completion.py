@@ -0,0 +1,298 @@
+"""Provides in-memory indexes for completing refs and paths."""
+
+import bisect
+import heapq
+import re
+from array import array
+
+from cola import utils
+from cola.compat import set
+
+
+def trigrams(text):
+    """Return the set of three-character substrings in text."""
+    return set([text[i:i+3] for i in xrange(len(text) - 2)])
+
+
+# Characters that start a new word within a path or ref name
+SEPARATORS = set('/_-. ')
+
+# Number of items examined between cancellation checkpoints
+CHECKPOINT_INTERVAL = 4096
+
+# Larger indexes only scan items that contain every character of the
+# query for subsequence matches
+FUZZY_SCAN_SIZE = 20000
+
+
+class Cancelled(Exception):
+    """Raised at a checkpoint when a query has been superseded"""
+
+
+def checkpoint(cancelled):
+    """Raise Cancelled when the `cancelled` callback returns True"""
+    if cancelled is not None and cancelled():
+        raise Cancelled()
+
+
+def fuzzy_score(needle, value, item):
+    """Score how well needle matches value as a subsequence
+
+    `value` is `item` after applying the case-sensitivity policy,
+    i.e. item.lower() for case-insensitive matching.  `item` is used
+    to detect camelCase word boundaries.
+
+    Returns None when needle is not a subsequence of value.
+    Consecutive characters, matches at the start of a path segment
+    or word, and camelCase humps earn bonuses; leading characters
+    that are skipped before the first match are penalized.
+
+    """
+    score = 0
+    first = None
+    prev = -1
+    find = value.find
+    for idx, char in enumerate(needle):
+        pos = find(char, prev + 1)
+        if pos < 0:
+            return None
+        # Prefer a later word boundary over an arbitrary mid-word match
+        # as long as the rest of the needle can still be matched.
+        if ((first is None or pos != prev + 1) and
+                not is_boundary(value, item, pos)):
+            boundary = find(char, pos + 1)
+            while boundary >= 0 and not is_boundary(value, item, boundary):
+                boundary = find(char, boundary + 1)
+            if (boundary >= 0 and
+                    is_subsequence(needle[idx+1:], value, boundary + 1)):
+                pos = boundary
+        if first is None:
+            first = pos
+        elif pos == prev + 1:
+            score += 5
+        score += 1
+        if pos == 0 or value[pos-1] in SEPARATORS:
+            score += 8
+        elif is_boundary(value, item, pos):
+            score += 6
+        prev = pos
+    score -= min(first, 10)
+    return score
+
+
+def is_boundary(value, item, pos):
+    """Return True when pos starts a word in item"""
+    return (pos == 0 or value[pos-1] in SEPARATORS or
+            (item[pos].isupper() and item[pos-1].islower()))
+
+
+def is_subsequence(needle, value, start=0):
+    """Return True when needle's characters appear in order in value"""
+    find = value.find
+    pos = start - 1
+    for char in needle:
+        pos = find(char, pos + 1)
+        if pos < 0:
+            return False
+    return True
+
+
+def subsequence_regex(needle, case_sensitive):
+    """Return a regex that matches strings containing needle's characters"""
+    pattern = '.*?'.join([re.escape(char) for char in needle])
+    if case_sensitive:
+        return re.compile(pattern, re.UNICODE)
+    return re.compile(pattern, re.UNICODE | re.IGNORECASE)
+
+
+def scan(haystack, predicate, indexes=None, cancelled=None):
+    """Return the indexes whose haystack value satisfies predicate
+
+    All of haystack is examined when `indexes` is None.  The indexes
+    are examined in chunks with a cancellation checkpoint between
+    each chunk.
+
+    """
+    if indexes is None:
+        count = len(haystack)
+    else:
+        count = len(indexes)
+    result = []
+    for start in xrange(0, count, CHECKPOINT_INTERVAL):
+        checkpoint(cancelled)
+        end = min(start + CHECKPOINT_INTERVAL, count)
+        if indexes is None:
+            chunk = xrange(start, end)
+        else:
+            chunk = indexes[start:end]
+        result.extend([i for i in chunk if predicate(haystack[i])])
+    return result
+
+
+class CompletionIndex(object):
+    """Answers prefix, substring and fuzzy queries over a fixed set of strings.
+
+    The index is built once per status refresh and then shared by every
+    query until the next refresh.  Items are kept sorted by their
+    lowercase form so that prefix lookups are a binary search.
+    Substring lookups intersect the posting lists of the query's
+    trigrams so that only candidates that can possibly match are
+    checked.
+
+    """
+    def __init__(self, items):
+        decorated = sorted(set(items), key=lambda x: (x.lower(), x))
+        self.items = tuple(decorated)
+        self.lower = tuple([x.lower() for x in self.items])
+        self._trigrams = None
+        self._chars = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def prefix(self, text, case_sensitive=False):
+        """Return the indexes of items that start with text."""
+        lower = self.lower
+        text_lower = text.lower()
+        start = bisect.bisect_left(lower, text_lower)
+        end = bisect.bisect_right(lower, text_lower + u'\uffff', lo=start)
+        if not case_sensitive:
+            return xrange(start, end)
+        items = self.items
+        return [i for i in xrange(start, end) if items[i].startswith(text)]
+
+    def candidates(self, text, case_sensitive=False, cancelled=None):
+        """Return the indexes of items that contain text
+
+        `cancelled` is an optional callback that is polled every
+        CHECKPOINT_INTERVAL items; Cancelled is raised once it returns True.
+
+        """
+        if not text:
+            return xrange(len(self.items))
+        if case_sensitive:
+            haystack = self.items
+            needle = text
+        else:
+            haystack = self.lower
+            needle = text.lower()
+        if len(needle) < 3:
+            return scan(haystack, lambda value: needle in value,
+                        cancelled=cancelled)
+        postings = self._postings(needle.lower())
+        if postings is None:
+            return []
+        return scan(haystack, lambda value: needle in value,
+                    indexes=postings, cancelled=cancelled)
+
+    def fuzzy_search(self, text, case_sensitive=False, limit=None,
+                     cancelled=None):
+        """Return the best fuzzy matches for text, best match first
+
+        Substring matches are found using the trigram index.  When there
+        are fewer than `limit` of them the index is also scanned for
+        subsequence matches.  Indexes of more than FUZZY_SCAN_SIZE items
+        only scan the items that contain every character of the text,
+        which are found by intersecting per-character posting lists.
+        Every candidate is scored by fuzzy_score() and only the top
+        `limit` results are kept using a heap.
+
+        The `cancelled` callback is polled between chunks of work so that
+        a superseded query can be abandoned early; see candidates().
+
+        """
+        items = self.items
+        if not text:
+            if limit is None:
+                return list(items)
+            return list(items[:limit])
+
+        if case_sensitive:
+            haystack = items
+            needle = text
+        else:
+            haystack = self.lower
+            needle = text.lower()
+
+        indexes = self.candidates(text, case_sensitive=case_sensitive,
+                                  cancelled=cancelled)
+        search = subsequence_regex(needle, case_sensitive=True).search
+        if limit is None or len(indexes) < limit:
+            if len(items) <= FUZZY_SCAN_SIZE:
+                postings = None
+            else:
+                postings = self._intersect(self._char_index(),
+                                           set(needle.lower())) or []
+            indexes = scan(haystack, search, indexes=postings,
+                           cancelled=cancelled)
+
+        scored = []
+        for count, idx in enumerate(indexes):
+            if not count % CHECKPOINT_INTERVAL:
+                checkpoint(cancelled)
+            item = items[idx]
+            value = haystack[idx]
+            score = fuzzy_score(needle, value, item)
+            if score is not None:
+                scored.append((-score, len(item), self.lower[idx], item))
+        if limit is None:
+            scored.sort()
+        else:
+            scored = heapq.nsmallest(limit, scored)
+        return [entry[-1] for entry in scored]
+
+    def _postings(self, text):
+        """Intersect the posting lists for each trigram in text."""
+        return self._intersect(self._trigram_index(), trigrams(text))
+
+    def _intersect(self, index, keys):
+        """Return the sorted indexes listed under every key, or None"""
+        lists = []
+        for key in keys:
+            try:
+                lists.append(index[key])
+            except KeyError:
+                return None
+        lists.sort(key=len)
+        result = set(lists[0])
+        for other in lists[1:]:
+            result.intersection_update(other)
+            if not result:
+                break
+        return sorted(result)
+
+    def _trigram_index(self):
+        """Build the trigram index on first use."""
+        if self._trigrams is None:
+            index = {}
+            for idx, item in enumerate(self.lower):
+                for trigram in trigrams(item):
+                    try:
+                        index[trigram].append(idx)
+                    except KeyError:
+                        index[trigram] = array('l', [idx])
+            self._trigrams = index
+        return self._trigrams
+
+    def _char_index(self):
+        """Build the per-character index on first use."""
+        if self._chars is None:
+            index = {}
+            for idx, item in enumerate(self.lower):
+                for char in set(item):
+                    try:
+                        index[char].append(idx)
+                    except KeyError:
+                        index[char] = array('l', [idx])
+            self._chars = index
+        return self._chars
+
+
+class PathCompletionIndex(CompletionIndex):
+    """A CompletionIndex over paths and their synthesized parent dirs."""
+    def __init__(self, paths):
+        files = set(paths)
+        files_and_dirs = utils.add_parents(set(files))
+        CompletionIndex.__init__(self, files_and_dirs)
+        self.dirs = frozenset(files_and_dirs.difference(files))
+
@@ -0,0 +1,133 @@
+"""Runs `git grep` and streams its results."""
+
+import subprocess
+
+from cola import core
+from cola import utils
+from cola import version
+from cola.decorators import memoize
+from cola.models import stream
+
+# Matches shown before "Load More" is needed
+RESULT_LIMIT = 1000
+
+# Lines delivered per batch, and the longest time a batch is held back
+BATCH_SIZE = 200
+BATCH_INTERVAL = 0.1
+
+
+@memoize
+def thread_count():
+    """Return the number of grep worker threads, or None for git's default"""
+    if not version.check('grep-threads', version.git_version()):
+        return None
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def parse_count(line):
+    """Parse a "path:count" line from `git grep -c`"""
+    path, count = line.rsplit(':', 1)
+    return path, int(count)
+
+
+class GrepSearch(object):
+    """Streams the output of a single `git grep` invocation.
+
+    Results are read line by line so that they can be displayed while
+    git is still searching.  Reading pauses once `limit` lines have been
+    read; git blocks once the reader's queue is full until more lines
+    are requested.  cancel() terminates the git process.
+
+    When `counts` is True, one "path:count" line is produced per
+    matching file instead of the matching lines.  `paths` limits the
+    search to the given paths.  git searches with one worker thread per
+    core; it keeps its output in path order.
+
+    """
+    def __init__(self, args, counts=False, paths=None):
+        self.args = args
+        self.counts = counts
+        self.paths = paths
+        self.count = 0
+        self.status = None
+        self.cancelled = False
+        self._proc = None
+        self._reader = None
+
+    def exhausted(self):
+        """Return True once git has exited and every line was read"""
+        return self.status is not None
+
+    def read(self, limit, batch_size=BATCH_SIZE, interval=BATCH_INTERVAL):
+        """Yield lists of result lines until `limit` lines have been read
+
+        A pending batch is delivered after `interval` seconds even when
+        git has not produced another line.  A cancelled git process is
+        reaped here, on the reading thread.
+
+        """
+        if self._proc is None and not self.cancelled:
+            cmd = ['git', 'grep', '--no-color']
+            if self.counts:
+                cmd.append('-c')
+            else:
+                cmd.append('-n')
+            threads = thread_count()
+            if threads:
+                cmd.append('--threads=%d' % threads)
+            cmd.extend([core.encode(arg) for arg in self.args])
+            if self.paths:
+                cmd.append('--')
+                cmd.extend([core.encode(path) for path in self.paths])
+            self._proc = utils.start_command(cmd, stderr=subprocess.STDOUT)
+            self._proc.stdin.close()
+            self._reader = stream.LineReader(self._proc.stdout)
+        for batch in stream.batched(self._lines(limit, interval),
+                                    batch_size, interval):
+            if self.cancelled:
+                break
+            yield batch
+        if self.cancelled:
+            self._reap()
+
+    def _lines(self, limit, timeout):
+        """Yield result lines, or None when git is quiet for timeout"""
+        while self.count < limit and not self.exhausted():
+            if self.cancelled:
+                break
+            line = self._reader.readline(timeout)
+            if line is None:
+                yield None
+                continue
+            if not line:
+                self._finish()
+                break
+            self.count += 1
+            yield core.decode(line.rstrip('\n'))
+
+    def cancel(self):
+        """Stop the search and terminate git"""
+        self.cancelled = True
+        proc = self._proc
+        if proc is not None and proc.poll() is None:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+        if self._reader is not None:
+            self._reader.close()
+
+    def _finish(self):
+        proc = self._proc
+        proc.stdout.close()
+        self.status = proc.wait()
+
+    def _reap(self):
+        """Wait for git to exit after cancel() killed it"""
+        proc = self._proc
+        if proc is not None and self.status is None:
+            self.status = proc.wait()
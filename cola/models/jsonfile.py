@@ -0,0 +1,47 @@
+"""Reads and writes the JSON files that cache data under $GIT_DIR/cola."""
+
+import os
+try:
+    import simplejson
+    json = simplejson
+except ImportError:
+    import json
+
+from cola import utils
+
+
+def read(path):
+    """Return the values stored in path, or None when it cannot be read"""
+    try:
+        fh = open(path, 'rb')
+        try:
+            return json.load(fh)
+        finally:
+            fh.close()
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def write(path, values):
+    """Write values to path atomically
+
+    The values are written to a temporary file that replaces path, so
+    readers never see a partial file.  Errors are ignored because the
+    files only cache data that can be computed again.
+
+    """
+    tmp = path + '.tmp'
+    try:
+        parent = os.path.dirname(path)
+        if not os.path.isdir(parent):
+            os.makedirs(parent)
+        fh = open(tmp, 'wb')
+        try:
+            json.dump(values, fh)
+        finally:
+            fh.close()
+        if utils.is_win32() and os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp, path)
+    except (IOError, OSError):
+        pass
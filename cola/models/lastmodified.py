@@ -0,0 +1,331 @@
+"""Finds the last commit that touched each of a set of paths."""
+
+import atexit
+import collections
+import threading
+import time
+
+from cola import core
+from cola import gitcmds
+from cola import utils
+from cola.compat import set
+from cola.decorators import memoize
+from cola.git import git
+from cola.models import jsonfile
+
+CommitInfo = collections.namedtuple('CommitInfo',
+                                    'sha1 timestamp author subject')
+
+# Marks the start of each commit in the log output
+COMMIT_MARKER = '\x01'
+# Separates the fields of each commit header
+FIELD_SEPARATOR = '\x02'
+
+# Beyond this many directories the walk is not limited by pathspecs
+MAX_PATHSPECS = 64
+
+# Bumped whenever the on-disk index format changes
+INDEX_VERSION = 1
+
+# Changes are written to disk at most once per this many seconds
+SAVE_DELAY = 5.0
+
+
+@memoize
+def instance():
+    """Return the static LastModifiedIndex instance"""
+    index = LastModifiedIndex()
+    atexit.register(index.flush)
+    return index
+
+
+class LastModifiedIndex(object):
+    """Persists the last commit that touched each path.
+
+    Entries are stored in $GIT_DIR/cola/lastmodified.json together with
+    the HEAD commit they were computed against.  When HEAD moves forward
+    only the new commits are walked to bring the index up to date.  The
+    index is discarded when the old HEAD is no longer an ancestor,
+    e.g. after a rebase.
+
+    Paths without any history are remembered too so that untracked
+    files do not trigger a walk of the entire history every time.
+    Paths that the caller already knows to be untracked are not looked
+    up at all.
+
+    Lookups that change the index only mark it dirty.  It is written
+    SAVE_DELAY seconds later, so that expanding many directories in a
+    row writes the file once; flush() writes it immediately.
+
+    """
+    def __init__(self, git=git):
+        self.git = git
+        self.head = None
+        self.entries = {}
+        self.missing = set()
+        self._file = None
+        self._dirty = False
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def path(self):
+        return self.git.git_path('cola', 'lastmodified.json')
+
+    def lookup(self, paths, untracked=()):
+        """Return a dict mapping paths to their last CommitInfo
+
+        `untracked` lists paths that have no history, e.g. according to
+        the status index, so that they never start a history walk.
+
+        """
+        self._lock.acquire()
+        try:
+            return self._lookup(paths, untracked)
+        finally:
+            self._lock.release()
+
+    def _lookup(self, paths, untracked):
+        head = self._current_head()
+        if not head:
+            return {}
+        changed = self._sync(head)
+
+        entries = self.entries
+        untracked = set(untracked)
+        pending = [p for p in paths
+                   if p not in entries and p not in self.missing and
+                   p not in untracked]
+        if pending:
+            found = last_commits(pending, ref=head)
+            entries.update(found)
+            self.missing.update([p for p in pending if p not in found])
+            changed = True
+        if changed:
+            self._schedule_save()
+
+        result = {}
+        for path in paths:
+            try:
+                result[path] = entries[path]
+            except KeyError:
+                pass
+        return result
+
+    def flush(self):
+        """Write pending changes to disk"""
+        self._lock.acquire()
+        try:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._dirty:
+                self._dirty = False
+                self.save()
+        finally:
+            self._lock.release()
+
+    def _schedule_save(self):
+        self._dirty = True
+        if self._timer is None:
+            timer = self._timer = threading.Timer(SAVE_DELAY, self.flush)
+            timer.daemon = True
+            timer.start()
+
+    def _current_head(self):
+        status, out = self.git.rev_parse('HEAD', verify=True, q=True,
+                                         with_status=True)
+        if status != 0:
+            return None
+        return out.strip()
+
+    def _sync(self, head):
+        """Bring the index up to date with head; return True if it changed"""
+        path = self.path()
+        if path != self._file:
+            if self._dirty:
+                # Changes for the previous repository are written first
+                self._dirty = False
+                self.save()
+            self._file = path
+            self.load()
+        if self.head == head:
+            return False
+        if self.head and gitcmds.reachable([self.head], [head],
+                                           git=self.git):
+            # Only the newest commit in the range matters for each path
+            seen = set()
+            for commit, touched in touched_paths([self.head + '..' + head]):
+                if touched in seen:
+                    continue
+                seen.add(touched)
+                self.entries[touched] = commit
+                self.missing.discard(touched)
+        else:
+            self.entries = {}
+            self.missing = set()
+        self.head = head
+        return True
+
+    def load(self):
+        """Load the index from disk"""
+        self.head = None
+        self.entries = {}
+        self.missing = set()
+        values = jsonfile.read(self._file)
+        if type(values) is not dict or values.get('version') != INDEX_VERSION:
+            return
+        try:
+            self.entries = dict([(path, CommitInfo(*entry))
+                                 for path, entry
+                                 in values['entries'].items()])
+            self.missing = set(values['missing'])
+            self.head = values['head']
+        except (KeyError, TypeError, AttributeError):
+            self.entries = {}
+            self.missing = set()
+
+    def save(self):
+        """Write the index to disk"""
+        values = {
+            'version': INDEX_VERSION,
+            'head': self.head,
+            'entries': dict([(p, list(entry))
+                             for p, entry in self.entries.items()]),
+            'missing': sorted(self.missing),
+        }
+        jsonfile.write(self._file, values)
+
+
+def last_commits(paths, ref='HEAD'):
+    """Return a dict mapping paths to the CommitInfo that last touched them
+
+    History is walked once with `git log --name-only` and the walk stops
+    as soon as every path has been resolved.  Directories resolve to the
+    most recent commit touching any file beneath them.  Paths that no
+    commit has touched, e.g. untracked files, are omitted.
+
+    """
+    pending = set(paths)
+    result = {}
+    if not pending:
+        return result
+    walk = touched_paths([ref, '--'] + pathspecs(pending))
+    try:
+        for commit, path in walk:
+            if path in pending:
+                pending.remove(path)
+                result[path] = commit
+                if not pending:
+                    break
+    finally:
+        walk.close()
+    return result
+
+
+def touched_paths(args):
+    """Yield (CommitInfo, path) for each path touched by `git log args`
+
+    Commits are visited newest first.  Every touched file is followed
+    by its parent directories.  The git process is killed when the
+    generator is closed before it is exhausted.
+
+    """
+    cmd = ['git', 'log', '-z', '--name-only', '--no-color',
+           '--pretty=format:' + COMMIT_MARKER +
+           FIELD_SEPARATOR.join(('%H', '%at', '%an', '%s'))]
+    cmd.extend([core.encode(arg) for arg in args])
+    proc = utils.start_command(cmd)
+    proc.stdin.close()
+    commit = None
+    try:
+        for token in read_tokens(proc.stdout):
+            if token.startswith(COMMIT_MARKER):
+                header, sep, token = token[1:].partition('\n')
+                commit = _parse_header(header)
+            if not token or commit is None:
+                continue
+            path = core.decode(token)
+            yield commit, path
+            while '/' in path:
+                path = utils.dirname(path)
+                yield commit, path
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+
+
+def pathspecs(paths):
+    """Return the directories that limit a walk for paths
+
+    An empty list means that the whole tree must be walked.
+
+    """
+    dirs = set([utils.dirname(p) for p in paths])
+    if '' in dirs or len(dirs) > MAX_PATHSPECS:
+        return []
+    return sorted(dirs)
+
+
+def relative_date(timestamp, now=None):
+    """Format a timestamp the way `git log --date=relative` does"""
+    if now is None:
+        now = time.time()
+    diff = int(now - timestamp)
+    if diff < 0:
+        return 'in the future'
+    if diff < 90:
+        return _ago(diff, 'second')
+    diff = (diff + 30) // 60
+    if diff < 90:
+        return _ago(diff, 'minute')
+    diff = (diff + 30) // 60
+    if diff < 36:
+        return _ago(diff, 'hour')
+    diff = (diff + 12) // 24
+    if diff < 14:
+        return _ago(diff, 'day')
+    if diff < 70:
+        return _ago((diff + 3) // 7, 'week')
+    if diff < 365:
+        return _ago((diff + 15) // 30, 'month')
+    if diff < 1825:
+        total_months = (diff * 12 * 2 + 365) // (365 * 2)
+        years, months = divmod(total_months, 12)
+        if months:
+            return '%s, %s ago' % (_plural(years, 'year'),
+                                   _plural(months, 'month'))
+        return _ago(years, 'year')
+    return _ago((diff + 183) // 365, 'year')
+
+
+def _ago(count, unit):
+    return '%s ago' % _plural(count, unit)
+
+
+def _plural(count, unit):
+    if count == 1:
+        return '1 %s' % unit
+    return '%d %ss' % (count, unit)
+
+
+def _parse_header(header):
+    sha1, timestamp, author, subject = header.split(FIELD_SEPARATOR, 3)
+    return CommitInfo(sha1, int(timestamp),
+                      core.decode(author), core.decode(subject))
+
+
+def read_tokens(fh, size=65536):
+    """Yield the NUL-separated tokens read from a filehandle"""
+    remainder = ''
+    while True:
+        data = fh.read(size)
+        if not data:
+            break
+        tokens = (remainder + data).split('\0')
+        remainder = tokens.pop()
+        for token in tokens:
+            yield token
+    if remainder:
+        yield remainder
@@ -0,0 +1,304 @@
+"""Provides an index of the paths changed by each commit."""
+
+import struct
+import threading
+
+from cola import core
+from cola import gitcfg
+from cola import gitcmds
+from cola import utils
+from cola import version
+from cola.compat import hashlib
+from cola.compat import set
+from cola.decorators import memoize
+from cola.git import git
+from cola.models import jsonfile
+from cola.models.lastmodified import read_tokens
+
+# Bumped whenever the on-disk index format changes
+INDEX_VERSION = 1
+
+# Bloom filter parameters; these match git's changed-path filters
+BITS_PER_ENTRY = 10
+NUM_HASHES = 7
+MIN_BITS = 64
+# Commits that change more paths are always searched
+MAX_CHANGED_PATHS = 512
+
+# Marks the start of each commit in the log output
+COMMIT_MARKER = '\x01'
+
+# Pathspecs that use these characters cannot be answered by the index
+PATHSPEC_CHARS = set('*?[\\')
+
+
+@memoize
+def instance():
+    """Return the static ChangedPathsIndex instance"""
+    return ChangedPathsIndex()
+
+
+def enabled():
+    """Return True when the path index is enabled by cola.pathindex"""
+    return gitcfg.instance().get('cola.pathindex', False) is True
+
+
+def have_bloom_filters():
+    """Return True when git can store changed-path filters itself"""
+    return version.check('commit-graph-bloom', version.git_version())
+
+
+def update():
+    """Bring the changed-path filters up to date
+
+    git's commit-graph is used when available, so that every path-limited
+    `git log`, including those run by external history browsers, uses the
+    filters.  Older versions of git use the ChangedPathsIndex instead.
+
+    """
+    if have_bloom_filters():
+        git.commit_graph('write', reachable=True, changed_paths=True,
+                         with_status=True)
+    else:
+        instance().sync()
+
+
+def normalize(path):
+    """Return a path relative to the top of the worktree, or None"""
+    if path.startswith(':'):
+        # Pathspec magic
+        return None
+    for char in path:
+        if char in PATHSPEC_CHARS:
+            return None
+    while path.startswith('./'):
+        path = path[2:]
+    path = path.rstrip('/')
+    if not path or path == '.':
+        return None
+    return path
+
+
+def path_hashes(path):
+    """Return the two base hashes used to derive a path's filter bits"""
+    digest = hashlib.md5(core.encode(path)).digest()
+    return struct.unpack('<QQ', digest)
+
+
+class BloomFilter(object):
+    """A set of paths that may report false positives but never misses
+
+    Each path, and every directory containing it, sets NUM_HASHES bits.
+    The bits are stored in a single integer.
+
+    """
+    def __init__(self, size, bits=0):
+        self.size = size
+        self.bits = bits
+
+    @classmethod
+    def from_paths(cls, paths):
+        entries = set()
+        for path in paths:
+            entries.add(path)
+            while '/' in path:
+                path = utils.dirname(path)
+                entries.add(path)
+        size = max(MIN_BITS, len(entries) * BITS_PER_ENTRY)
+        bloom = cls(size)
+        for path in entries:
+            bloom.add(path_hashes(path))
+        return bloom
+
+    def add(self, hashes):
+        h1, h2 = hashes
+        size = self.size
+        bits = self.bits
+        for i in xrange(NUM_HASHES):
+            bits |= 1 << ((h1 + i * h2) % size)
+        self.bits = bits
+
+    def contains(self, hashes):
+        h1, h2 = hashes
+        size = self.size
+        bits = self.bits
+        for i in xrange(NUM_HASHES):
+            if not bits & (1 << ((h1 + i * h2) % size)):
+                return False
+        return True
+
+
+class ChangedPathsIndex(object):
+    """Maps commits to Bloom filters of the paths that they change.
+
+    The index covers every commit reachable from `git log --all`.  It is
+    stored in $GIT_DIR/cola/pathindex.json together with the ref tips it
+    was built from.  Only commits that are new since then are read when
+    the refs move.  The index is rebuilt when a previously indexed tip
+    is no longer reachable, e.g. after a rebase.
+
+    The index only rules commits out.  Merges and commits that change
+    more than MAX_CHANGED_PATHS paths are always candidates, and git
+    still applies the path limit to every candidate.
+
+    """
+    def __init__(self, git=git):
+        self.git = git
+        self.tips = []
+        self.commits = []
+        self.filters = []
+        self._file = None
+        self._lock = threading.Lock()
+
+    def path(self):
+        return self.git.git_path('cola', 'pathindex.json')
+
+    def candidates(self, paths):
+        """Return the commits that may have changed any of paths
+
+        Returns None when the paths cannot be answered by the index, and
+        when the index is busy or out of date.  The index is never synced
+        here, so that callers on the GUI thread do not wait for it;
+        sync() is run in the background instead.
+
+        """
+        hashes = []
+        for path in paths:
+            path = normalize(path)
+            if path is None:
+                return None
+            hashes.append(path_hashes(path))
+        if not hashes:
+            return None
+        if not self._lock.acquire(False):
+            return None
+        try:
+            if self._file != self.path():
+                return None
+            if gitcmds.ref_tips(git=self.git) != self.tips:
+                return None
+            result = []
+            for sha1, bloom in zip(self.commits, self.filters):
+                if bloom is None:
+                    result.append(sha1)
+                    continue
+                for value in hashes:
+                    if bloom.contains(value):
+                        result.append(sha1)
+                        break
+            return result
+        finally:
+            self._lock.release()
+
+    def sync(self):
+        """Bring the index up to date with the current refs"""
+        self._lock.acquire()
+        try:
+            self._sync()
+        finally:
+            self._lock.release()
+
+    def _sync(self):
+        path = self.path()
+        if path != self._file:
+            self._file = path
+            self.load()
+        tips = gitcmds.ref_tips(git=self.git)
+        if tips == self.tips:
+            return
+        removed = set(self.tips).difference(tips)
+        if removed and not gitcmds.reachable(removed, tips, git=self.git):
+            self._reset()
+        if self.tips:
+            args = tips + ['--not'] + self.tips
+        else:
+            args = ['--all']
+        for sha1, bloom in changed_paths(args):
+            self.commits.append(sha1)
+            self.filters.append(bloom)
+        self.tips = tips
+        self.save()
+
+    def _reset(self):
+        self.tips = []
+        self.commits = []
+        self.filters = []
+
+    def load(self):
+        """Load the index from disk"""
+        self._reset()
+        values = jsonfile.read(self._file)
+        if type(values) is not dict or values.get('version') != INDEX_VERSION:
+            return
+        try:
+            commits = []
+            filters = []
+            for entry in values['commits']:
+                commits.append(entry[0])
+                if len(entry) == 1:
+                    filters.append(None)
+                else:
+                    filters.append(BloomFilter(entry[1], long(entry[2], 16)))
+            self.commits = commits
+            self.filters = filters
+            self.tips = list(values['tips'])
+        except (KeyError, TypeError, ValueError, IndexError):
+            self._reset()
+
+    def save(self):
+        """Write the index to disk"""
+        commits = []
+        for sha1, bloom in zip(self.commits, self.filters):
+            if bloom is None:
+                commits.append([sha1])
+            else:
+                commits.append([sha1, bloom.size, '%x' % bloom.bits])
+        values = {
+            'version': INDEX_VERSION,
+            'tips': self.tips,
+            'commits': commits,
+        }
+        jsonfile.write(self._file, values)
+
+
+def changed_paths(args):
+    """Yield (sha1, BloomFilter) for each commit listed by `git log args`
+
+    The filter is None for merges and for commits that change too many
+    paths to be worth filtering.  Renames are listed as a deletion and an
+    addition, so that both paths are recorded.
+
+    """
+    cmd = ['git', 'log', '-z', '--name-only', '--no-color', '--no-renames',
+           '--pretty=format:' + COMMIT_MARKER + '%H %P']
+    cmd.extend([core.encode(arg) for arg in args])
+    proc = utils.start_command(cmd)
+    proc.stdin.close()
+    sha1 = None
+    paths = []
+    merge = False
+    try:
+        for token in read_tokens(proc.stdout):
+            if token.startswith(COMMIT_MARKER):
+                if sha1 is not None:
+                    yield sha1, _filter(paths, merge)
+                header, sep, token = token[1:].partition('\n')
+                ids = header.split()
+                sha1 = ids[0]
+                merge = len(ids) > 2
+                paths = []
+            if token and sha1 is not None:
+                paths.append(core.decode(token))
+        if sha1 is not None:
+            yield sha1, _filter(paths, merge)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+
+
+def _filter(paths, merge):
+    if merge or len(paths) > MAX_CHANGED_PATHS:
+        return None
+    return BloomFilter.from_paths(paths)
@@ -0,0 +1,278 @@
+"""Runs `git log -S` and `git log -G` searches and caches their results."""
+
+import collections
+import threading
+
+from cola import core
+from cola import gitcmds
+from cola import utils
+from cola.compat import set
+from cola.decorators import memoize
+from cola.models import stream
+
+# Pickaxe modes: -S matches changes in the number of occurrences of a
+# string, -G matches added or removed lines that match a regex
+STRING = 'S'
+REGEX = 'G'
+
+# Number of complete searches kept by the cache
+CACHE_SIZE = 32
+
+# Results delivered per batch, and the longest time a batch is held back
+BATCH_SIZE = 50
+BATCH_INTERVAL = 0.1
+
+# Characters that make a -G query more than a literal string
+REGEX_CHARS = set('\\.^$[](){}?*+|')
+
+# Matches the output of gitcmds.parse_rev_list()
+LOG_FORMAT = 'format:%H %aN - %s - %ar'
+
+
+@memoize
+def cache():
+    """Return the static PickaxeCache instance"""
+    return PickaxeCache()
+
+
+def is_literal(query):
+    """Return True when a -G query only matches its literal text"""
+    for char in query:
+        if char in REGEX_CHARS:
+            return False
+    return True
+
+
+class PickaxeCache(object):
+    """Remembers the complete results of recent pickaxe searches.
+
+    Entries are keyed by mode and query, and record the ref tips that
+    were searched.  An entry for other tips is still useful: when the
+    old tips are reachable from the new ones only the new commits need
+    to be searched.
+
+    """
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._entries = {}
+        self._keys = collections.deque()
+        self._lock = threading.Lock()
+
+    def get(self, mode, query):
+        """Return (tips, results) for a query, or None"""
+        self._lock.acquire()
+        try:
+            return self._entries.get((mode, query))
+        finally:
+            self._lock.release()
+
+    def put(self, mode, query, tips, results):
+        self._lock.acquire()
+        try:
+            key = (mode, query)
+            if key in self._entries:
+                self._keys.remove(key)
+            self._entries[key] = (tips, results)
+            self._keys.append(key)
+            if len(self._keys) > self.size:
+                del self._entries[self._keys.popleft()]
+        finally:
+            self._lock.release()
+
+    def refinable(self, query, tips):
+        """Return the results of a literal -G query that query extends
+
+        A line that contains the query also contains any substring of
+        it, so those results are a superset of the query's results.
+        The smallest such superset is returned, or None.
+
+        """
+        if not is_literal(query):
+            return None
+        best = None
+        self._lock.acquire()
+        try:
+            for (mode, old), (old_tips, results) in self._entries.items():
+                if (mode != REGEX or old_tips != tips or old == query or
+                        old not in query or not is_literal(old)):
+                    continue
+                if best is None or len(results) < len(best):
+                    best = results
+        finally:
+            self._lock.release()
+        return best
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._entries.clear()
+            self._keys.clear()
+        finally:
+            self._lock.release()
+
+
+class PickaxeSearch(object):
+    """Streams the commits found by a pickaxe search.
+
+    Before running git the cache is consulted:
+
+    * a search of the same refs is answered without running git,
+    * after the refs have moved forward only the new commits are
+      searched and the cached results are appended,
+    * a literal -G query that extends a cached literal query only
+      examines the commits that matched before.
+
+    Complete result lists are stored in the cache.  cancel() terminates
+    the git process.
+
+    """
+    def __init__(self, query, mode=STRING, cache=None, tips=None):
+        self.query = query
+        self.mode = mode
+        self.cache = cache
+        self.tips = tips
+        self.results = []
+        self.count = 0
+        self.status = None
+        self.cancelled = False
+        self.cached = False
+        self._started = False
+        self._proc = None
+        self._reader = None
+        self._suffix = collections.deque()
+
+    def exhausted(self):
+        """Return True once every result has been read"""
+        return self.status is not None
+
+    def read(self, limit, batch_size=BATCH_SIZE, interval=BATCH_INTERVAL):
+        """Yield lists of (sha1, summary) pairs until `limit` are read
+
+        A pending batch is delivered after `interval` seconds even when
+        git has not found another commit.  git is stopped once `limit`
+        results have been read or the search is cancelled.
+
+        """
+        if not self._started and not self.cancelled:
+            self._started = True
+            self._start()
+        for batch in stream.batched(self._results(limit, interval),
+                                    batch_size, interval):
+            if self.cancelled:
+                break
+            yield batch
+        if not self.exhausted():
+            # Otherwise git stays blocked on a full pipe
+            self._terminate()
+
+    def _results(self, limit, timeout):
+        """Yield results, or None when git is quiet for timeout"""
+        while self.count < limit and not self.exhausted():
+            if self.cancelled:
+                break
+            result = self._next(timeout)
+            if result is not None:
+                self.results.append(result)
+                self.count += 1
+            yield result
+
+    def cancel(self):
+        """Stop the search and terminate git"""
+        self.cancelled = True
+        proc = self._proc
+        if proc is not None and proc.poll() is None:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+        if self._reader is not None:
+            self._reader.close()
+
+    def _terminate(self):
+        """Kill git and wait for it to exit"""
+        proc = self._proc
+        self._proc = None
+        if self._reader is not None:
+            self._reader.close()
+        if proc is None:
+            return
+        if proc.poll() is None:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+        proc.wait()
+
+    def _start(self):
+        if self.tips is None:
+            self.tips = gitcmds.ref_tips()
+        if not self.tips:
+            # Nothing has been committed yet
+            self._finish(0)
+            return
+        args = None
+        stdin = None
+        entry = self.cache is not None and self.cache.get(self.mode, self.query)
+        if entry:
+            old_tips, results = entry
+            if old_tips == self.tips:
+                self.cached = True
+                self._suffix.extend(results)
+                return
+            if gitcmds.reachable(old_tips, self.tips):
+                args = self.tips + ['--not'] + old_tips
+                self._suffix.extend(results)
+        if args is None and self.cache is not None and self.mode == REGEX:
+            candidates = self.cache.refinable(self.query, self.tips)
+            if candidates is not None:
+                if not candidates:
+                    self._finish(0)
+                    return
+                args = ['--stdin', '--no-walk']
+                stdin = '\n'.join([sha1 for sha1, summary in candidates])
+        if args is None:
+            args = ['--all']
+        cmd = ['git', 'log', '--no-color', '--pretty=' + LOG_FORMAT,
+               core.encode('-' + self.mode + self.query)]
+        cmd.extend(args)
+        self._proc = utils.start_command(cmd)
+        # Output is drained while the candidates are written
+        self._reader = stream.LineReader(self._proc.stdout)
+        if stdin:
+            self._proc.stdin.write(stdin + '\n')
+        self._proc.stdin.close()
+
+    def _next(self, timeout):
+        """Return the next result, or None when there is none yet"""
+        if self._proc is not None:
+            line = self._reader.readline(timeout)
+            if line is None:
+                return None
+            if line:
+                return _parse(line)
+            proc = self._proc
+            self._proc = None
+            proc.stdout.close()
+            status = proc.wait()
+            if status != 0 or self.cancelled:
+                self._suffix.clear()
+                self.status = status
+            return None
+        if self._suffix:
+            return self._suffix.popleft()
+        self._finish(0)
+        return None
+
+    def _finish(self, status):
+        self.status = status
+        if self.cache is not None and not self.cancelled:
+            self.cache.put(self.mode, self.query, self.tips,
+                           list(self.results))
+
+
+def _parse(line):
+    result = gitcmds.parse_rev_list(line)
+    if result:
+        return result[0]
+    return None
+
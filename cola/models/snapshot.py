@@ -0,0 +1,133 @@
+"""Provides a shared, refresh-scoped snapshot of repository listings."""
+
+import heapq
+import threading
+
+from cola import gitcmds
+from cola.decorators import memoize
+from cola.git import git
+
+
+@memoize
+def instance():
+    """Return the static RepoSnapshot instance"""
+    return RepoSnapshot()
+
+
+class RepoSnapshot(object):
+    """Caches file and ref listings until the next status refresh.
+
+    Every listing is computed on first use with a single git call and
+    shared by all consumers until invalidate() is called by the refresh.
+    Listings are returned as sorted tuples so that they can be shared
+    safely between threads.  Paths and refs are deduplicated so that
+    overlapping listings share the same string objects.
+
+    """
+    def __init__(self, git=git):
+        self.git = git
+        self.version = 0
+        self._cache = {}
+        self._strings = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Discard all listings; called whenever the repository changes"""
+        self._lock.acquire()
+        try:
+            self.version += 1
+            self._cache = {}
+            self._strings = {}
+        finally:
+            self._lock.release()
+
+    def all_files(self):
+        """Return the tracked files in the repository"""
+        return self._get('all_files',
+                         lambda: self._intern(gitcmds.all_files(git=self.git)))
+
+    def untracked_files(self):
+        """Return the untracked files in the repository"""
+        return self._get('untracked_files',
+                         lambda: self._intern(
+                             gitcmds.untracked_files(git=self.git)))
+
+    def everything(self):
+        """Return all tracked and untracked files"""
+        def merge():
+            merged = heapq.merge(self.all_files(), self.untracked_files())
+            result = []
+            for path in merged:
+                if not result or result[-1] != path:
+                    result.append(path)
+            return tuple(result)
+        return self._get('everything', merge)
+
+    def all_refs(self, split=False):
+        """Return local branches, remote branches and tags
+
+        Returns a (local, remote, tags) tuple when `split` is True.
+
+        """
+        local, remote, tags = self._get('all_refs', self._all_refs)
+        if split:
+            return local, remote, tags
+        return local + remote + tags
+
+    def branch_list(self, remote=False):
+        """Return the local or remote branches"""
+        local_branches, remote_branches, tags = self.all_refs(split=True)
+        if remote:
+            return remote_branches
+        return local_branches
+
+    def tag_list(self):
+        """Return the tags, newest-named first"""
+        local_branches, remote_branches, tags = self.all_refs(split=True)
+        return tuple(reversed(tags))
+
+    def _all_refs(self):
+        refs = gitcmds.all_refs(split=True, git=self.git)
+        return tuple([self._intern(values) for values in refs])
+
+    def _intern(self, values):
+        """Return values as a sorted tuple of shared strings"""
+        strings = self._strings
+        return tuple(sorted([strings.setdefault(v, v) for v in values]))
+
+    def _get(self, key, compute):
+        """Return a cached listing, computing it at most once per version"""
+        self._lock.acquire()
+        try:
+            try:
+                return self._cache[key]
+            except KeyError:
+                pass
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        finally:
+            self._lock.release()
+
+        # Hold a per-listing lock so that concurrent consumers wait for
+        # a single git call instead of running their own.
+        key_lock.acquire()
+        try:
+            self._lock.acquire()
+            try:
+                version = self.version
+                if key in self._cache:
+                    return self._cache[key]
+            finally:
+                self._lock.release()
+
+            value = compute()
+
+            self._lock.acquire()
+            try:
+                if version == self.version:
+                    self._cache[key] = value
+            finally:
+                self._lock.release()
+            return value
+        finally:
+            key_lock.release()
@@ -0,0 +1,88 @@
+"""Filters the status lists by path without calling git."""
+
+import fnmatch
+import re
+
+from cola.compat import set
+from cola.models.completion import CompletionIndex
+from cola.models.completion import scan
+
+# Characters that turn a filter into a glob pattern
+GLOB_CHARS = set('*?[')
+
+
+def is_glob(text):
+    """Return True when text is a glob pattern rather than a substring"""
+    for char in text:
+        if char in GLOB_CHARS:
+            return True
+    return False
+
+
+class StatusFilter(object):
+    """Matches paths against a substring or glob filter.
+
+    The index is built once from the paths listed in the status lists
+    and then shared by every keystroke until the next status refresh.
+    Matching is case-insensitive.  Substring filters use the trigram
+    index, and a filter that extends the previous one only rescans the
+    previous matches.  Glob patterns without a '/' also match basenames,
+    and patterns with a '/' also match trailing path segments.
+
+    """
+    def __init__(self, paths):
+        self.index = CompletionIndex(paths)
+        self._last_text = None
+        self._last_indexes = None
+
+    def matches(self, text):
+        """Return the set of indexed paths that match text"""
+        items = self.index.items
+        return set([items[i] for i in self._indexes(text)])
+
+    def filter(self, text, paths):
+        """Return the paths that match text, keeping their order"""
+        if not text:
+            return paths
+        indexes = self._indexes(text)
+        if len(indexes) == len(self.index):
+            return paths
+        items = self.index.items
+        matches = set([items[i] for i in indexes])
+        return [p for p in paths if p in matches]
+
+    def _indexes(self, text):
+        lower = self.index.lower
+        text = text.lower()
+        if text == self._last_text:
+            # Each status list is filtered with the same text
+            return self._last_indexes
+        if is_glob(text):
+            indexes = scan(lower, glob_predicate(text))
+        elif (self._last_text is not None and
+                not is_glob(self._last_text) and
+                self._last_text in text):
+            # Matches for the new text are a subset of the previous ones
+            indexes = scan(lower, lambda value: text in value,
+                           indexes=self._last_indexes)
+        else:
+            indexes = list(self.index.candidates(text))
+        self._last_text = text
+        self._last_indexes = indexes
+        return indexes
+
+
+def glob_predicate(pattern):
+    """Return a function that matches paths against a glob pattern"""
+    match = re.compile(fnmatch.translate(pattern), re.UNICODE).match
+    if '/' in pattern:
+        # Match the pattern against any trailing run of path segments
+        if not pattern.startswith('/') and not pattern.startswith('*'):
+            pattern = '*/' + pattern
+        match_any = re.compile(fnmatch.translate(pattern), re.UNICODE).match
+        return lambda value: (match(value) is not None or
+                              match_any(value) is not None)
+    def predicate(value):
+        basename = value[value.rfind('/')+1:]
+        return match(basename) is not None or match(value) is not None
+    return predicate
@@ -0,0 +1,68 @@
+"""Provides constant-time status lookups for paths and their parents."""
+
+from cola import utils
+
+# Status flags
+UNMERGED = 1
+MODIFIED = 2
+STAGED = 4
+UNTRACKED = 8
+UPSTREAM_CHANGED = 16
+
+# Paths with local changes
+CHANGED = UNMERGED | MODIFIED | STAGED | UNTRACKED
+
+
+class StatusIndex(object):
+    """Maps paths and their ancestor directories to status flags.
+
+    The index is built once per status refresh and shared by every
+    consumer.  A directory's flags are the union of the flags of
+    everything beneath it.  The row of each path within its status
+    list is recorded as well.
+
+    """
+    def __init__(self, staged=(), modified=(), unmerged=(),
+                 untracked=(), upstream_changed=()):
+        self.flags = {}
+        self.rows = {}
+        for flag, paths in ((STAGED, staged),
+                            (MODIFIED, modified),
+                            (UNMERGED, unmerged),
+                            (UNTRACKED, untracked),
+                            (UPSTREAM_CHANGED, upstream_changed)):
+            rows = self.rows[flag] = {}
+            for row, path in enumerate(paths):
+                rows.setdefault(path, row)
+                self._add(path, flag)
+
+    def _add(self, path, flag):
+        flags = self.flags
+        while True:
+            current = flags.get(path, 0)
+            if current & flag:
+                # Ancestors were flagged when this path was
+                break
+            flags[path] = current | flag
+            if '/' not in path:
+                break
+            path = utils.dirname(path)
+            if not path:
+                break
+
+    def status(self, path):
+        """Return the flags for a path; 0 means unchanged"""
+        return self.flags.get(path, 0)
+
+    def has(self, path, flag):
+        """Return True when path, or a path beneath it, has any of flag"""
+        return bool(self.flags.get(path, 0) & flag)
+
+    def row(self, flag, path):
+        """Return path's row in the list for flag, or None"""
+        return self.rows[flag].get(path)
+
+    def paths(self, flag=CHANGED):
+        """Return the set of paths that have any of flag"""
+        return set([path for path, flags in self.flags.iteritems()
+                    if flags & flag])
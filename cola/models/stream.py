@@ -0,0 +1,81 @@
+"""Delivers the output of long-running commands in timely batches."""
+
+import Queue
+import threading
+import time
+
+# Lines read ahead of the consumer; the command blocks beyond that
+QUEUE_SIZE = 1024
+
+# Seconds between checks for a closed reader while the queue is full
+PUT_INTERVAL = 0.1
+
+
+class LineReader(object):
+    """Reads lines from a filehandle on a thread.
+
+    readline() waits for the next line for at most `timeout` seconds,
+    so a consumer can deliver what it has while the command is quiet.
+    At most QUEUE_SIZE lines are read ahead.
+
+    """
+    def __init__(self, fh):
+        self._fh = fh
+        self._queue = Queue.Queue(QUEUE_SIZE)
+        self._closed = False
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+
+    def readline(self, timeout):
+        """Return the next line, '' at the end, or None after timeout"""
+        try:
+            return self._queue.get(True, timeout)
+        except Queue.Empty:
+            return None
+
+    def close(self):
+        """Stop reading; the reader thread exits once the file is closed"""
+        self._closed = True
+
+    def _run(self):
+        try:
+            for line in iter(self._fh.readline, ''):
+                if not self._put(line):
+                    return
+        except (IOError, OSError, ValueError):
+            # The file was closed underneath us
+            pass
+        self._put('')
+
+    def _put(self, line):
+        while not self._closed:
+            try:
+                self._queue.put(line, True, PUT_INTERVAL)
+                return True
+            except Queue.Full:
+                continue
+        return False
+
+
+def batched(items, batch_size, interval):
+    """Group the values produced by items into lists
+
+    `items` produces None when no value arrived in time.  A batch is
+    delivered once it holds `batch_size` values, or once `interval`
+    seconds have passed since the previous batch, so that sparse values
+    are not held back until the next one arrives.
+
+    """
+    batch = []
+    deadline = time.time() + interval
+    for item in items:
+        if item is not None:
+            batch.append(item)
+        now = time.time()
+        if batch and (len(batch) >= batch_size or now >= deadline):
+            yield batch
+            batch = []
+            deadline = now + interval
+    if batch:
+        yield batch
@@ -0,0 +1,173 @@
+"""Measures the time spent importing modules and building widgets
+
+The profile is enabled by `git cola --startup-profile`.  The launcher
+scripts enable it before cola.app, and with it PyQt4, is imported.
+It records the inclusive time of every import that loads new modules
+and of the named construction steps passed to begin() and end().
+report() prints both in the order in which they happened.
+
+Startup milestones are always recorded because they are cheap.  Each
+records the time since the startup clock started; the launcher scripts
+start it before anything else is imported.
+
+"""
+import __builtin__
+import sys
+import time
+try:
+    import simplejson
+    json = simplejson
+except ImportError:
+    import json
+
+# Imports that load modules faster than this are not reported
+MIN_REPORT_TIME = 0.001
+
+_enabled = False
+_start_time = None
+_real_import = None
+_depth = [0]
+_nesting = [0]
+_import_time = [0.0]
+_events = []
+_pending = {}
+_start = [time.time()]
+_milestones = []
+_milestone_names = {}
+
+
+def enabled():
+    """Return True when the startup profile is being recorded"""
+    return _enabled
+
+
+def enable():
+    """Start recording imports and construction steps"""
+    global _enabled, _start_time, _real_import
+    if _enabled:
+        return
+    _enabled = True
+    _start_time = time.time()
+    _real_import = __builtin__.__import__
+    __builtin__.__import__ = _profiled_import
+
+
+def disable():
+    """Stop recording; the recorded events are kept for report()"""
+    global _enabled
+    if not _enabled:
+        return
+    _enabled = False
+    __builtin__.__import__ = _real_import
+
+
+def set_start_time(timestamp):
+    """Start the startup clock at timestamp, e.g. when the launcher ran"""
+    _start[0] = timestamp
+
+
+def milestone(name):
+    """Record that startup reached name; only the first time counts"""
+    if name in _milestone_names:
+        return
+    elapsed = time.time() - _start[0]
+    _milestone_names[name] = elapsed
+    _milestones.append((name, elapsed))
+
+
+def reached(name):
+    """Return True once the milestone has been recorded"""
+    return name in _milestone_names
+
+
+def milestones():
+    """Return the recorded (name, seconds) milestones in order"""
+    return list(_milestones)
+
+
+def write_milestones(path):
+    """Write the milestones to path as JSON"""
+    values = {
+        'milestones': [{'name': name, 'seconds': elapsed}
+                       for name, elapsed in _milestones],
+    }
+    fh = open(path, 'wb')
+    try:
+        json.dump(values, fh, indent=2)
+    finally:
+        fh.close()
+
+
+def begin(name):
+    """Mark the start of a construction step"""
+    if not _enabled:
+        return
+    _pending[name] = (time.time(), len(_events), _depth[0])
+    _events.append(None)
+    _depth[0] += 1
+
+
+def end(name):
+    """Mark the end of a construction step started with begin()"""
+    if not _enabled:
+        return
+    try:
+        start, idx, depth = _pending.pop(name)
+    except KeyError:
+        return
+    _depth[0] = depth
+    _events[idx] = ('build', name, depth, time.time() - start)
+
+
+def _profiled_import(name, globals=None, locals=None, fromlist=None,
+                     level=-1):
+    count = len(sys.modules)
+    if name in sys.modules and not fromlist:
+        return _real_import(name, globals, locals, fromlist, level)
+    start = time.time()
+    idx = len(_events)
+    _events.append(None)
+    depth = _depth[0]
+    _depth[0] += 1
+    _nesting[0] += 1
+    try:
+        return _real_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.time() - start
+        _depth[0] = depth
+        _nesting[0] -= 1
+        if not _nesting[0]:
+            # Nested imports are included in the outermost import
+            _import_time[0] += elapsed
+        if len(sys.modules) == count:
+            # Nothing was loaded
+            _events[idx] = None
+        else:
+            if fromlist:
+                label = 'from %s import %s' % (name, ', '.join(fromlist))
+            else:
+                label = 'import %s' % name
+            _events[idx] = ('import', label, depth, elapsed)
+
+
+def events():
+    """Return the recorded (kind, name, depth, seconds) tuples"""
+    return [event for event in _events if event is not None]
+
+
+def report(fh=None):
+    """Print the recorded imports and construction steps"""
+    if fh is None:
+        fh = sys.stderr
+    if _start_time is None:
+        return
+    total = time.time() - _start[0]
+    for kind, name, depth, elapsed in events():
+        if kind == 'import' and elapsed < MIN_REPORT_TIME:
+            continue
+        fh.write('%8.1fms %s%s\n' % (elapsed * 1000.0, '  ' * depth, name))
+    fh.write('%8.1fms importing modules\n' % (_import_time[0] * 1000.0))
+    for name, elapsed in _milestones:
+        fh.write('%8.1fms reached %s\n' % (elapsed * 1000.0, name))
+    fh.write('%8.1fms total startup time\n' % (total * 1000.0))
+    fh.flush()
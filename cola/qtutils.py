@@ -368,7 +368,7 @@ def icon_file(filename, staged=False, untracked=False):
 def icon_for_file(filename, staged=False, untracked=False):
     """Returns a QIcon for a particular file path."""
     ifile = icon_file(filename, staged=staged, untracked=untracked)
-    return icon(ifile)
+    return cached_icon_from_path(ifile)
 
 
 def create_treeitem(filename, staged=False, untracked=False, check=True):
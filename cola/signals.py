@@ -8,6 +8,7 @@ commits_selected = 'commits_selected'
 confirm = 'confirm'
 critical = 'critical'
 edit = 'edit'
+expand_untracked = 'expand_untracked'
 checkout = 'checkout'
 checkout_branch = 'checkout_branch'
 cherry_pick = 'cherry_pick'
@@ -0,0 +1,226 @@
+"""Provides a central scheduler for background tasks
+
+Tasks are submitted to named queues.  Each queue has a priority and a
+cap on the number of its tasks that may run at the same time so that
+bulk background work cannot starve interactive work.  Within a queue,
+higher priority tasks run first.  Pending tasks can be deduplicated by
+key and cancelled by key or by owner.
+
+"""
+import heapq
+import itertools
+import threading
+
+from PyQt4 import QtCore
+from PyQt4.QtCore import Qt
+from PyQt4.QtCore import SIGNAL
+
+from cola import version
+from cola.decorators import memoize
+
+# Queues, from most to least interactive
+STATUS = 'status'
+ACTIONS = 'actions'
+METADATA = 'metadata'
+
+# Task priorities within a queue
+PRIORITY_LOW = -1
+PRIORITY_NORMAL = 0
+PRIORITY_VISIBLE = 1
+
+# Support older versions of PyQt
+HAVE_QRUNNABLE = version.check('pyqt_qrunnable', QtCore.PYQT_VERSION_STR)
+
+
+@memoize
+def scheduler():
+    """Return the static TaskScheduler instance"""
+    instance = TaskScheduler()
+    instance.add_queue(STATUS, priority=2, max_running=1)
+    instance.add_queue(ACTIONS, priority=1, max_running=2)
+    instance.add_queue(METADATA, priority=0, max_running=2)
+    return instance
+
+
+def submit(task, queue=METADATA, key=None, priority=PRIORITY_NORMAL,
+           owner=None):
+    """Submit a task to the static scheduler"""
+    return scheduler().submit(task, queue=queue, key=key,
+                              priority=priority, owner=owner)
+
+
+def cancel(key=None, owner=None):
+    """Cancel tasks in the static scheduler"""
+    scheduler().cancel(key=key, owner=owner)
+
+
+class Task(object):
+    """A unit of work run by the TaskScheduler
+
+    Subclasses implement run().  Long-running tasks should check
+    `cancelled` and return early once it is set.
+
+    """
+    def __init__(self):
+        self.cancelled = False
+        self.key = None
+        self.owner = None
+        self.priority = PRIORITY_NORMAL
+
+    def run(self):
+        pass
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FunctionTask(Task):
+    """Adapts a callable into a Task"""
+    def __init__(self, fn, *args, **kwargs):
+        Task.__init__(self)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        self.fn(*self.args, **self.kwargs)
+
+
+class TaskQueue(object):
+    """Pending and running tasks for one named queue"""
+    def __init__(self, name, priority, max_running):
+        self.name = name
+        self.priority = priority
+        self.max_running = max_running
+        self.running = 0
+        self.pending = []
+        self.keys = {}
+
+
+class TaskScheduler(object):
+    """Runs tasks from named queues on the global QThreadPool"""
+    def __init__(self):
+        self.queues = {}
+        self._order = []
+        self._runners = set()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._notifier = QtCore.QObject()
+        # Completion is always handled by the main thread
+        app = QtCore.QCoreApplication.instance()
+        if app is not None:
+            self._notifier.moveToThread(app.thread())
+        self._notifier.connect(self._notifier, SIGNAL('task_done'),
+                               self._task_done, Qt.QueuedConnection)
+        if HAVE_QRUNNABLE:
+            self._threadpool = QtCore.QThreadPool.globalInstance()
+        else:
+            self._threadpool = None
+
+    def add_queue(self, name, priority=0, max_running=1):
+        """Register a queue; higher priority queues are dispatched first"""
+        self.queues[name] = TaskQueue(name, priority, max_running)
+        self._order = sorted(self.queues.values(),
+                             key=lambda q: -q.priority)
+        # Ensure that every queue can reach its cap at the same time
+        if self._threadpool is not None:
+            total = sum([q.max_running for q in self.queues.values()])
+            if self._threadpool.maxThreadCount() < total:
+                self._threadpool.setMaxThreadCount(total)
+
+    def submit(self, task, queue=METADATA, key=None,
+               priority=PRIORITY_NORMAL, owner=None):
+        """Queue a task
+
+        A pending task with the same key is replaced by the new task.
+        Tasks that are already running are not affected.
+
+        """
+        task.key = key
+        task.owner = owner
+        if self._threadpool is None:
+            task.run()
+            return task
+
+        self._lock.acquire()
+        try:
+            q = self.queues[queue]
+            if key is not None:
+                old = q.keys.get(key)
+                if old is not None:
+                    old.cancel()
+                    priority = max(priority, old.priority)
+                q.keys[key] = task
+            task.priority = priority
+            heapq.heappush(q.pending, (-priority, self._counter.next(), task))
+        finally:
+            self._lock.release()
+        self._dispatch()
+        return task
+
+    def cancel(self, key=None, owner=None):
+        """Cancel the pending and running tasks matching key or owner"""
+        self._lock.acquire()
+        try:
+            for runner in self._runners:
+                if self._matches(runner.task, key, owner):
+                    runner.task.cancel()
+            for q in self.queues.values():
+                for entry in q.pending:
+                    if self._matches(entry[-1], key, owner):
+                        entry[-1].cancel()
+        finally:
+            self._lock.release()
+
+    def _matches(self, task, key, owner):
+        if key is not None and task.key == key:
+            return True
+        return owner is not None and task.owner == owner
+
+    def _dispatch(self):
+        """Start as many pending tasks as the queue caps allow"""
+        self._lock.acquire()
+        try:
+            for q in self._order:
+                while q.pending and q.running < q.max_running:
+                    entry = heapq.heappop(q.pending)
+                    task = entry[-1]
+                    if task.key is not None and q.keys.get(task.key) is task:
+                        del q.keys[task.key]
+                    if task.cancelled:
+                        continue
+                    q.running += 1
+                    runner = TaskRunnable(task, q, self._notifier)
+                    self._runners.add(runner)
+                    self._threadpool.start(runner)
+        finally:
+            self._lock.release()
+
+    def _task_done(self, runner):
+        # References are dropped on the main thread; PyQt crashes when a
+        # QRunnable is garbage-collected while its thread is still using it.
+        self._lock.acquire()
+        try:
+            self._runners.discard(runner)
+            runner.queue.running -= 1
+        finally:
+            self._lock.release()
+        self._dispatch()
+
+
+if HAVE_QRUNNABLE:
+    class TaskRunnable(QtCore.QRunnable):
+        """Runs a Task on the QThreadPool on behalf of the scheduler"""
+        def __init__(self, task, queue, notifier):
+            QtCore.QRunnable.__init__(self)
+            self.setAutoDelete(False)
+            self.task = task
+            self.queue = queue
+            self.notifier = notifier
+
+        def run(self):
+            try:
+                if not self.task.cancelled:
+                    self.task.run()
+            finally:
+                self.notifier.emit(SIGNAL('task_done'), self)
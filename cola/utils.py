@@ -1,6 +1,7 @@
 # Copyright (c) 2008 David Aguilar
 """This module provides miscellaneous utility functions."""
 
+import collections
 import mimetypes
 import os
 import random
@@ -14,6 +15,7 @@ from cola import git
 from cola import core
 from cola import resources
 from cola.compat import hashlib
+from cola.compat import set
 from cola.decorators import interruptable
 
 random.seed(hash(time.time()))
@@ -38,6 +40,13 @@ KNOWN_FILE_EXTENSION = {
     '.cxx':     'script.png',
 }
 
+# Bounds the cache of file types for names without an extension
+FILE_TYPE_CACHE_SIZE = 256
+
+_file_types_by_ext = {}
+_file_types_by_name = {}
+_file_type_names = collections.deque()
+
 
 def add_parents(path_entry_set):
     """Iterate over each item in the set and add its parent directories."""
@@ -68,18 +77,61 @@ def run_cmd(command):
 def ident_file_type(filename):
     """Returns an icon based on the contents of filename."""
     if os.path.exists(filename):
-        filemimetype = mimetypes.guess_type(filename)
-        if filemimetype[0] != None:
-            for filetype, iconname in KNOWN_FILE_MIME_TYPES.iteritems():
-                if filetype in filemimetype[0].lower():
-                    return iconname
-        filename = filename.lower()
-        for fileext, iconname in KNOWN_FILE_EXTENSION.iteritems():
-            if filename.endswith(fileext):
-                return iconname
-        return 'generic.png'
+        return file_type(filename)
     else:
         return 'removed.png'
+
+
+def file_type(filename):
+    """Returns an icon name for filename, cached by extension
+
+    The icon only depends on the filename's extension, so the MIME type
+    is guessed once per extension.  Names without an extension,
+    e.g. "Makefile", are kept in a small LRU cache.
+
+    """
+    name = os.path.basename(filename)
+    root, ext = os.path.splitext(name)
+    if ext.lower() in mimetypes.encodings_map:
+        # e.g. ".tar.gz"; the inner extension determines the MIME type
+        ext = os.path.splitext(root)[1] + ext
+    if ext:
+        try:
+            return _file_types_by_ext[ext]
+        except KeyError:
+            # Prefix a name so that the extension is not a dotfile
+            result = _file_types_by_ext[ext] = guess_file_type('x' + ext)
+            return result
+
+    names = _file_type_names
+    try:
+        result = _file_types_by_name[name]
+    except KeyError:
+        result = _file_types_by_name[name] = guess_file_type(name)
+        names.append(name)
+        if len(names) > FILE_TYPE_CACHE_SIZE:
+            _file_types_by_name.pop(names.popleft(), None)
+        return result
+    # Move the name to the most-recently-used end
+    try:
+        names.remove(name)
+        names.append(name)
+    except ValueError:
+        pass
+    return result
+
+
+def guess_file_type(filename):
+    """Returns an icon name for filename based on its MIME type"""
+    filemimetype = mimetypes.guess_type(filename)
+    if filemimetype[0] != None:
+        for filetype, iconname in KNOWN_FILE_MIME_TYPES.iteritems():
+            if filetype in filemimetype[0].lower():
+                return iconname
+    filename = filename.lower()
+    for fileext, iconname in KNOWN_FILE_EXTENSION.iteritems():
+        if filename.endswith(fileext):
+            return iconname
     # Fallback for modified files of an unknown type
     return 'generic.png'
 
@@ -135,6 +187,19 @@ def win32_abspath(exe):
             return abspath
     return None
 
+def lazy_callable(modname, name):
+    """Return a function that calls `name` from module `modname`
+
+    The module is imported by the first call rather than up front so
+    that rarely used features do not slow down startup.
+
+    """
+    def call(*args, **kwargs):
+        module = __import__(modname, {}, {}, [name])
+        return getattr(module, name)(*args, **kwargs)
+    return call
+
+
 def sublist(a,b):
     """Subtracts list b from list a and returns the resulting list."""
     # conceptually, c = a - b
@@ -145,6 +210,44 @@ def sublist(a,b):
     return c
 
 
+def list_diff(old, new):
+    """Return the removals and insertions that turn list old into new
+
+    Returns a (removals, insertions) tuple.  `removals` lists the indexes
+    of the items in old to remove, in ascending order.  `insertions`
+    lists (index, item) pairs to insert, in ascending order, once the
+    removals have been applied.  Returns None when the items kept from
+    old appear in a different order in new.
+
+    """
+    old_set = set(old)
+    new_set = set(new)
+    if ([x for x in old if x in new_set] !=
+            [x for x in new if x in old_set]):
+        return None
+    removals = [idx for idx, x in enumerate(old) if x not in new_set]
+    insertions = [(idx, x) for idx, x in enumerate(new) if x not in old_set]
+    return removals, insertions
+
+
+def changed_values(items, cache, compute):
+    """Return (index, value) pairs for items whose computed value changed
+
+    `cache` maps items to the values computed by the previous call and
+    is updated in place.  Items that were not in the cache are included.
+
+    """
+    result = []
+    values = {}
+    for idx, item in enumerate(items):
+        value = values[item] = compute(item)
+        if item not in cache or cache[item] != value:
+            result.append((idx, value))
+    cache.clear()
+    cache.update(values)
+    return result
+
+
 __grep_cache = {}
 def grep(pattern, items, squash=True):
     """Greps a list for items that match a pattern and return a list of
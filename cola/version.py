@@ -25,6 +25,14 @@ _versions = {
     'pyqt': '4.4',
     'pyqt_qrunnable': '4.4',
     'diff-submodule': '1.6.6',
+    # git-grep learned --threads in 2.8.0
+    'grep-threads': '2.8.0',
+    # git-commit-graph learned --changed-paths in 2.27.0
+    'commit-graph-bloom': '2.27.0',
+    # ":(literal)" pathspec magic is understood by 1.9.0 and newer
+    'pathspec-literal': '1.9.0',
+    # git-add and git-reset learned --pathspec-from-file in 2.25.0
+    'pathspec-from-file': '2.25.0',
 }
 
 
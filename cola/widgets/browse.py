@@ -307,14 +307,19 @@ class GitFileTreeModel(QtGui.QStandardItemModel):
 
 
 class GitTreeModel(GitFileTreeModel):
+    """Presents the tree of a ref, reading each directory on expansion."""
     def __init__(self, ref, parent):
         GitFileTreeModel.__init__(self, parent)
         self.ref = ref
         self._initialize()
 
     def _initialize(self):
-        """Iterate over git-ls-tree and create GitTreeItems."""
-        status, output = git.ls_tree('--full-tree', '-r', '-t', '-z', self.ref,
+        """Populate the top-level entries of the ref's tree."""
+        self._populate(self.invisibleRootItem(), '', self.ref)
+
+    def _populate(self, parent, dirname, treeish):
+        """Iterate over git-ls-tree for a single tree and create GitTreeItems."""
+        status, output = git.ls_tree('--full-tree', '-z', treeish,
                                      with_status=True, with_stderr=True)
         if status != 0:
             cola.notifier().broadcast(signals.log_cmd, status, output)
@@ -323,17 +328,54 @@ class GitTreeModel(GitFileTreeModel):
         if not output:
             return
 
+        dirs = []
+        files = []
         for line in core.decode(output[:-1]).split('\0'):
             # .....6 ...4 ......................................40
             # 040000 tree c127cde9a0c644a3a8fef449a244f47d5272dfa6	relative
             # 100644 blob 139e42bf4acaa4927ec9be1ec55a252b97d3f1e2	relative/path
             objtype = line[7]
-            relpath = line[6 + 1 + 4 + 1 + 40 + 1:]
+            sha1 = line[6 + 1 + 4 + 1:6 + 1 + 4 + 1 + 40]
+            name = line[6 + 1 + 4 + 1 + 40 + 1:]
+            if dirname:
+                relpath = dirname + '/' + name
+            else:
+                relpath = name
             if objtype == 't':
-                parent = self.dir_entries[utils.dirname(relpath)]
-                self.add_directory(parent, relpath)
+                dirs.append((relpath, sha1))
             elif objtype == 'b':
-                self.add_file(relpath)
+                files.append(relpath)
+
+        # Directories are listed before files
+        for relpath, sha1 in dirs:
+            item = GitTreeItem(relpath, True, sha1=sha1)
+            parent.appendRow([item])
+            self.dir_entries[relpath] = item
+        for relpath in files:
+            parent.appendRow(self.create_row(relpath, False))
+
+    def _unfetched_item(self, index):
+        """Return the item for an index's unread directory, or None"""
+        if not index.isValid():
+            return None
+        item = self.itemFromIndex(index)
+        if item is None or not item.is_dir or item.fetched:
+            return None
+        return item
+
+    def hasChildren(self, index=QtCore.QModelIndex()):
+        if self._unfetched_item(index) is not None:
+            return True
+        return GitFileTreeModel.hasChildren(self, index)
+
+    def canFetchMore(self, index):
+        return self._unfetched_item(index) is not None
+
+    def fetchMore(self, index):
+        item = self._unfetched_item(index)
+        if item is not None:
+            item.fetched = True
+            self._populate(item, item.path, item.sha1)
 
 
 class GitTreeItem(QtGui.QStandardItem):
@@ -345,10 +387,13 @@ class GitTreeItem(QtGui.QStandardItem):
     Each GitRepoItem manages a different cell in the tree view.
 
     """
-    def __init__(self, path, is_dir):
+    def __init__(self, path, is_dir, sha1=None):
         QtGui.QStandardItem.__init__(self)
         self.is_dir = is_dir
         self.path = path
+        # Directories from GitTreeModel are read on demand from their tree
+        self.sha1 = sha1
+        self.fetched = sha1 is None
         self.setEditable(False)
         self.setDragEnabled(False)
         self.setText(utils.basename(path))
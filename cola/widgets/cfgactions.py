@@ -7,10 +7,10 @@ from PyQt4.QtCore import SIGNAL
 import cola
 from cola import core
 from cola import gitcfg
-from cola import gitcmds
 from cola import qt
 from cola import qtutils
 from cola import signals
+from cola.models import snapshot
 from cola.widgets import defs
 from cola.widgets import completion
 from cola.widgets import standard
@@ -223,10 +223,11 @@ class ActionDialog(standard.Dialog):
             self.argstxt.hide()
             self.argslabel.hide()
 
+        repo = snapshot.instance()
         revs = (
-            ('Local Branch', gitcmds.branch_list(remote=False)),
-            ('Tracking Branch', gitcmds.branch_list(remote=True)),
-            ('Tag', gitcmds.tag_list()),
+            ('Local Branch', repo.branch_list(remote=False)),
+            ('Tracking Branch', repo.branch_list(remote=True)),
+            ('Tag', repo.tag_list()),
         )
 
         if 'revprompt' not in opts or opts.get('revprompt') is True:
@@ -8,6 +8,7 @@ from cola import qtutils
 from cola import difftool
 from cola import gitcmds
 from cola.git import git
+from cola.models import snapshot
 from cola.qtutils import connect_button
 from cola.widgets import defs
 from cola.widgets import standard
@@ -35,8 +36,9 @@ class CompareBranchesDialog(standard.Dialog):
 
     def __init__(self, parent):
         standard.Dialog.__init__(self, parent=parent)
-        self.remote_branches = gitcmds.branch_list(remote=True)
-        self.local_branches = gitcmds.branch_list(remote=False)
+        repo = snapshot.instance()
+        self.remote_branches = list(repo.branch_list(remote=True))
+        self.local_branches = list(repo.branch_list(remote=False))
 
         self.setWindowTitle(self.tr('Branch Diff Viewer'))
         self.resize(658, 350)
@@ -198,7 +200,7 @@ class CompareBranchesDialog(standard.Dialog):
             if tracked_branch:
                 return git.merge_base(branch, tracked_branch)
             else:
-                remote_branches = gitcmds.branch_list(remote=True)
+                remote_branches = snapshot.instance().branch_list(remote=True)
                 remote_branch = 'origin/%s' % branch
                 if remote_branch in remote_branches:
                     return git.merge_base(branch, remote_branch)
@@ -10,6 +10,9 @@ import cola
 from cola import qtutils
 from cola import utils
 from cola.compat import set
+from cola.models.completion import Cancelled
+from cola.models.completion import CompletionIndex
+from cola.models.completion import PathCompletionIndex
 
 
 class CompletionLineEdit(QtGui.QLineEdit):
@@ -37,6 +40,10 @@ class CompletionLineEdit(QtGui.QLineEdit):
         completer.popup().setItemDelegate(self._delegate)
         self.connect(self._completer, SIGNAL('activated(QString)'),
                      self._complete)
+        # The gather thread must stop before Qt destroys it
+        self.connect(self, SIGNAL('destroyed()'), completer.dispose)
+        self.connect(QtGui.QApplication.instance(),
+                     SIGNAL('aboutToQuit()'), completer.dispose)
 
     def _is_case_sensitive(self, text):
         return bool([char for char in text if char.isupper()])
@@ -159,30 +166,68 @@ class CompletionLineEdit(QtGui.QLineEdit):
         self._completer.popup().setCurrentIndex(
                 self._completer.model().index(0,0))
 
-    def __del__(self):
-        self.dispose()
-
     def dispose(self):
         self._completer.dispose()
 
 
 class GatherCompletionsThread(QtCore.QThread):
+    """Gathers completions for the latest request in the background
+
+    Every request bumps a generation counter.  A scan that is superseded
+    by a newer request is abandoned at its next checkpoint and only the
+    results for the latest generation are emitted.
+
+    """
     def __init__(self, model):
-        QtCore.QThread.__init__(self)
+        QtCore.QThread.__init__(self, model)
         self.model = model
         self.case_sensitive = False
+        self.generation = 0
+        self._handled = 0
+        self._running = True
+        self._mutex = QtCore.QMutex()
+        self._condition = QtCore.QWaitCondition()
+
+    def request(self, case_sensitive):
+        self._mutex.lock()
+        self.case_sensitive = case_sensitive
+        self.generation += 1
+        self._mutex.unlock()
+        self._condition.wakeOne()
+        if not self.isRunning():
+            self.start()
+
+    def stop(self):
+        self._mutex.lock()
+        self._running = False
+        self.generation += 1
+        self._mutex.unlock()
+        self._condition.wakeOne()
+        self.wait()
+
+    def is_stale(self, generation):
+        return generation != self.generation
 
     def run(self):
-        text = None
-        # Loop when the matched text changes between the start and end time.
-        # This happens when gather_matches() takes too long and the
-        # model's matched_text changes in-between.
-        while text != self.model.matched_text:
-            text = self.model.matched_text
-            items = self.model.gather_matches(self.case_sensitive)
+        while True:
+            self._mutex.lock()
+            while self._running and self._handled == self.generation:
+                self._condition.wait(self._mutex)
+            running = self._running
+            generation = self._handled = self.generation
+            case_sensitive = self.case_sensitive
+            self._mutex.unlock()
+            if not running:
+                return
 
-        if text is not None: 
-            self.emit(SIGNAL('items_gathered'), items)
+            cancelled = lambda: self.is_stale(generation)
+            try:
+                items = self.model.gather_matches(case_sensitive,
+                                                  cancelled=cancelled)
+            except Cancelled:
+                continue
+            if not cancelled():
+                self.emit(SIGNAL('items_gathered'), items)
 
 
 class HighlightDelegate(QtGui.QStyledItemDelegate):
@@ -213,8 +258,8 @@ class HighlightDelegate(QtGui.QStyledItemDelegate):
             html = text.replace(self.highlight_text,
                                 '<strong>%s</strong>' % self.highlight_text)
         else:
-            match = re.match('(.*)(' + self.highlight_text + ')(.*)',
-                             text, re.IGNORECASE)
+            pattern = '(.*)(' + re.escape(self.highlight_text) + ')(.*)'
+            match = re.match(pattern, text, re.IGNORECASE)
             if match:
                 start = match.group(1) or ''
                 middle = match.group(2) or ''
@@ -251,6 +296,9 @@ class HighlightDelegate(QtGui.QStyledItemDelegate):
 
 
 class CompletionModel(QtGui.QStandardItemModel):
+    # Upper bound on the number of rows created for completion matches
+    max_matches = 1000
+
     def __init__(self, parent):
         QtGui.QStandardItemModel.__init__(self, parent)
         self.matched_text = ''
@@ -260,12 +308,6 @@ class CompletionModel(QtGui.QStandardItemModel):
         self.connect(self.update_thread, SIGNAL('items_gathered'),
                      self.apply_matches)
 
-    def lower_completion_cmp(self, a, b):
-        return cmp(a.replace('.','').lower(), a.replace('.','').lower())
-
-    def completion_cmp(self, a, b):
-        return cmp(a.replace('.',''), a.replace('.',''))
-
     def update(self):
         case_sensitive = self.update_thread.case_sensitive
         self.update_matches(case_sensitive)
@@ -276,13 +318,14 @@ class CompletionModel(QtGui.QStandardItemModel):
 
     def update_matches(self, case_sensitive):
         self.case_sensitive = case_sensitive
-        self.update_thread.case_sensitive = case_sensitive
-        if not self.update_thread.isRunning():
-            self.update_thread.start()
+        self.update_thread.request(case_sensitive)
 
-    def gather_matches(self, case_sensitive):
+    def gather_matches(self, case_sensitive, cancelled=None):
         return ((), (), set())
 
+    def dispose(self):
+        self.update_thread.stop()
+
     def apply_matches(self, match_tuple):
         matched_refs, matched_paths, dirs = match_tuple
         QStandardItem = QtGui.QStandardItem
@@ -347,67 +390,73 @@ class GitRefCompletionModel(CompletionModel):
     def __init__(self, parent):
         CompletionModel.__init__(self, parent)
         self.cola_model = model = cola.model()
+        self._ref_index = None
         msg = model.message_updated
         model.add_observer(msg, self.emit_updated)
 
     def emit_updated(self):
+        self.invalidate()
         self.emit(SIGNAL('updated()'))
 
+    def invalidate(self):
+        """Discard indexes so that they are rebuilt on the next query."""
+        self._ref_index = None
+
     def matches(self):
         model = self.cola_model
         return model.local_branches + model.remote_branches + model.tags
 
+    def ref_index(self):
+        index = self._ref_index
+        if index is None:
+            index = self._ref_index = CompletionIndex(self.matches())
+        return index
+
     def dispose(self):
+        CompletionModel.dispose(self)
         self.cola_model.remove_observer(self.emit_updated)
 
-    def gather_matches(self, case_sensitive):
-        refs = self.matches()
-        matched_text = self.matched_text
-        if matched_text:
-            if not case_sensitive:
-                matched_refs = [r for r in refs if matched_text in r]
-            else:
-                matched_refs = [r for r in refs
-                                    if matched_text.lower() in r.lower()]
-        else:
-            matched_refs = refs
-
-        if self.case_sensitive:
-            matched_refs.sort(cmp=self.completion_cmp)
-        else:
-            matched_refs.sort(cmp=self.lower_completion_cmp)
+    def gather_matches(self, case_sensitive, cancelled=None):
+        index = self.ref_index()
+        matched_refs = index.fuzzy_search(self.matched_text,
+                                          case_sensitive=case_sensitive,
+                                          limit=self.max_matches,
+                                          cancelled=cancelled)
         return (matched_refs, (), set())
 
 
 class GitLogCompletionModel(GitRefCompletionModel):
     def __init__(self, parent):
         GitRefCompletionModel.__init__(self, parent)
+        self._path_index = None
 
-    def gather_matches(self, case_sensitive):
-        (matched_refs, dummy_paths, dummy_dirs) =\
-                GitRefCompletionModel.gather_matches(self, case_sensitive)
-
-        file_list = self.cola_model.everything()
-        files = set(file_list)
-        files_and_dirs = utils.add_parents(set(files))
+    def invalidate(self):
+        GitRefCompletionModel.invalidate(self)
+        self._path_index = None
 
-        dirs = files_and_dirs.difference(files)
-        matched_text = self.matched_text
-        if matched_text:
-            if case_sensitive:
-                matched_paths = [f for f in files_and_dirs
-                                        if matched_text in f]
-            else:
-                matched_paths = [f for f in files_and_dirs
-                                    if matched_text.lower() in f.lower()]
-        else:
-            matched_paths = list(files_and_dirs)
+    def path_index(self):
+        index = self._path_index
+        if index is None:
+            paths = self.cola_model.everything()
+            index = self._path_index = PathCompletionIndex(paths)
+        return index
 
-        if self.case_sensitive:
-            matched_paths.sort(cmp=self.completion_cmp)
+    def gather_matches(self, case_sensitive, cancelled=None):
+        (matched_refs, dummy_paths, dummy_dirs) =\
+                GitRefCompletionModel.gather_matches(self, case_sensitive,
+                                                     cancelled=cancelled)
+
+        # Refs and paths share a single bound on the number of rows
+        limit = self.max_matches - len(matched_refs)
+        index = self.path_index()
+        if limit > 0:
+            matched_paths = index.fuzzy_search(self.matched_text,
+                                               case_sensitive=case_sensitive,
+                                               limit=limit,
+                                               cancelled=cancelled)
         else:
-            matched_paths.sort(cmp=self.lower_completion_cmp)
-        return (matched_refs, matched_paths, dirs)
+            matched_paths = []
+        return (matched_refs, matched_paths, index.dirs)
 
 
 class GitLogCompleter(Completer):
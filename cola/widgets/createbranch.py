@@ -8,6 +8,7 @@ from cola import gitcmds
 from cola import qt
 from cola import qtutils
 from cola import utils
+from cola.models import snapshot
 from cola.widgets import defs
 from cola.widgets import completion
 from cola.widgets.standard import Dialog
@@ -250,7 +251,7 @@ class CreateBranchDialog(Dialog):
         branch = self.opts.branch
         no_update = self.no_update_radio.isChecked()
         ffwd_only = self.ffwd_only_radio.isChecked()
-        existing_branches = gitcmds.branch_list()
+        existing_branches = snapshot.instance().branch_list()
         check_branch = False
 
         if not branch or not revision:
@@ -3,11 +3,12 @@ from PyQt4 import QtGui
 from PyQt4.QtCore import Qt
 from PyQt4.QtCore import SIGNAL
 
-from cola import core
 from cola import guicmds
 from cola import utils
 from cola import qtutils
-from cola.git import git
+from cola.models.grep import GrepSearch
+from cola.models.grep import RESULT_LIMIT
+from cola.models.grep import parse_count
 from cola.prefs import diff_font
 from cola.widgets import defs
 from cola.widgets.standard import Dialog
@@ -15,26 +16,28 @@ from cola.widgets.text import HintedTextView, HintedLineEdit
 
 
 class GrepThread(QtCore.QThread):
-    def __init__(self, parent):
+    """Streams `git grep` results for a single search
+
+    Results are emitted in batches as they arrive, tagged with the
+    generation of the search so that the results of an abandoned
+    search can be ignored.  A paused search continues when the thread
+    is started again with a larger limit.
+
+    """
+    def __init__(self, parent, search, generation):
         QtCore.QThread.__init__(self, parent)
-        self.txt = None
-        self.shell = False
+        self.search = search
+        self.generation = generation
+        self.limit = RESULT_LIMIT
 
     def run(self):
-        if self.txt is None:
-            return
-        query = self.txt
-
-        if self.shell:
-            args = utils.shell_split(query)
-        else:
-            args = [query]
-        status, out = git.grep(with_status=True, with_stderr=True,
-                               n=True, *args)
-        if query == self.txt:
-            self.emit(SIGNAL('result'), status, core.decode(out))
-        else:
-            self.run()
+        search = self.search
+        generation = self.generation
+        for lines in search.read(self.limit):
+            self.emit(SIGNAL('results'), generation, lines)
+        if not search.cancelled:
+            self.emit(SIGNAL('paused'), generation,
+                      search.status, search.exhausted(), search.count)
 
 
 class Grep(Dialog):
@@ -65,6 +68,17 @@ class Grep(Dialog):
                 'Queries with spaces will require "double quotes".')
         self.shell_checkbox.setChecked(False)
 
+        self.counts_checkbox = QtGui.QCheckBox(self.tr('Count per file'))
+        self.counts_checkbox.setToolTip(
+                'List the number of matches in each file.\n'
+                'Use "Edit" on a file to show its matches.')
+        self.counts_checkbox.setChecked(False)
+
+        self.more_button = QtGui.QPushButton(self.tr('Load More'))
+        self.more_button.setEnabled(False)
+
+        self.status_label = QtGui.QLabel()
+
         self.close_button = QtGui.QPushButton(self.tr('Close'))
 
         self.input_layout = QtGui.QHBoxLayout()
@@ -84,7 +98,10 @@ class Grep(Dialog):
 
         self.bottom_layout.addWidget(self.edit_button)
         self.bottom_layout.addWidget(self.shell_checkbox)
+        self.bottom_layout.addWidget(self.counts_checkbox)
         self.bottom_layout.addStretch()
+        self.bottom_layout.addWidget(self.status_label)
+        self.bottom_layout.addWidget(self.more_button)
         self.bottom_layout.addWidget(self.close_button)
 
         self.mainlayout.addLayout(self.input_layout)
@@ -92,10 +109,13 @@ class Grep(Dialog):
         self.mainlayout.addLayout(self.bottom_layout)
         self.setLayout(self.mainlayout)
 
-        self.grep_thread = GrepThread(self)
-
-        self.connect(self.grep_thread, SIGNAL('result'),
-                     self.process_result)
+        # The thread of the current search and the generation that tags
+        # its results.  Threads are kept until their search is finished.
+        self.grep_thread = None
+        self.generation = 0
+        self.threads = set()
+        # Matches counted so far when counting per file
+        self.total = 0
 
         self.connect(self.input_txt, SIGNAL('textChanged(QString)'),
                      self.input_txt_changed)
@@ -103,7 +123,13 @@ class Grep(Dialog):
         self.connect(self.input_txt, SIGNAL('returnPressed()'),
                      lambda: self.result_txt.setFocus())
 
+        self.connect(self.result_txt, SIGNAL('edit'), self.edit)
+
+        self.connect(self.counts_checkbox, SIGNAL('toggled(bool)'),
+                     lambda checked: self.search())
+
         qtutils.connect_button(self.edit_button, self.edit)
+        qtutils.connect_button(self.more_button, self.load_more)
         qtutils.connect_button(self.close_button, self.close)
         qtutils.add_close_action(self)
 
@@ -112,30 +138,132 @@ class Grep(Dialog):
 
     def done(self, exit_code):
         qtutils.save_state(self)
+        self.abandon()
+        for thread in list(self.threads):
+            thread.wait()
         return Dialog.done(self, exit_code)
 
+    def request(self, txt, shell=False, counts=False, paths=None):
+        """Start searching for txt on a new thread"""
+        self.abandon()
+        if shell:
+            args = utils.shell_split(txt)
+        else:
+            args = [txt]
+        self.generation += 1
+        search = GrepSearch(args, counts=counts, paths=paths)
+        thread = self.grep_thread = GrepThread(self, search, self.generation)
+        self.threads.add(thread)
+        self.connect(thread, SIGNAL('results'), self.process_results)
+        self.connect(thread, SIGNAL('paused'), self.process_paused)
+        self.connect(thread, SIGNAL('finished()'),
+                     lambda: self.thread_finished(thread))
+        thread.start()
+
+    def abandon(self):
+        """Cancel the current search without waiting for its thread
+
+        A paused search has no running thread, so its thread is started
+        once more to reap the killed git process.
+
+        """
+        thread = self.grep_thread
+        self.grep_thread = None
+        # Batches that are still queued from the thread are ignored
+        self.generation += 1
+        if thread is None:
+            return
+        thread.search.cancel()
+        if not thread.isRunning():
+            thread.start()
+
+    def thread_finished(self, thread):
+        """Release a thread once its search is cancelled or complete"""
+        if thread.isRunning() or thread is self.grep_thread:
+            return
+        if thread in self.threads:
+            self.threads.remove(thread)
+            thread.deleteLater()
+
+    def is_stale(self, generation):
+        return generation != self.generation
+
     def input_txt_changed(self, txt):
         has_query = len(unicode(txt)) > 1
         if has_query:
             self.search()
 
-    def search(self):
+    def search(self, paths=None):
+        if self.input_txt.is_hint():
+            return
+        txt = self.input_txt.as_unicode()
         self.edit_button.setEnabled(False)
-
-        self.grep_thread.txt = self.input_txt.as_unicode()
-        self.grep_thread.shell = self.shell_checkbox.isChecked()
-        self.grep_thread.start()
+        self.more_button.setEnabled(False)
+        self.status_label.setText(self.tr('Searching...'))
+        self.result_txt.set_value('')
+        self.total = 0
+
+        self.request(txt,
+                     shell=self.shell_checkbox.isChecked(),
+                     counts=self.counts_checkbox.isChecked(),
+                     paths=paths)
+
+    def load_more(self):
+        self.more_button.setEnabled(False)
+        thread = self.grep_thread
+        if thread is None or thread.search.exhausted():
+            return
+        self.status_label.setText(self.tr('Searching...'))
+        thread.wait()
+        thread.limit = thread.search.count + RESULT_LIMIT
+        thread.start()
 
     def search_for(self, txt):
         self.input_txt.set_value(txt)
         self.run()
 
-    def process_result(self, status, out):
-        self.result_txt.set_value(out)
-        self.edit_button.setEnabled(status == 0)
+    def process_results(self, generation, lines):
+        if self.is_stale(generation):
+            return
+        self.result_txt.append_lines(lines)
+        self.edit_button.setEnabled(True)
+        if self.grep_thread.search.counts:
+            for line in lines:
+                try:
+                    self.total += parse_count(line)[1]
+                except ValueError:
+                    pass
+
+    def process_paused(self, generation, status, exhausted, count):
+        if self.is_stale(generation):
+            return
+        self.more_button.setEnabled(not exhausted)
+        if self.grep_thread.search.counts:
+            summary = unicode(self.tr('%d matches in %d files'))
+            summary = summary % (self.total, count)
+        else:
+            summary = unicode(self.tr('%d results')) % count
+        if not exhausted:
+            summary = unicode(self.tr('First %s')) % summary
+        self.status_label.setText(summary)
+        if exhausted:
+            self.edit_button.setEnabled(status == 0)
 
     def edit(self):
-        guicmds.goto_grep(self.result_txt.selected_line()),
+        line = self.result_txt.selected_line()
+        thread = self.grep_thread
+        if thread is not None and thread.search.counts:
+            # Drill into the selected file's matches
+            try:
+                path, count = parse_count(line)
+            except ValueError:
+                return
+            self.counts_checkbox.blockSignals(True)
+            self.counts_checkbox.setChecked(False)
+            self.counts_checkbox.blockSignals(False)
+            self.search(paths=[path])
+            return
+        guicmds.goto_grep(line)
 
 
 class GrepLineEdit(HintedLineEdit):
@@ -154,7 +282,7 @@ class GrepTextView(HintedTextView):
         HintedTextView.__init__(self, hint, parent)
         self.goto_action = qtutils.add_action(
                 self, 'Launch Editor',
-                lambda: guicmds.goto_grep(self.selected_line()))
+                lambda: self.emit(SIGNAL('edit')))
         self.goto_action.setShortcut(defs.editor_shortcut)
 
         qtutils.add_action(self, 'Up',
@@ -197,6 +325,16 @@ class GrepTextView(HintedTextView):
                 lambda: self.page(self.height()/2),
                 Qt.Key_Space)
 
+    def append_lines(self, lines):
+        """Append result lines without disturbing the cursor"""
+        text = '\n'.join(lines)
+        if self.document().isEmpty():
+            self.set_value(text)
+            return
+        cursor = QtGui.QTextCursor(self.document())
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.insertText('\n' + text)
+
     def contextMenuEvent(self, event):
         menu = self.createStandardContextMenu(event.pos())
         menu.addSeparator()
@@ -7,10 +7,11 @@ from PyQt4.QtCore import Qt
 from PyQt4.QtCore import SIGNAL
 
 import cola
-from cola import gitcmds
 from cola import prefs
 from cola import qtutils
+from cola import tasks
 from cola import utils
+from cola.models import snapshot
 from cola.qtutils import connect_button
 from cola.widgets import defs
 from cola.widgets import standard
@@ -49,9 +50,9 @@ def run(RemoteDialog):
     return view
 
 
-class ActionTask(QtCore.QRunnable):
+class ActionTask(tasks.Task):
     def __init__(self, sender, model_action, remote, kwargs):
-        QtCore.QRunnable.__init__(self)
+        tasks.Task.__init__(self)
         self.sender = sender
         self.model_action = model_action
         self.remote = remote
@@ -322,7 +323,7 @@ class RemoteActionDialog(standard.Dialog):
             return
         self.set_remote_name(selection)
 
-        all_branches = gitcmds.branch_list(remote=True)
+        all_branches = snapshot.instance().branch_list(remote=True)
         branches = []
         pat = selection + '/*'
         for branch in all_branches:
@@ -443,7 +444,7 @@ class RemoteActionDialog(standard.Dialog):
         # Use a thread to update in the background
         task = ActionTask(self, model_action, remote, kwargs)
         self.tasks.append(task)
-        QtCore.QThreadPool.globalInstance().start(task)
+        tasks.submit(task, queue=tasks.ACTIONS)
 
     def update_progress(self, txt):
         self.progress.setLabelText(txt)
@@ -8,9 +8,13 @@ from PyQt4 import QtCore
 from PyQt4.QtCore import SIGNAL
 
 from cola import gitcmds
+from cola import guicmds
 from cola import utils
 from cola import qtutils
 from cola.git import git
+from cola.models import commitindex
+from cola.models import pathindex
+from cola.models import pickaxe
 from cola.qt import create_toolbutton
 from cola.qtutils import connect_button
 from cola.qtutils import dir_icon
@@ -62,6 +66,8 @@ class SearchWidget(standard.Dialog):
         self.max_count.setSingleStep(5)
         self.max_count.setValue(500)
 
+        self.status_label = QtGui.QLabel()
+
         self.commit_list = QtGui.QListWidget()
         self.commit_list.setMinimumSize(QtCore.QSize(1, 1))
         self.commit_list.setAlternatingRowColors(True)
@@ -75,6 +81,10 @@ class SearchWidget(standard.Dialog):
         self.button_cherrypick = QtGui.QPushButton()
         self.button_cherrypick.setText(self.tr('Cherry Pick'))
 
+        self.button_stop = QtGui.QPushButton()
+        self.button_stop.setText(self.tr('Stop'))
+        self.button_stop.setEnabled(False)
+
         self.button_close = QtGui.QPushButton()
         self.button_close.setText(self.tr('Close'))
 
@@ -104,6 +114,8 @@ class SearchWidget(standard.Dialog):
         self.bottom_layout.addWidget(self.button_export)
         self.bottom_layout.addWidget(self.button_cherrypick)
         self.bottom_layout.addStretch()
+        self.bottom_layout.addWidget(self.status_label)
+        self.bottom_layout.addWidget(self.button_stop)
         self.bottom_layout.addWidget(self.button_close)
 
         self.main_layout = QtGui.QVBoxLayout()
@@ -163,35 +175,126 @@ class RevisionSearch(SearchEngine):
 
 
 class PathSearch(SearchEngine):
+    """Searches the history of paths
+
+    When cola.pathindex is enabled and git cannot store changed-path
+    filters in its commit-graph, the path index rules out the commits
+    that did not change the paths, and git only examines the rest.
+    While the index is out of date the whole history is searched and
+    the index is updated in the background.
+
+    """
     def results(self):
         query, args = self.common_args()
-        paths = ['--'] + utils.shell_split(query)
-        return self.revisions(all=True, *paths, **args)
-
+        paths = utils.shell_split(query)
+        if pathindex.enabled() and not pathindex.have_bloom_filters():
+            candidates = pathindex.instance().candidates(paths)
+            if candidates is not None:
+                if not candidates:
+                    return []
+                return self.revisions('--stdin', '--', no_walk=True,
+                                      input_data='\n'.join(candidates),
+                                      *paths, **args)
+            guicmds.update_path_index()
+        return self.revisions(all=True, *(['--'] + paths), **args)
+
+
+class IndexedSearch(SearchEngine):
+    """Searches `git log --all` for a single option, e.g. --grep
+
+    When cola.searchindex is enabled the commit index narrows the search
+    down to the commits that contain every word of the query, and git
+    only examines those.  While the index is out of date the whole
+    history is searched and the index is updated in the background.
+
+    """
+    field = None
+    option = None
 
-class MessageSearch(SearchEngine):
     def results(self):
         query, kwargs = self.common_args()
-        return self.revisions(all=True, grep=query, **kwargs)
+        kwargs[self.option] = query
+        if commitindex.enabled():
+            candidates = commitindex.instance().candidates(self.field, query)
+            if candidates is not None:
+                if not candidates:
+                    return []
+                return self.revisions('--stdin', no_walk=True,
+                                      input_data='\n'.join(candidates),
+                                      **kwargs)
+            guicmds.update_search_index()
+        return self.revisions(all=True, **kwargs)
 
 
-class AuthorSearch(SearchEngine):
-    def results(self):
-        query, kwargs = self.common_args()
-        return self.revisions(all=True, author=query, **kwargs)
+class MessageSearch(IndexedSearch):
+    field = commitindex.MESSAGE
+    option = 'grep'
 
 
-class CommitterSearch(SearchEngine):
-    def results(self):
-        query, kwargs = self.common_args()
-        return self.revisions(all=True, committer=query, **kwargs)
+class AuthorSearch(IndexedSearch):
+    field = commitindex.AUTHOR
+    option = 'author'
+
+
+class CommitterSearch(IndexedSearch):
+    field = commitindex.COMMITTER
+    option = 'committer'
 
 
 class DiffSearch(SearchEngine):
-    def results(self):
-        query, kwargs = self.common_args()
-        return gitcmds.parse_rev_list(
-            git.log('-S'+query, all=True, **kwargs))
+    """Searches diffs with `git log -S` in the background"""
+    mode = pickaxe.STRING
+
+    def stream(self):
+        return pickaxe.PickaxeSearch(self.model.query, mode=self.mode,
+                                     cache=pickaxe.cache())
+
+
+class DiffRegexSearch(DiffSearch):
+    """Searches diffs with `git log -G` in the background"""
+    mode = pickaxe.REGEX
+
+
+class SearchThread(QtCore.QThread):
+    """Streams the results of a pickaxe search
+
+    Results are emitted in batches as they are found.  Starting a new
+    search terminates the previous one.  Each search is tagged with a
+    generation so that stale batches can be ignored.
+
+    """
+    def __init__(self, parent):
+        QtCore.QThread.__init__(self, parent)
+        self.search = None
+        self.generation = 0
+        self.limit = 0
+
+    def request(self, search, limit):
+        """Start a search, abandoning any previous search"""
+        self.stop()
+        self.generation += 1
+        self.search = search
+        self.limit = limit
+        self.start()
+
+    def stop(self):
+        """Terminate the current search"""
+        if self.search is not None:
+            self.search.cancel()
+        self.wait()
+
+    def is_stale(self, generation):
+        return generation != self.generation
+
+    def run(self):
+        search = self.search
+        generation = self.generation
+        if search is None:
+            return
+        for results in search.read(self.limit):
+            self.emit(SIGNAL('results'), generation, results)
+        self.emit(SIGNAL('done'), generation,
+                  search.status, search.cancelled, search.count)
 
 
 class DateRangeSearch(SearchEngine):
@@ -214,6 +317,7 @@ class Search(SearchWidget):
     PATH            = 'Search by Path'
     MESSAGE         = 'Search Commit Messages'
     DIFF            = 'Search Diffs'
+    DIFF_REGEX      = 'Search Diffs (Regex)'
     AUTHOR          = 'Search Authors'
     COMMITTER       = 'Search Committers'
     DATE_RANGE      = 'Search Date Range'
@@ -228,21 +332,31 @@ class Search(SearchWidget):
             self.PATH:           PathSearch,
             self.MESSAGE:        MessageSearch,
             self.DIFF:           DiffSearch,
+            self.DIFF_REGEX:     DiffRegexSearch,
             self.AUTHOR:         AuthorSearch,
             self.COMMITTER:      CommitterSearch,
             self.DATE_RANGE:     DateRangeSearch,
         }
 
         self.modes = (self.EXPR, self.PATH, self.DATE_RANGE,
-                      self.DIFF, self.MESSAGE, self.AUTHOR, self.COMMITTER)
+                      self.DIFF, self.DIFF_REGEX,
+                      self.MESSAGE, self.AUTHOR, self.COMMITTER)
         self.mode_combo.addItems(self.modes)
 
         connect_button(self.search_button, self.search_callback)
         connect_button(self.browse_button, self.browse_callback)
         connect_button(self.button_export, self.export_patch)
         connect_button(self.button_cherrypick, self.cherry_pick)
+        connect_button(self.button_stop, self.stop_search)
         connect_button(self.button_close, self.accept)
 
+        self.results = []
+        self.search_thread = SearchThread(self)
+        self.connect(self.search_thread, SIGNAL('results'),
+                     self.process_results)
+        self.connect(self.search_thread, SIGNAL('done'),
+                     self.process_done)
+
         self.connect(self.mode_combo, SIGNAL('currentIndexChanged(int)'),
                      self.mode_index_changed)
 
@@ -304,13 +418,55 @@ class Search(SearchWidget):
         self.model.start_date = str(self.start_date.date().toString(fmt))
         self.model.end_date = str(self.end_date.date().toString(fmt))
 
-        self.results = engineclass(self.model).search()
+        self.stop_search()
+        self.status_label.setText('')
+        engine = engineclass(self.model)
+        if isinstance(engine, DiffSearch):
+            self.results = []
+            self.commit_list.clear()
+            self.commit_text.setText('')
+            if engine.validate():
+                self.status_label.setText(self.tr('Searching...'))
+                self.button_stop.setEnabled(True)
+                self.search_thread.request(engine.stream(),
+                                           self.model.max_count)
+            return
+
+        self.results = engine.search()
         if self.results:
             self.display_results()
         else:
             self.commit_list.clear()
             self.commit_text.setText('')
 
+    def stop_search(self):
+        self.search_thread.stop()
+        self.button_stop.setEnabled(False)
+
+    def process_results(self, generation, results):
+        if self.search_thread.is_stale(generation):
+            return
+        self.results.extend(results)
+        self.commit_list.addItems([summary for sha1, summary in results])
+
+    def process_done(self, generation, status, cancelled, count):
+        if self.search_thread.is_stale(generation):
+            return
+        self.button_stop.setEnabled(False)
+        if cancelled:
+            summary = unicode(self.tr('Stopped after %d results')) % count
+        elif status is None:
+            summary = unicode(self.tr('First %d results')) % count
+        elif status != 0:
+            summary = unicode(self.tr('Search failed'))
+        else:
+            summary = unicode(self.tr('%d results')) % count
+        self.status_label.setText(summary)
+
+    def done(self, exit_code):
+        self.search_thread.stop()
+        return SearchWidget.done(self, exit_code)
+
     def browse_callback(self):
         paths = QtGui.QFileDialog.getOpenFileNames(self,
                                                    self.tr('Choose Path(s)'))
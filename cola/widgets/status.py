@@ -13,6 +13,8 @@ from cola import utils
 from cola.compat import set
 from cola.qtutils import SLOT
 from cola.widgets import defs
+from cola.models import statusindex
+from cola.models.statusfilter import StatusFilter
 from cola.models.selection import State
 
 
@@ -39,10 +41,20 @@ class StatusWidget(QtGui.QWidget):
         self.layout = QtGui.QVBoxLayout(self)
         self.setLayout(self.layout)
 
+        self.filter_text = QtGui.QLineEdit(self)
+        self.filter_text.setToolTip(self.tr('Filter paths by substring '
+                                            'or glob, e.g. *.py'))
+        if hasattr(self.filter_text, 'setPlaceholderText'):
+            self.filter_text.setPlaceholderText(self.tr('Filter paths'))
+        self.layout.addWidget(self.filter_text)
+
         self.tree = StatusTreeWidget(self)
         self.layout.addWidget(self.tree)
         self.layout.setContentsMargins(0, 0, 0, 0)
 
+        self.connect(self.filter_text, SIGNAL('textChanged(QString)'),
+                     lambda txt: self.tree.set_filter(unicode(txt)))
+
 
 class StatusTreeWidget(QtGui.QTreeWidget):
     # Item categories
@@ -82,6 +94,20 @@ class StatusTreeWidget(QtGui.QTreeWidget):
 
         self.expanded_items = set()
 
+        # The paths and check state currently displayed in each category
+        self._subtree_paths = {}
+        self._subtree_check = {}
+        # The icon file shown by each staged path
+        self._staged_icons = {}
+        # The status index that the displayed rows were built from,
+        # and the paths whose status changed since then
+        self._rows_index = None
+        self._changed_paths = None
+
+        # Narrows the displayed paths; the index is built on demand
+        self.filter_text = ''
+        self._filter = None
+
         self.process_selection = qtutils.add_action(self,
                 'Process Selection', self._process_selection,
                 defs.stage_shortcut)
@@ -121,11 +147,14 @@ class StatusTreeWidget(QtGui.QTreeWidget):
         self.copy_path_action.setIcon(qtutils.theme_icon('edit-copy.svg'))
 
         self.connect(self, SIGNAL('about_to_update'), self._about_to_update)
+        self.connect(self, SIGNAL('paths_changed'), self._paths_changed)
         self.connect(self, SIGNAL('updated'), self._updated)
 
         self.m = cola.model()
         self.m.add_observer(self.m.message_about_to_update,
                             self.about_to_update)
+        self.m.add_observer(self.m.message_paths_changed,
+                            self.paths_changed)
         self.m.add_observer(self.m.message_updated, self.updated)
 
         self.connect(self, SIGNAL('itemSelectionChanged()'),
@@ -158,21 +187,22 @@ class StatusTreeWidget(QtGui.QTreeWidget):
         old_c = self.old_contents
         old_s = self.old_selection
         new_c = self.contents()
+        row = self._row
 
         def select_modified(item):
-            idx = new_c.modified.index(item)
+            idx = row(self.idx_modified, statusindex.MODIFIED, item)
             select_item(self, self.modified_item(idx))
 
         def select_unmerged(item):
-            idx = new_c.unmerged.index(item)
+            idx = row(self.idx_unmerged, statusindex.UNMERGED, item)
             select_item(self, self.unmerged_item(idx))
 
         def select_untracked(item):
-            idx = new_c.untracked.index(item)
+            idx = row(self.idx_untracked, statusindex.UNTRACKED, item)
             select_item(self, self.untracked_item(idx))
 
         def select_staged(item):
-            idx = new_c.staged.index(item)
+            idx = row(self.idx_staged, statusindex.STAGED, item)
             select_item(self, self.staged_item(idx))
 
         restore_selection_actions = (
@@ -194,6 +224,8 @@ class StatusTreeWidget(QtGui.QTreeWidget):
                         for j in itertools.chain(old[idx+1:],
                                                  reversed(old[:idx])):
                             if j in new_set:
+                                # Kept items are still selected
+                                self.clearSelection()
                                 action(j)
                                 return
 
@@ -204,6 +236,15 @@ class StatusTreeWidget(QtGui.QTreeWidget):
                 if item in new_set:
                     action(item)
 
+    def _row(self, idx, flag, path):
+        """Return the displayed row for a path within a category"""
+        if not self.filter_text:
+            return self.m.status_index.row(flag, path)
+        try:
+            return self._subtree_paths.get(idx, []).index(path)
+        except ValueError:
+            return None
+
     def staged_item(self, itemidx):
         return self._subtree_item(self.idx_staged, itemidx)
 
@@ -251,15 +292,28 @@ class StatusTreeWidget(QtGui.QTreeWidget):
         if vscroll:
             self.old_scroll = vscroll.value()
 
+    def paths_changed(self, paths):
+        """Record the paths whose status changed in the coming update"""
+        self.emit(SIGNAL('paths_changed'), paths)
+
+    def _paths_changed(self, paths):
+        if self._changed_paths is None:
+            self._changed_paths = set()
+        self._changed_paths.update(paths)
+
     def updated(self):
         """Update display from model data."""
         self.emit(SIGNAL('updated'))
 
     def _updated(self):
-        self.set_staged(self.m.staged)
-        self.set_modified(self.m.modified)
-        self.set_unmerged(self.m.unmerged)
-        self.set_untracked(self.m.untracked)
+        changed = self._changed_paths
+        self._changed_paths = None
+        self._filter = None
+        if (changed is None or self.filter_text or
+                self._rows_index is None):
+            self._apply_filter()
+        else:
+            self._apply_changes(changed)
 
         vscroll = self.verticalScrollBar()
         if vscroll and self.old_scroll is not None:
@@ -269,6 +323,102 @@ class StatusTreeWidget(QtGui.QTreeWidget):
         self.restore_selection()
         self.update_column_widths()
 
+    def set_filter(self, text):
+        """Display only the paths that match text"""
+        if text == self.filter_text:
+            return
+        self.filter_text = text
+        self._apply_filter()
+        self.update_column_widths()
+
+    def _filtered(self, items):
+        if not self.filter_text:
+            return items
+        if self._filter is None:
+            self._filter = StatusFilter(self.m.staged + self.m.unmerged +
+                                        self.m.modified + self.m.untracked)
+        return self._filter.filter(self.filter_text, items)
+
+    def _apply_filter(self):
+        self.set_staged(self._filtered(self.m.staged))
+        self.set_modified(self._filtered(self.m.modified))
+        self.set_unmerged(self._filtered(self.m.unmerged))
+        self.set_untracked(self._filtered(self.m.untracked))
+        if self.filter_text:
+            self._rows_index = None
+        else:
+            self._rows_index = self.m.status_index
+
+    def _apply_changes(self, paths):
+        """Update only the rows of paths whose status changed"""
+        check = not self.m.amending()
+        self._update_rows(paths, self.m.staged, self.idx_staged,
+                          statusindex.STAGED, staged=True, check=check)
+        self._update_rows(paths, self.m.modified, self.idx_modified,
+                          statusindex.MODIFIED)
+        self._update_rows(paths, self.m.unmerged, self.idx_unmerged,
+                          statusindex.UNMERGED)
+        self._update_rows(paths, self.m.untracked, self.idx_untracked,
+                          statusindex.UNTRACKED)
+        self._rows_index = self.m.status_index
+
+    def _update_rows(self, paths, items, idx, flag, staged=False, check=True):
+        """Remove and insert the rows of paths within a category
+
+        The rows are looked up in the old and new status indexes so
+        that the cost depends on the number of paths rather than on the
+        number of items.  The whole category is rebuilt when the rows
+        do not add up to the new items.
+
+        """
+        old_index = self._rows_index
+        new_index = self.m.status_index
+        old_items = self._subtree_paths.get(idx, [])
+        removals = []
+        insertions = []
+        kept = []
+        for path in paths:
+            old_row = old_index.row(flag, path)
+            new_row = new_index.row(flag, path)
+            if old_row is not None and new_row is None:
+                removals.append(old_row)
+            elif old_row is None and new_row is not None:
+                insertions.append((new_row, path))
+            elif old_row is not None:
+                kept.append((new_row, path))
+        removals.sort()
+        insertions.sort()
+
+        if (self._subtree_check.get(idx) != check or
+                len(old_items) - len(removals) + len(insertions) !=
+                len(items)):
+            self._set_subtree(items, idx, staged=staged, check=check)
+            return
+        if not removals and not insertions and not (staged and kept):
+            return
+
+        parent = self.topLevelItem(idx)
+        self.setItemHidden(parent, not items)
+        self._apply_rows(parent, removals, insertions,
+                         staged=staged, check=check)
+
+        if staged and check:
+            # The icon of a kept staged path follows its worktree status
+            icons = self._staged_icons
+            for row in removals:
+                icons.pop(old_items[row], None)
+            for row, path in insertions:
+                icons[path] = qtutils.icon_file(path, staged=True)
+            for row, path in kept:
+                ifile = qtutils.icon_file(path, staged=True)
+                if icons.get(path) != ifile:
+                    icons[path] = ifile
+                    parent.child(row).setIcon(
+                            0, qtutils.cached_icon_from_path(ifile))
+
+        self._subtree_paths[idx] = list(items)
+        self.expand_items(idx, items)
+
     def set_staged(self, items):
         """Adds items to the 'Staged' subtree."""
         self._set_subtree(items, self.idx_staged, staged=True,
@@ -290,21 +440,74 @@ class StatusTreeWidget(QtGui.QTreeWidget):
                      staged=False,
                      untracked=False,
                      check=True):
-        """Add a list of items to a treewidget item."""
+        """Apply a list of items to a treewidget item.
+
+        Only the rows that were added or removed since the last update
+        are touched so that unchanged items, and their selection, are
+        kept as-is.
+
+        """
         parent = self.topLevelItem(idx)
         if items:
             self.setItemHidden(parent, False)
         else:
             self.setItemHidden(parent, True)
-        parent.takeChildren()
-        for item in items:
-            treeitem = qtutils.create_treeitem(item,
-                                               staged=staged,
-                                               check=check,
-                                               untracked=untracked)
-            parent.addChild(treeitem)
+
+        old_items = self._subtree_paths.get(idx, [])
+        diff = None
+        if self._subtree_check.get(idx) == check:
+            diff = utils.list_diff(old_items, items)
+        if diff is None:
+            removals = range(len(old_items))
+            insertions = list(enumerate(items))
+        else:
+            removals, insertions = diff
+
+        self._apply_rows(parent, removals, insertions,
+                         staged=staged, check=check, untracked=untracked)
+
+        if staged and check:
+            # A kept staged path can be removed from, or restored to,
+            # the worktree, which changes its icon.
+            inserted = set([item for row, item in insertions])
+            icon_file = lambda x: qtutils.icon_file(x, staged=True)
+            for row, ifile in utils.changed_values(items, self._staged_icons,
+                                                   icon_file):
+                if items[row] not in inserted:
+                    parent.child(row).setIcon(
+                            0, qtutils.cached_icon_from_path(ifile))
+        elif staged:
+            self._staged_icons.clear()
+
+        self._subtree_paths[idx] = list(items)
+        self._subtree_check[idx] = check
         self.expand_items(idx, items)
 
+    def _apply_rows(self, parent, removals, insertions,
+                    staged=False, check=True, untracked=False):
+        """Remove rows, then insert (row, path) pairs, both ascending"""
+        if len(removals) == parent.childCount():
+            parent.takeChildren()
+        else:
+            for row in reversed(removals):
+                parent.takeChild(row)
+
+        # Insert contiguous rows in a single call
+        start = None
+        treeitems = []
+        for row, item in insertions:
+            if treeitems and row != start + len(treeitems):
+                parent.insertChildren(start, treeitems)
+                treeitems = []
+            if not treeitems:
+                start = row
+            treeitems.append(qtutils.create_treeitem(item,
+                                                     staged=staged,
+                                                     check=check,
+                                                     untracked=untracked))
+        if treeitems:
+            parent.insertChildren(start, treeitems)
+
     def update_column_widths(self):
         self.resizeColumnToContents(0)
 
@@ -493,6 +696,13 @@ class StatusTreeWidget(QtGui.QTreeWidget):
                                self._revert_uncommitted_edits)
 
         if s.untracked:
+            untracked_dirs = [p for p in s.untracked if p.endswith('/')]
+            if untracked_dirs:
+                menu.addSeparator()
+                menu.addAction(qtutils.dir_icon(),
+                               self.tr('Show Untracked Files'),
+                               SLOT(signals.expand_untracked,
+                                    untracked_dirs))
             menu.addSeparator()
             menu.addAction(qtutils.discard_icon(),
                            self.tr('Delete File(s)...'), self._delete_files)
@@ -608,8 +818,12 @@ class StatusTreeWidget(QtGui.QTreeWidget):
                      self.modified(), self.untracked())
 
     def contents(self):
-        return State(self.m.staged, self.m.unmerged,
-                     self.m.modified, self.m.untracked)
+        """Return the paths displayed in each category"""
+        paths = self._subtree_paths
+        return State(paths.get(self.idx_staged, []),
+                     paths.get(self.idx_unmerged, []),
+                     paths.get(self.idx_modified, []),
+                     paths.get(self.idx_untracked, []))
 
     def all_files(self):
         c = self.contents()
@@ -665,23 +879,23 @@ class StatusTreeWidget(QtGui.QTreeWidget):
         self.setItemSelected(item, True)
 
     def staged(self):
-        return self._subtree_selection(self.idx_staged, self.m.staged)
+        return self._subtree_selection(self.idx_staged)
 
     def unstaged(self):
         return self.unmerged() + self.modified() + self.untracked()
 
     def modified(self):
-        return self._subtree_selection(self.idx_modified, self.m.modified)
+        return self._subtree_selection(self.idx_modified)
 
     def unmerged(self):
-        return self._subtree_selection(self.idx_unmerged, self.m.unmerged)
+        return self._subtree_selection(self.idx_unmerged)
 
     def untracked(self):
-        return self._subtree_selection(self.idx_untracked, self.m.untracked)
+        return self._subtree_selection(self.idx_untracked)
 
-    def _subtree_selection(self, idx, items):
+    def _subtree_selection(self, idx):
         item = self.topLevelItem(idx)
-        return qtutils.tree_selection(item, items)
+        return qtutils.tree_selection(item, self._subtree_paths.get(idx, []))
 
     def mouseReleaseEvent(self, event):
         result = QtGui.QTreeWidget.mouseReleaseEvent(self, event)
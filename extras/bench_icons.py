@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""Measures the per-item cost of resolving file icons
+
+Usage: python extras/bench_icons.py [count]
+
+Times the uncached MIME-type lookup against the extension-cached
+lookup used by the status tree, for names and for files on disk.
+
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cola import utils
+
+
+EXTENSIONS = ('.py', '.c', '.h', '.txt', '.png', '.html', '.js', '.tar.gz',
+              '.java', '.rst', '.json', '.sh', '.xml', '.css', '')
+
+
+def names(count):
+    """Return count filenames spread across common extensions"""
+    return ['dir%d/file%d%s' % (idx % 100, idx,
+                                EXTENSIONS[idx % len(EXTENSIONS)])
+            for idx in range(count)]
+
+
+def measure(label, fn, items):
+    start = time.time()
+    for item in items:
+        fn(item)
+    elapsed = time.time() - start
+    print ('%-28s %8.3fs %8.2fus/item'
+           % (label, elapsed, elapsed * 1000000.0 / max(len(items), 1)))
+
+
+def main():
+    count = 50000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    items = names(count)
+    print ('%d items' % count)
+    measure('guess_file_type (uncached)', utils.guess_file_type, items)
+    measure('file_type (cached)', utils.file_type, items)
+
+    tmpdir = tempfile.mkdtemp(prefix='cola-bench-')
+    try:
+        paths = [os.path.join(tmpdir, name) for name in items]
+        for path in paths:
+            parent = os.path.dirname(path)
+            if not os.path.isdir(parent):
+                os.makedirs(parent)
+            open(path, 'w').close()
+        measure('ident_file_type (on disk)', utils.ident_file_type, paths)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
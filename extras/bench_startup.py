@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+"""Measures the cold-start time of git-cola against generated repositories
+
+Usage: python extras/bench_startup.py [options]
+
+A repository with the requested number of files, commits, modified and
+untracked files is generated, and `git cola --startup-timings` is run
+against it several times without a visible display.  One JSON object
+is printed per run, followed by a summary with the median time of each
+startup milestone, so that the results can be compared across releases.
+
+The offscreen Qt platform is requested for Qt builds that support it.
+When there is no X display, xvfb-run is used when it is installed.
+
+"""
+import optparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+try:
+    import simplejson
+    json = simplejson
+except ImportError:
+    import json
+
+PREFIX = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GIT_COLA = os.path.join(PREFIX, 'bin', 'git-cola')
+
+# Startup is abandoned after this many seconds
+TIMEOUT = 120
+
+
+def parse_args():
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--files', type='int', default=1000,
+                      help='number of tracked files (default: 1000)')
+    parser.add_option('--commits', type='int', default=100,
+                      help='number of commits (default: 100)')
+    parser.add_option('--modified', type='int', default=50,
+                      help='number of modified files (default: 50)')
+    parser.add_option('--untracked', type='int', default=50,
+                      help='number of untracked files (default: 50)')
+    parser.add_option('--runs', type='int', default=5,
+                      help='number of startups to measure (default: 5)')
+    parser.add_option('--repo', metavar='PATH', default=None,
+                      help='measure an existing repository instead')
+    parser.add_option('--keep', action='store_true', default=False,
+                      help='keep the generated repository')
+    return parser.parse_args()
+
+
+def git(repo, *args):
+    subprocess.check_call(('git',) + args, cwd=repo)
+
+
+def write(path, text):
+    parent = os.path.dirname(path)
+    if not os.path.isdir(parent):
+        os.makedirs(parent)
+    fh = open(path, 'w')
+    try:
+        fh.write(text)
+    finally:
+        fh.close()
+
+
+def generate(repo, opts):
+    """Create a repository with the requested shape"""
+    files = ['dir%d/sub%d/file%d.txt' % (idx % 50, idx % 7, idx)
+             for idx in range(max(opts.files, 1))]
+    git(repo, 'init', '-q')
+    for path in files:
+        write(os.path.join(repo, path), '%s\n' % path)
+    git(repo, 'add', '.')
+    git(repo, 'commit', '-q', '-m', 'Initial commit')
+    for idx in range(1, opts.commits):
+        path = files[idx % len(files)]
+        write(os.path.join(repo, path), 'change %d\n' % idx)
+        git(repo, 'commit', '-q', '-m', 'Change %d' % idx, path)
+    for idx in range(opts.modified):
+        path = files[-(idx % len(files)) - 1]
+        write(os.path.join(repo, path), 'modified %d\n' % idx)
+    for idx in range(opts.untracked):
+        write(os.path.join(repo, 'untracked', 'file%d.txt' % idx), 'new\n')
+
+
+def environment(home):
+    env = dict(os.environ)
+    env['HOME'] = home
+    env['QT_QPA_PLATFORM'] = 'offscreen'
+    env.setdefault('GIT_AUTHOR_NAME', 'Benchmark')
+    env.setdefault('GIT_AUTHOR_EMAIL', 'benchmark@example.com')
+    env.setdefault('GIT_COMMITTER_NAME', 'Benchmark')
+    env.setdefault('GIT_COMMITTER_EMAIL', 'benchmark@example.com')
+    return env
+
+
+def launcher():
+    """Return the command prefix that provides a display"""
+    if os.environ.get('DISPLAY') or sys.platform in ('darwin', 'win32'):
+        return []
+    for path in os.environ.get('PATH', '').split(os.pathsep):
+        if os.path.exists(os.path.join(path, 'xvfb-run')):
+            return ['xvfb-run', '-a']
+    return []
+
+
+def run(repo, env, tmpdir, idx):
+    """Start git-cola once and return its milestones"""
+    timings = os.path.join(tmpdir, 'timings%d.json' % idx)
+    cmd = launcher() + [sys.executable, GIT_COLA,
+                        '--repo', repo, '--startup-timings', timings]
+    start = time.time()
+    proc = subprocess.Popen(cmd, env=env)
+    while proc.poll() is None:
+        if time.time() - start > TIMEOUT:
+            proc.kill()
+            proc.wait()
+            break
+        time.sleep(0.01)
+    wall = time.time() - start
+    result = {'run': idx, 'status': proc.returncode, 'wall': wall,
+              'milestones': {}}
+    if os.path.exists(timings):
+        fh = open(timings)
+        try:
+            values = json.load(fh)
+        finally:
+            fh.close()
+        for entry in values['milestones']:
+            result['milestones'][entry['name']] = entry['seconds']
+    return result
+
+
+def median(values):
+    values = sorted(values)
+    if not values:
+        return None
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2.0
+
+
+def summarize(results, opts):
+    names = []
+    for result in results:
+        for name in sorted(result['milestones'],
+                           key=result['milestones'].get):
+            if name not in names:
+                names.append(name)
+    milestones = {}
+    for name in names:
+        milestones[name] = median([r['milestones'][name] for r in results
+                                   if name in r['milestones']])
+    if opts.repo:
+        shape = {'repo': opts.repo}
+    else:
+        shape = {
+            'files': opts.files,
+            'commits': opts.commits,
+            'modified': opts.modified,
+            'untracked': opts.untracked,
+        }
+    summary = {
+        'summary': True,
+        'runs': len(results),
+        'failures': len([r for r in results if r['status'] != 0]),
+        'wall': median([r['wall'] for r in results]),
+        'milestones': milestones,
+    }
+    summary.update(shape)
+    return summary
+
+
+def main():
+    opts, args = parse_args()
+    tmpdir = tempfile.mkdtemp(prefix='cola-bench-')
+    try:
+        home = os.path.join(tmpdir, 'home')
+        os.makedirs(home)
+        env = environment(home)
+        os.environ.update(env)
+        if opts.repo:
+            repo = os.path.abspath(opts.repo)
+        else:
+            repo = os.path.join(tmpdir, 'repo')
+            os.makedirs(repo)
+            generate(repo, opts)
+        results = []
+        for idx in range(opts.runs):
+            result = run(repo, env, tmpdir, idx)
+            results.append(result)
+            print (json.dumps(result, sort_keys=True))
+            sys.stdout.flush()
+        print (json.dumps(summarize(results, opts), sort_keys=True))
+    finally:
+        if opts.keep:
+            sys.stderr.write('kept %s\n' % tmpdir)
+        else:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
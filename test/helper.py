@@ -8,6 +8,7 @@ from cola import core
 from cola import git
 from cola import gitcfg
 from cola import gitcmds
+from cola.models import snapshot
 
 
 def tmp_path(*paths):
@@ -30,6 +31,11 @@ def pipe(cmd):
     return out
 
 
+def subjects(shas):
+    """Returns the sorted subjects of the given commits"""
+    return sorted([pipe('git log -1 --pretty=%%s %s' % sha) for sha in shas])
+
+
 class TmpPathTestCase(unittest.TestCase):
     def setUp(self):
         self._testdir = tempfile.mkdtemp('_cola_test')
@@ -59,6 +65,7 @@ class GitRepositoryTestCase(TmpPathTestCase):
         git.instance().set_worktree(os.getcwd())
         gitcfg.instance().reset()
         gitcmds.clear_cache()
+        snapshot.instance().invalidate()
 
     def initialize_repo(self):
         self.shell("""
@@ -2,10 +2,13 @@
 """Tests various operations using the cola.git module
 """
 
+import os
 import time
 import signal
+import tempfile
 import unittest
 
+import helper
 from cola import git
 
 
@@ -146,5 +149,67 @@ class GitCommandTest(unittest.TestCase):
 
         signal.signal(signal.SIGALRM, prev_handler)
 
+
+class DiscoveryTest(helper.GitRepositoryTestCase):
+    """Tests repository discovery"""
+
+    def setUp(self):
+        helper.GitRepositoryTestCase.setUp(self)
+        self.worktree = os.path.realpath(os.getcwd())
+
+    def test_subdirectory(self):
+        """Test discovering the repository from a subdirectory"""
+        self.shell('mkdir -p sub/dir')
+        obj = git.Git()
+        obj.set_worktree(os.path.join(self.worktree, 'sub', 'dir'))
+        self.assertTrue(obj.is_valid())
+        self.assertEqual(obj.worktree(), self.worktree)
+        self.assertEqual(obj.git_dir(), os.path.join(self.worktree, '.git'))
+        self.assertEqual(obj.git_path('HEAD'),
+                         os.path.join(self.worktree, '.git', 'HEAD'))
+
+    def test_not_a_repository(self):
+        """Test that paths outside of a repository are invalid"""
+        path = tempfile.mkdtemp('_cola_test')
+        try:
+            obj = git.Git()
+            obj.set_worktree(path)
+            self.assertFalse(obj.is_valid())
+            self.assertEqual(obj.git_path('config'),
+                             os.path.join(path, 'config'))
+        finally:
+            os.rmdir(path)
+
+    def test_linked_worktree(self):
+        """Test that shared paths resolve to the common directory"""
+        path = os.path.join(self.worktree, 'linked')
+        self.shell('git worktree add -q linked 2>/dev/null || '
+                   'git clone -q --shared . linked')
+        obj = git.Git()
+        obj.set_worktree(path)
+        self.assertTrue(obj.is_valid())
+        self.assertEqual(obj.worktree(), path)
+        if not os.path.isfile(os.path.join(path, '.git')):
+            # git is too old to have linked worktrees
+            return
+        common_dir = os.path.join(self.worktree, '.git')
+        self.assertEqual(obj.git_path('config'),
+                         os.path.join(common_dir, 'config'))
+        self.assertEqual(obj.git_path('refs', 'heads'),
+                         os.path.join(common_dir, 'refs', 'heads'))
+        self.assertEqual(obj.git_path('HEAD'),
+                         os.path.join(common_dir, 'worktrees', 'linked',
+                                      'HEAD'))
+        self.assertEqual(obj.git_path('cola', 'lastmodified.json'),
+                         os.path.join(common_dir, 'worktrees', 'linked',
+                                      'cola', 'lastmodified.json'))
+
+    def test_memoized(self):
+        """Test that discovery is resolved once per path"""
+        first = git.discover(self.worktree)
+        self.shell('rm -rf .git')
+        self.assertEqual(git.discover(self.worktree), first)
+
+
 if __name__ == '__main__':
     unittest.main()
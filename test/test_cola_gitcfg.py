@@ -1,3 +1,4 @@
+import os
 import unittest
 
 import helper
@@ -52,6 +53,30 @@ class GitConfigTestCase(helper.GitRepositoryTestCase):
         self.assertEqual(self.config.get('does.not.exist'), None)
         self.assertEqual(self.config.get('does.not.exist', default=42), 42)
 
+    def test_file_encoding_disabled(self):
+        """Test that file_encoding() is a no-op by default."""
+        self.shell('echo "*.txt encoding=iso-8859-15" > .gitattributes')
+        self.assertEqual(self.config.file_encoding('a.txt'), None)
+
+    def test_update_file_encodings(self):
+        """Test resolving encodings for many paths at once."""
+        self.shell('git config cola.fileattributes true')
+        self.shell('echo "*.txt encoding=iso-8859-15" > .gitattributes')
+        self.config.update_file_encodings(['a.txt', 'b.c', 'sub dir/c.txt'])
+        self.assertEqual(self.config.file_encoding('a.txt'), 'iso-8859-15')
+        self.assertEqual(self.config.file_encoding('b.c'), None)
+        self.assertEqual(self.config.file_encoding('sub dir/c.txt'),
+                         'iso-8859-15')
+
+    def test_file_encoding_invalidated(self):
+        """Test that changes to .gitattributes invalidate the cache."""
+        self.shell('git config cola.fileattributes true')
+        self.shell('echo "*.txt encoding=iso-8859-15" > .gitattributes')
+        self.assertEqual(self.config.file_encoding('a.txt'), 'iso-8859-15')
+        self.shell('echo "*.txt encoding=utf-16" > .gitattributes')
+        os.utime('.gitattributes', (1, 1))
+        self.assertEqual(self.config.file_encoding('a.txt'), 'utf-16')
+
 
 if __name__ == '__main__':
     unittest.main()
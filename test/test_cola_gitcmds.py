@@ -119,6 +119,133 @@ class GitCmdsTestCase(helper.GitRepositoryTestCase):
         self.assertEqual(remote, ['origin/a', 'origin/b', 'origin/c', 'origin/master'])
         self.assertEqual(tags, ['d', 'e', 'f'])
 
+    def test_untracked_directories_collapsed(self):
+        """Test that untracked directories are listed as single entries."""
+        self.shell("""
+            mkdir -p new/sub &&
+            touch new/file new/sub/other top &&
+            git config status.showUntrackedFiles normal
+        """)
+        gitcfg.instance().reset()
+        self.assertEqual(gitcmds.worktree_untracked(), ['new/', 'top'])
+        self.assertEqual(gitcmds.worktree_untracked(expanded=['new/']),
+                         ['new/file', 'new/sub/', 'top'])
+        self.assertEqual(gitcmds.worktree_untracked(
+                            expanded=['new/', 'new/sub/']),
+                         ['new/file', 'new/sub/other', 'top'])
+
+    def test_untracked_directories_glob_names(self):
+        """Test that names with wildcards only match themselves."""
+        self.shell("""
+            mkdir -p 'new/x[1]' new/x1 &&
+            touch 'new/a*' new/ab 'new/x[1]/file' new/x1/file &&
+            git config status.showUntrackedFiles normal
+        """)
+        gitcfg.instance().reset()
+        self.assertEqual(gitcmds.worktree_untracked(expanded=['new/']),
+                         ['new/a*', 'new/ab', 'new/x1/', 'new/x[1]/'])
+        self.assertEqual(gitcmds.worktree_untracked(
+                            expanded=['new/', 'new/x[1]/']),
+                         ['new/a*', 'new/ab', 'new/x1/', 'new/x[1]/file'])
+
+    def test_untracked_directories_ignored(self):
+        """Test that expanded directories honor ignore rules."""
+        self.shell("""
+            mkdir -p new &&
+            touch new/file new/ignored &&
+            echo ignored > .gitignore &&
+            git config status.showUntrackedFiles normal
+        """)
+        gitcfg.instance().reset()
+        self.assertEqual(gitcmds.worktree_untracked(expanded=['new/']),
+                         ['.gitignore', 'new/file'])
+
+    def test_untracked_mode_all(self):
+        """Test that all untracked files are listed by default."""
+        self.shell("""
+            mkdir -p new/sub &&
+            touch new/sub/other
+        """)
+        self.assertEqual(gitcmds.worktree_untracked(), ['new/sub/other'])
+
+    def test_untracked_mode_no(self):
+        """Test status.showUntrackedFiles=no."""
+        self.shell("""
+            touch new &&
+            git config status.showUntrackedFiles no
+        """)
+        gitcfg.instance().reset()
+        self.assertEqual(gitcmds.worktree_untracked(), [])
+
+    def test_worktree_state_paths_glob_names(self):
+        """Test that narrowed status only matches the given paths."""
+        self.shell("""
+            touch a 'a*' '[a]' &&
+            git add a 'a*' '[a]' &&
+            git commit -q -m 'add glob names' &&
+            echo change > a &&
+            echo change > 'a*' &&
+            echo change > '[a]' &&
+            touch b 'b*'
+        """)
+        state = gitcmds.worktree_state_paths(['[a]', 'a*', 'b*'])
+        self.assertEqual(state['modified'], ['[a]', 'a*'])
+        self.assertEqual(state['untracked'], ['b*'])
+
+    def _staged(self):
+        return helper.pipe('git diff-index --cached --name-status HEAD')
+
+    def test_add_paths(self):
+        """Test staging new, modified and removed paths in one call."""
+        self.shell("""
+            echo change > A &&
+            rm B &&
+            mkdir -p new/dir &&
+            touch new/dir/C D
+        """)
+        status, out = gitcmds.add_paths(['A', 'B', 'D', 'new/'])
+        self.assertEqual(status, 0)
+        self.assertEqual(self._staged().split(),
+                         ['M', 'A', 'D', 'B', 'A', 'D', 'A', 'new/dir/C'])
+
+    def test_add_paths_directory(self):
+        """Test staging a directory named without a trailing slash."""
+        self.shell("""
+            mkdir -p new/dir &&
+            touch new/dir/C
+        """)
+        status, out = gitcmds.add_paths(['new'])
+        self.assertEqual(status, 0)
+        self.assertEqual(self._staged().split(), ['A', 'new/dir/C'])
+
+    def test_reset_paths(self):
+        """Test unstaging paths in one call."""
+        self.shell("""
+            echo change > A &&
+            echo change > B &&
+            touch C &&
+            git add A B C
+        """)
+        status, out = gitcmds.reset_paths(['A', 'C'])
+        self.assertEqual(status, 0)
+        self.assertEqual(self._staged().split(), ['M', 'B'])
+
+    def test_reset_paths_sliced(self):
+        """Test unstaging paths when git cannot read pathspecs from stdin."""
+        self.shell("""
+            echo change > A &&
+            echo change > B &&
+            git add A B
+        """)
+        have_pathspec_from_file = gitcmds.have_pathspec_from_file
+        gitcmds.have_pathspec_from_file = lambda: False
+        try:
+            status, out = gitcmds.reset_paths(['A', 'B'])
+        finally:
+            gitcmds.have_pathspec_from_file = have_pathspec_from_file
+        self.assertEqual(status, 0)
+        self.assertEqual(self._staged(), '')
+
 
 if __name__ == '__main__':
     unittest.main()
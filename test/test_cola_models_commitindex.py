@@ -0,0 +1,110 @@
+"""Tests the cola.models.commitindex module."""
+import os
+import unittest
+
+import helper
+from cola.models import commitindex
+
+
+class CommitIndexTestCase(helper.GitRepositoryTestCase):
+    """Tests the persistent commit message and identity index."""
+
+    def setUp(self):
+        helper.GitRepositoryTestCase.setUp(self)
+        self.shell("""
+            echo change > A &&
+            git commit -m 'Fix the frobnicator' A > /dev/null &&
+            echo change > B &&
+            GIT_AUTHOR_NAME='Jane Doe' GIT_AUTHOR_EMAIL=jane@example.com \\
+                git commit -m 'Add widgets' B > /dev/null
+        """)
+        self.index = commitindex.CommitIndex()
+
+    def candidates(self, field, query):
+        self.index.sync()
+        return self.index.candidates(field, query)
+
+    def test_message(self):
+        """Test that messages are matched by word and prefix."""
+        result = self.candidates(commitindex.MESSAGE, 'frob')
+        self.assertEqual(helper.subjects(result), ['Fix the frobnicator'])
+        result = self.candidates(commitindex.MESSAGE, 'FIX the')
+        self.assertEqual(helper.subjects(result), ['Fix the frobnicator'])
+        result = self.candidates(commitindex.MESSAGE, 'fix widgets')
+        self.assertEqual(result, [])
+
+    def test_author(self):
+        """Test that authors are matched by name and email."""
+        result = self.candidates(commitindex.AUTHOR, 'jane')
+        self.assertEqual(helper.subjects(result), ['Add widgets'])
+        result = self.candidates(commitindex.AUTHOR, 'example.com')
+        self.assertEqual(helper.subjects(result), ['Add widgets'])
+        result = self.candidates(commitindex.COMMITTER, 'jane')
+        self.assertEqual(result, [])
+
+    def test_mailmap(self):
+        """Test that identities match with and without the mailmap."""
+        self.shell("""
+            echo 'Jane Smith <jane@example.com>' > .mailmap &&
+            git add .mailmap &&
+            git commit -m 'Add mailmap' > /dev/null
+        """)
+        result = self.candidates(commitindex.AUTHOR, 'jane doe')
+        self.assertEqual(helper.subjects(result), ['Add widgets'])
+        result = self.candidates(commitindex.AUTHOR, 'jane smith')
+        self.assertEqual(helper.subjects(result), ['Add widgets'])
+
+    def test_out_of_date(self):
+        """Test that an index that needs syncing is not used."""
+        self.assertEqual(self.index.candidates(commitindex.MESSAGE, 'fix'),
+                         None)
+        self.index.sync()
+        self.shell("""
+            echo again > A &&
+            git commit -m 'Fix it again' A > /dev/null
+        """)
+        self.assertEqual(self.index.candidates(commitindex.MESSAGE, 'fix'),
+                         None)
+        self.index.sync()
+        result = self.index.candidates(commitindex.MESSAGE, 'fix')
+        self.assertEqual(helper.subjects(result),
+                         ['Fix it again', 'Fix the frobnicator'])
+
+    def test_regex(self):
+        """Test that regular expressions are not answered by the index."""
+        self.assertEqual(self.candidates(commitindex.MESSAGE, 'fix|add'),
+                         None)
+        self.assertEqual(commitindex.query_words('a.*b'), None)
+        self.assertEqual(commitindex.query_words('--'), None)
+        self.assertEqual(commitindex.query_words('Fix it'), ['fix', 'it'])
+
+    def test_incremental(self):
+        """Test that new commits are added to a saved index."""
+        self.candidates(commitindex.MESSAGE, 'fix')
+        self.assertTrue(os.path.exists(self.index.path()))
+        count = len(self.index.commits)
+        self.shell("""
+            echo again > A &&
+            git commit -m 'Fix it again' A > /dev/null
+        """)
+        self.index = commitindex.CommitIndex()
+        result = self.candidates(commitindex.MESSAGE, 'fix')
+        self.assertEqual(len(self.index.commits), count + 1)
+        self.assertEqual(helper.subjects(result),
+                         ['Fix it again', 'Fix the frobnicator'])
+
+    def test_rewritten(self):
+        """Test that the index is rebuilt when history is rewritten."""
+        self.candidates(commitindex.MESSAGE, 'widgets')
+        self.shell("""
+            git commit --amend -m 'Add gadgets' > /dev/null
+        """)
+        result = self.candidates(commitindex.MESSAGE, 'widgets')
+        self.assertEqual(result, [])
+        result = self.candidates(commitindex.MESSAGE, 'gadgets')
+        self.assertEqual(helper.subjects(result), ['Add gadgets'])
+        self.assertEqual(len(self.index.commits), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+"""Tests the cola.models.completion module."""
+
+import unittest
+
+from cola.models import completion
+from cola.models.completion import Cancelled
+from cola.models.completion import CompletionIndex
+from cola.models.completion import PathCompletionIndex
+from cola.models.completion import fuzzy_score
+
+
+class CompletionIndexTestCase(unittest.TestCase):
+    """Tests prefix and substring lookups."""
+
+    def setUp(self):
+        self.index = CompletionIndex(['master', 'origin/master',
+                                      'Maint', 'topic/remaster', 'next'])
+
+    def _candidates(self, text, case_sensitive=False):
+        items = self.index.items
+        return [items[i] for i in self.index.candidates(text, case_sensitive)]
+
+    def test_prefix(self):
+        """Test case-insensitive and case-sensitive prefix lookups."""
+        items = self.index.items
+        matches = [items[i] for i in self.index.prefix('ma')]
+        self.assertEqual(matches, ['Maint', 'master'])
+        matches = [items[i] for i in self.index.prefix('Ma', True)]
+        self.assertEqual(matches, ['Maint'])
+
+    def test_candidates(self):
+        """Test substring lookups."""
+        self.assertEqual(self._candidates('master'),
+                         ['master', 'origin/master', 'topic/remaster'])
+
+    def test_candidates_short_query(self):
+        """Test queries shorter than a trigram."""
+        self.assertEqual(self._candidates('ex'), ['next'])
+
+    def test_candidates_case_sensitive(self):
+        """Test case-sensitive substring matches."""
+        self.assertEqual(self._candidates('Mai', True), ['Maint'])
+        self.assertEqual(self._candidates('mai', True), [])
+
+    def test_candidates_no_match(self):
+        """Test a query with no matches."""
+        self.assertEqual(self._candidates('xyzzy'), [])
+
+
+class PathCompletionIndexTestCase(unittest.TestCase):
+    """Tests path completion with synthesized directories."""
+
+    def test_dirs(self):
+        """Test that parent directories are indexed."""
+        index = PathCompletionIndex(['cola/widgets/grep.py', 'README'])
+        self.assertEqual(index.dirs, frozenset(['cola', 'cola/widgets']))
+        self.assertEqual(index.fuzzy_search('wid'),
+                         ['cola/widgets', 'cola/widgets/grep.py'])
+
+
+class FuzzyMatchTestCase(unittest.TestCase):
+    """Tests fuzzy subsequence matching."""
+
+    def setUp(self):
+        self.index = PathCompletionIndex(['cola/widgets/grep.py',
+                                          'cola/gitcmds.py',
+                                          'cola/widgets/GrepThing.py'])
+
+    def test_fuzzy_score_no_match(self):
+        """Test that non-subsequences are rejected."""
+        self.assertEqual(fuzzy_score('xyz', 'cola/git.py', 'cola/git.py'),
+                         None)
+
+    def test_fuzzy_score_bonuses(self):
+        """Test that segment starts and consecutive matches score higher."""
+        scattered = fuzzy_score('gp', 'cola/xgxxp', 'cola/xgxxp')
+        segment = fuzzy_score('gp', 'cola/grep.py', 'cola/grep.py')
+        self.assertTrue(segment > scattered)
+
+    def test_fuzzy_search_segments(self):
+        """Test matching across path segments."""
+        self.assertEqual(self.index.fuzzy_search('wgrep'),
+                         ['cola/widgets/grep.py', 'cola/widgets/GrepThing.py'])
+
+    def test_fuzzy_search_camel_case(self):
+        """Test camelCase humps."""
+        self.assertEqual(self.index.fuzzy_search('GT', case_sensitive=True),
+                         ['cola/widgets/GrepThing.py'])
+
+    def test_fuzzy_search_limit(self):
+        """Test that at most limit results are returned."""
+        self.assertEqual(len(self.index.fuzzy_search('c', limit=2)), 2)
+
+
+class FuzzyScanBoundTestCase(unittest.TestCase):
+    """Tests that large indexes are not scanned in full."""
+
+    def setUp(self):
+        self.scan_size = completion.FUZZY_SCAN_SIZE
+        self.scan = completion.scan
+        completion.FUZZY_SCAN_SIZE = 10
+        self.index = PathCompletionIndex(['file%02d.py' % i
+                                          for i in range(50)] +
+                                         ['zebra.txt'])
+
+    def tearDown(self):
+        completion.FUZZY_SCAN_SIZE = self.scan_size
+        completion.scan = self.scan
+
+    def test_late_items_are_found(self):
+        """Test that matches anywhere in the index are found."""
+        results = self.index.fuzzy_search('f4p', limit=1000)
+        expect = ['file04.py', 'file14.py', 'file24.py', 'file34.py']
+        expect.extend(['file4%d.py' % i for i in range(10)])
+        self.assertEqual(sorted(results), expect)
+        self.assertEqual(self.index.fuzzy_search('zbt'), ['zebra.txt'])
+
+    def test_scan_is_bounded(self):
+        """Test that only items containing every character are scanned."""
+        scanned = []
+
+        def scan(haystack, predicate, indexes=None, cancelled=None):
+            scanned.append(indexes)
+            return self.scan(haystack, predicate, indexes=indexes,
+                             cancelled=cancelled)
+        completion.scan = scan
+        self.index.fuzzy_search('f4p', limit=1000)
+        self.assertEqual(len(scanned[-1]), 14)
+
+
+class CancellationTestCase(unittest.TestCase):
+    """Tests abandoning superseded queries."""
+
+    def setUp(self):
+        self.index = PathCompletionIndex(['dir%d/file%d.py' % (i, i)
+                                          for i in range(10000)])
+
+    def test_cancelled(self):
+        """Test that a cancelled scan raises Cancelled."""
+        self.assertRaises(Cancelled, self.index.fuzzy_search, 'fpy',
+                          cancelled=lambda: True)
+
+    def test_cancelled_at_checkpoint(self):
+        """Test that cancellation is noticed part-way through a scan."""
+        polls = []
+        def cancelled():
+            polls.append(True)
+            return len(polls) > 1
+        self.assertRaises(Cancelled, self.index.fuzzy_search, 'd9f',
+                          cancelled=cancelled)
+        self.assertEqual(len(polls), 2)
+
+    def test_not_cancelled(self):
+        """Test that results are unaffected when not cancelled."""
+        self.assertEqual(self.index.fuzzy_search('file42.', limit=1,
+                                                 cancelled=lambda: False),
+                         ['dir42/file42.py'])
+
+
+if __name__ == '__main__':
+    unittest.main()
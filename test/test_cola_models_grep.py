@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""Tests the cola.models.grep module."""
+
+import unittest
+
+import helper
+from cola.models.grep import GrepSearch
+from cola.models.grep import parse_count
+
+
+class GrepSearchTestCase(helper.GitRepositoryTestCase):
+    """Tests streaming `git grep` results."""
+
+    def setUp(self):
+        helper.GitRepositoryTestCase.setUp(self, commit=False)
+        self.shell("""
+            for i in 1 2 3 4 5; do echo needle $i; done > haystack &&
+            git add haystack
+        """)
+
+    def read_all(self, search, limit):
+        lines = []
+        for batch in search.read(limit, batch_size=2):
+            lines.extend(batch)
+        return lines
+
+    def test_read(self):
+        """Test that every match is read."""
+        search = GrepSearch(['needle'])
+        lines = self.read_all(search, 100)
+        self.assertEqual(lines, ['haystack:%d:needle %d' % (i, i)
+                                 for i in range(1, 6)])
+        self.assertTrue(search.exhausted())
+        self.assertEqual(search.status, 0)
+
+    def test_limit(self):
+        """Test that reading pauses at the limit and can resume."""
+        search = GrepSearch(['needle'])
+        self.assertEqual(len(self.read_all(search, 3)), 3)
+        self.assertFalse(search.exhausted())
+        lines = self.read_all(search, 100)
+        self.assertEqual(lines, ['haystack:4:needle 4', 'haystack:5:needle 5'])
+        self.assertTrue(search.exhausted())
+
+    def test_cancel(self):
+        """Test that a cancelled search stops reading."""
+        search = GrepSearch(['needle'])
+        self.read_all(search, 1)
+        search.cancel()
+        self.assertEqual(self.read_all(search, 100), [])
+        # The killed process has been reaped
+        self.assertTrue(search.exhausted())
+        self.assertNotEqual(search._proc.returncode, None)
+
+    def test_no_match(self):
+        """Test a query without matches."""
+        search = GrepSearch(['xyzzy'])
+        self.assertEqual(self.read_all(search, 100), [])
+        self.assertEqual(search.status, 1)
+
+    def test_counts(self):
+        """Test per-file match counts."""
+        self.shell("""
+            echo needle > other &&
+            git add other
+        """)
+        search = GrepSearch(['needle'], counts=True)
+        lines = self.read_all(search, 100)
+        self.assertEqual([parse_count(line) for line in lines],
+                         [('haystack', 5), ('other', 1)])
+
+    def test_paths(self):
+        """Test limiting a search to paths."""
+        self.shell("""
+            echo needle > other &&
+            git add other
+        """)
+        search = GrepSearch(['needle'], paths=['other'])
+        self.assertEqual(self.read_all(search, 100), ['other:1:needle'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+"""Tests the cola.models.lastmodified module."""
+import os
+import unittest
+
+import helper
+from cola.models import lastmodified
+
+
+class LastCommitsTestCase(helper.GitRepositoryTestCase):
+    """Tests resolving the last commit for many paths at once."""
+
+    def setUp(self):
+        helper.GitRepositoryTestCase.setUp(self)
+        self.shell("""
+            mkdir -p dir/sub &&
+            echo a > dir/a &&
+            echo b > dir/sub/b &&
+            git add dir &&
+            git commit -m 'add dir' > /dev/null &&
+            echo change > A &&
+            git commit -m 'change A' A > /dev/null
+        """)
+
+    def test_files(self):
+        """Test that files resolve to the commit that last touched them."""
+        commits = lastmodified.last_commits(['A', 'B', 'dir/a'])
+        self.assertEqual(commits['A'].subject, 'change A')
+        self.assertEqual(commits['B'].subject, 'Initial commit')
+        self.assertEqual(commits['dir/a'].subject, 'add dir')
+
+    def test_directories(self):
+        """Test that directories resolve to their newest commit."""
+        self.shell("""
+            echo change > dir/sub/b &&
+            git commit -m 'change b' dir/sub/b > /dev/null
+        """)
+        commits = lastmodified.last_commits(['dir', 'dir/sub', 'dir/a'])
+        self.assertEqual(commits['dir'].subject, 'change b')
+        self.assertEqual(commits['dir/sub'].subject, 'change b')
+        self.assertEqual(commits['dir/a'].subject, 'add dir')
+
+    def test_untracked(self):
+        """Test that paths without history are omitted."""
+        self.shell('touch untracked')
+        commits = lastmodified.last_commits(['untracked', 'A'])
+        self.assertEqual(sorted(commits.keys()), ['A'])
+
+    def test_pathspecs(self):
+        """Test the pathspecs used to limit the history walk."""
+        self.assertEqual(lastmodified.pathspecs(['dir/a', 'dir/sub']),
+                         ['dir'])
+        self.assertEqual(lastmodified.pathspecs(['dir/a', 'A']), [])
+
+
+class LastModifiedIndexTestCase(helper.GitRepositoryTestCase):
+    """Tests the persistent last-modified index."""
+
+    def setUp(self):
+        helper.GitRepositoryTestCase.setUp(self)
+        self.index = lastmodified.LastModifiedIndex()
+
+    def tearDown(self):
+        self.index.flush()
+        helper.GitRepositoryTestCase.tearDown(self)
+
+    def test_lookup_persists(self):
+        """Test that lookups are saved and reloaded from disk."""
+        self.shell('touch untracked')
+        commits = self.index.lookup(['A', 'untracked'])
+        self.assertEqual(commits['A'].subject, 'Initial commit')
+        self.index.flush()
+        self.assertTrue(os.path.exists(self.index.path()))
+
+        index = lastmodified.LastModifiedIndex()
+        index._file = index.path()
+        index.load()
+        self.assertEqual(index.head, self.index.head)
+        self.assertEqual(index.entries['A'], commits['A'])
+        self.assertTrue('untracked' in index.missing)
+
+    def test_untracked_paths_are_skipped(self):
+        """Test that known untracked paths do not start a walk."""
+        self.shell('touch untracked')
+        walks = []
+        last_commits = lastmodified.last_commits
+
+        def record(paths, ref='HEAD'):
+            walks.append(sorted(paths))
+            return last_commits(paths, ref=ref)
+        lastmodified.last_commits = record
+        try:
+            commits = self.index.lookup(['A', 'untracked'],
+                                        untracked=['untracked'])
+            self.index.lookup(['untracked'], untracked=['untracked'])
+        finally:
+            lastmodified.last_commits = last_commits
+        self.assertEqual(sorted(commits.keys()), ['A'])
+        self.assertEqual(walks, [['A']])
+
+    def test_saves_are_batched(self):
+        """Test that lookups do not write the index immediately."""
+        self.index.lookup(['A'])
+        self.index.lookup(['B'])
+        self.assertFalse(os.path.exists(self.index.path()))
+        self.index.flush()
+        self.assertTrue(os.path.exists(self.index.path()))
+
+    def test_incremental_update(self):
+        """Test that new commits update the index."""
+        self.shell('touch untracked')
+        self.index.lookup(['A', 'B', 'untracked'])
+        self.shell("""
+            echo change > A &&
+            git add A untracked &&
+            git commit -m 'change A' > /dev/null
+        """)
+        commits = self.index.lookup(['A', 'B', 'untracked'])
+        self.assertEqual(commits['A'].subject, 'change A')
+        self.assertEqual(commits['B'].subject, 'Initial commit')
+        self.assertEqual(commits['untracked'].subject, 'change A')
+
+    def test_rewritten_history(self):
+        """Test that the index is discarded when HEAD is rewritten."""
+        self.index.lookup(['A'])
+        self.shell("""
+            echo change > A &&
+            git commit --amend -m 'amended' A > /dev/null
+        """)
+        commits = self.index.lookup(['A'])
+        self.assertEqual(commits['A'].subject, 'amended')
+
+
+class RelativeDateTestCase(unittest.TestCase):
+    """Tests relative date formatting."""
+
+    def test_relative_date(self):
+        """Test that dates are formatted like git's relative dates."""
+        day = 24 * 60 * 60
+        now = 1000 * day
+        self.assertEqual(lastmodified.relative_date(now - 1, now),
+                         '1 second ago')
+        self.assertEqual(lastmodified.relative_date(now - 600, now),
+                         '10 minutes ago')
+        self.assertEqual(lastmodified.relative_date(now - 3 * day, now),
+                         '3 days ago')
+        self.assertEqual(lastmodified.relative_date(now - 21 * day, now),
+                         '3 weeks ago')
+        self.assertEqual(lastmodified.relative_date(now - 400 * day, now),
+                         '1 year, 1 month ago')
+        self.assertEqual(lastmodified.relative_date(now + 10, now),
+                         'in the future')
+
+
+if __name__ == '__main__':
+    unittest.main()
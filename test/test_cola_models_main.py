@@ -71,6 +71,82 @@ class MainModelTestCase(helper.GitRepositoryTestCase):
         self.model.update_status()
         self.assertEqual(self.model.tags, ['test'])
 
+    def _assert_full_status(self):
+        """Check the status lists against a full refresh"""
+        model = MainModel(cwd=os.getcwd())
+        model.update_status()
+        self.assertEqual(self.model.staged, model.staged)
+        self.assertEqual(self.model.modified, model.modified)
+        self.assertEqual(self.model.unmerged, model.unmerged)
+        self.assertEqual(self.model.untracked, model.untracked)
+
+    def test_stage_paths_delta(self):
+        """Test that staging paths moves them between the status lists."""
+        self.shell("""
+            echo change > A &&
+            echo change > B &&
+            mkdir -p dir &&
+            echo C > dir/C &&
+            echo D > D
+        """)
+        self.model.update_status()
+        changes = []
+
+        def paths_changed(paths):
+            changes.append(paths)
+        self.model.add_observer(self.model.message_paths_changed,
+                                paths_changed)
+
+        self.model.stage_paths(['A', 'dir'])
+        self.assertEqual(self.model.staged, ['A', 'dir/C'])
+        self.assertEqual(self.model.modified, ['B'])
+        self.assertEqual(self.model.untracked, ['D'])
+        self.assertEqual(changes, [['A', 'dir/C']])
+        self._assert_full_status()
+
+    def test_unstage_paths_delta(self):
+        """Test that unstaging paths moves them between the status lists."""
+        self.shell("""
+            echo change > A &&
+            echo C > C &&
+            git add A C
+        """)
+        self.model.update_status()
+        self.model.unstage_paths(['A', 'C'])
+        self.assertEqual(self.model.staged, [])
+        self.assertEqual(self.model.modified, ['A'])
+        self.assertEqual(self.model.untracked, ['C'])
+        self._assert_full_status()
+
+    def test_unstage_all_delta(self):
+        """Test that unstaging everything updates the status lists."""
+        self.shell("""
+            echo change > A &&
+            rm B &&
+            git add -A
+        """)
+        self.model.update_status()
+        self.model.unstage_all()
+        self.assertEqual(self.model.staged, [])
+        self.assertEqual(self.model.modified, ['A', 'B'])
+        self._assert_full_status()
+
+
+class UnbornBranchTestCase(helper.GitRepositoryTestCase):
+    """Tests the MainModel class before the first commit."""
+
+    def setUp(self):
+        helper.GitRepositoryTestCase.setUp(self, commit=False)
+        self.model = MainModel(cwd=os.getcwd())
+
+    def test_reset(self):
+        """Test that paths can be reset without a HEAD commit."""
+        self.model.update_status()
+        status, output = self.model.reset('A')
+        self.assertEqual(status, 0)
+        self.assertEqual(self.model.staged, ['B'])
+        self.assertEqual(self.model.untracked, ['A'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""Tests the cola.models.pathindex module."""
+
+import unittest
+
+import helper
+from cola.models import pathindex
+
+
+class BloomFilterTestCase(unittest.TestCase):
+    """Tests the changed-path Bloom filters."""
+
+    def test_contains(self):
+        """Test that paths and their directories are found."""
+        bloom = pathindex.BloomFilter.from_paths(['a/b/c', 'd'])
+        for path in ('a/b/c', 'a/b', 'a', 'd'):
+            self.assertTrue(bloom.contains(pathindex.path_hashes(path)))
+        self.assertFalse(bloom.contains(pathindex.path_hashes('a/b/x')))
+
+    def test_normalize(self):
+        """Test the pathspecs that the index can answer."""
+        self.assertEqual(pathindex.normalize('./a/b/'), 'a/b')
+        self.assertEqual(pathindex.normalize('.'), None)
+        self.assertEqual(pathindex.normalize('*.py'), None)
+        self.assertEqual(pathindex.normalize(':(glob)a'), None)
+
+
+class ChangedPathsIndexTestCase(helper.GitRepositoryTestCase):
+    """Tests the persistent changed-paths index."""
+
+    def setUp(self):
+        helper.GitRepositoryTestCase.setUp(self)
+        self.shell("""
+            mkdir -p dir &&
+            echo a > dir/a &&
+            git add dir &&
+            git commit -m 'add dir' > /dev/null &&
+            echo change > A &&
+            git commit -m 'change A' A > /dev/null
+        """)
+        self.index = pathindex.ChangedPathsIndex()
+
+    def candidates(self, paths):
+        self.index.sync()
+        return self.index.candidates(paths)
+
+    def test_candidates(self):
+        """Test that only commits touching the paths are candidates."""
+        self.assertEqual(helper.subjects(self.candidates(['A'])),
+                         ['Initial commit', 'change A'])
+        self.assertEqual(helper.subjects(self.candidates(['dir/'])),
+                         ['add dir'])
+        self.assertEqual(helper.subjects(self.candidates(['dir/a', 'B'])),
+                         ['Initial commit', 'add dir'])
+        self.assertEqual(self.candidates(['missing']), [])
+        self.assertEqual(self.candidates(['*.py']), None)
+
+    def test_out_of_date(self):
+        """Test that an index that needs syncing is not used."""
+        self.assertEqual(self.index.candidates(['A']), None)
+        self.index.sync()
+        self.shell("""
+            echo again > A &&
+            git commit -m 'change A again' A > /dev/null
+        """)
+        self.assertEqual(self.index.candidates(['A']), None)
+        self.index.sync()
+        self.assertEqual(helper.subjects(self.index.candidates(['A'])),
+                         ['Initial commit', 'change A', 'change A again'])
+
+    def test_renames(self):
+        """Test that renames are candidates for both paths."""
+        self.shell("""
+            git mv dir/a dir/renamed &&
+            git commit -m 'rename a' > /dev/null
+        """)
+        self.assertEqual(helper.subjects(self.candidates(['dir/a'])),
+                         ['add dir', 'rename a'])
+        self.assertEqual(helper.subjects(self.candidates(['dir/renamed'])),
+                         ['rename a'])
+
+    def test_merges(self):
+        """Test that merges are always candidates."""
+        self.shell("""
+            git checkout -b topic HEAD^ 2> /dev/null &&
+            echo b > B &&
+            git commit -m 'change B' B > /dev/null &&
+            git checkout master 2> /dev/null &&
+            git merge --no-ff -m 'merge topic' topic > /dev/null
+        """)
+        self.assertEqual(helper.subjects(self.candidates(['dir'])),
+                         ['add dir', 'merge topic'])
+
+    def test_incremental(self):
+        """Test that new commits are added to a saved index."""
+        self.index.sync()
+        count = len(self.index.commits)
+        self.shell("""
+            echo again > dir/a &&
+            git commit -m 'change dir/a' dir/a > /dev/null
+        """)
+        self.index = pathindex.ChangedPathsIndex()
+        self.assertEqual(helper.subjects(self.candidates(['dir'])),
+                         ['add dir', 'change dir/a'])
+        self.assertEqual(len(self.index.commits), count + 1)
+
+    def test_rewritten(self):
+        """Test that the index is rebuilt when history is rewritten."""
+        self.index.sync()
+        self.shell("""
+            echo amended > dir/a &&
+            git commit --amend -m 'amend' -a > /dev/null
+        """)
+        self.assertEqual(helper.subjects(self.candidates(['dir'])),
+                         ['add dir', 'amend'])
+        self.assertEqual(len(self.index.commits), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
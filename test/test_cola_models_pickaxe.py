@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""Tests the cola.models.pickaxe module."""
+
+import unittest
+
+import helper
+from cola import gitcmds
+from cola import utils
+from cola.models import pickaxe
+
+
+class PickaxeSearchTestCase(helper.GitRepositoryTestCase):
+    """Tests streaming and caching pickaxe searches."""
+
+    def setUp(self):
+        helper.GitRepositoryTestCase.setUp(self)
+        self.shell("""
+            echo needle > A &&
+            git commit -m 'add needle' A > /dev/null &&
+            echo needles > B &&
+            git commit -m 'add needles' B > /dev/null &&
+            echo other > A &&
+            git commit -m 'remove needle' A > /dev/null
+        """)
+        self.cache = pickaxe.PickaxeCache()
+
+    def search(self, query, mode=pickaxe.STRING, limit=100):
+        search = pickaxe.PickaxeSearch(query, mode=mode, cache=self.cache)
+        summaries = []
+        for batch in search.read(limit, batch_size=1):
+            summaries.extend([summary.split(' - ')[1]
+                              for sha1, summary in batch])
+        return search, summaries
+
+    def test_string(self):
+        """Test that -S finds changes in the number of occurrences."""
+        search, summaries = self.search('needle')
+        self.assertEqual(summaries,
+                         ['remove needle', 'add needles', 'add needle'])
+        self.assertTrue(search.exhausted())
+        self.assertEqual(search.status, 0)
+
+    def test_regex(self):
+        """Test that -G finds changed lines that match a regex."""
+        search, summaries = self.search('needles$', mode=pickaxe.REGEX)
+        self.assertEqual(summaries, ['add needles'])
+
+    def test_cached(self):
+        """Test that repeating a search does not run git."""
+        first, expect = self.search('needle')
+        search, summaries = self.search('needle')
+        self.assertTrue(search.cached)
+        self.assertEqual(summaries, expect)
+
+    def test_incremental(self):
+        """Test that only new commits are searched after a commit."""
+        self.search('needle')
+        self.shell("""
+            echo needle > A &&
+            git commit -m 'restore needle' A > /dev/null
+        """)
+        search, summaries = self.search('needle')
+        self.assertFalse(search.cached)
+        self.assertEqual(summaries, ['restore needle', 'remove needle',
+                                     'add needles', 'add needle'])
+
+    def test_rewritten(self):
+        """Test that rewritten history is searched again."""
+        self.search('needle')
+        self.shell('git commit --amend -m "drop needle" > /dev/null')
+        search, summaries = self.search('needle')
+        self.assertEqual(summaries,
+                         ['drop needle', 'add needles', 'add needle'])
+
+    def test_refine(self):
+        """Test that a longer -G query only examines previous matches."""
+        self.search('needle', mode=pickaxe.REGEX)
+        self.assertEqual(self.cache.refinable('needles', gitcmds.ref_tips()),
+                         self.cache.get(pickaxe.REGEX, 'needle')[1])
+        self.assertEqual(self.cache.refinable('needle.', gitcmds.ref_tips()),
+                         None)
+        search, summaries = self.search('needles', mode=pickaxe.REGEX)
+        self.assertEqual(summaries, ['add needles'])
+
+    def test_limit(self):
+        """Test that incomplete searches are not cached."""
+        search, summaries = self.search('needle', limit=1)
+        self.assertEqual(summaries, ['remove needle'])
+        self.assertFalse(search.exhausted())
+        self.assertEqual(self.cache.get(pickaxe.STRING, 'needle'), None)
+
+    def test_limit_stops_git(self):
+        """Test that git is stopped once the limit is reached."""
+        procs = []
+        start_command = utils.start_command
+
+        def start(*args, **kwargs):
+            proc = start_command(*args, **kwargs)
+            procs.append(proc)
+            return proc
+        utils.start_command = start
+        try:
+            self.search('needle', limit=1)
+        finally:
+            utils.start_command = start_command
+        self.assertEqual(len(procs), 1)
+        self.assertNotEqual(procs[0].returncode, None)
+
+    def test_cancel(self):
+        """Test that a cancelled search stops reading."""
+        search = pickaxe.PickaxeSearch('needle', cache=self.cache)
+        for batch in search.read(100, batch_size=1):
+            search.cancel()
+        self.assertEqual(search.count, 1)
+        self.assertEqual(self.cache.get(pickaxe.STRING, 'needle'), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""Tests the cola.models.snapshot module."""
+import unittest
+
+import helper
+from cola.models import snapshot
+
+
+class RepoSnapshotTestCase(helper.GitRepositoryTestCase):
+    """Tests the refresh-scoped repository listings."""
+
+    def setUp(self):
+        helper.GitRepositoryTestCase.setUp(self)
+        self.snapshot = snapshot.RepoSnapshot()
+
+    def test_everything(self):
+        """Test that tracked and untracked files are merged in order."""
+        self.shell('touch 0-untracked C-untracked')
+        self.assertEqual(self.snapshot.everything(),
+                         ('0-untracked', 'A', 'B', 'C-untracked'))
+        self.assertEqual(self.snapshot.all_files(), ('A', 'B'))
+        self.assertEqual(self.snapshot.untracked_files(),
+                         ('0-untracked', 'C-untracked'))
+
+    def test_shared_strings(self):
+        """Test that overlapping listings share string objects."""
+        everything = self.snapshot.everything()
+        all_files = self.snapshot.all_files()
+        self.assertTrue(everything[0] is all_files[0])
+
+    def test_cached_until_invalidated(self):
+        """Test that listings are reused until invalidate() is called."""
+        version = self.snapshot.version
+        self.assertEqual(self.snapshot.branch_list(), ('master',))
+        self.shell('git branch topic')
+        self.assertEqual(self.snapshot.branch_list(), ('master',))
+
+        self.snapshot.invalidate()
+        self.assertEqual(self.snapshot.version, version + 1)
+        self.assertEqual(self.snapshot.branch_list(), ('master', 'topic'))
+
+    def test_all_refs(self):
+        """Test the combined and split ref listings."""
+        self.shell("""
+            git branch b &&
+            git tag d &&
+            git tag e
+        """)
+        self.assertEqual(self.snapshot.all_refs(),
+                         ('b', 'master', 'd', 'e'))
+        self.assertEqual(self.snapshot.all_refs(split=True),
+                         (('b', 'master'), (), ('d', 'e')))
+        self.assertEqual(self.snapshot.tag_list(), ('e', 'd'))
+
+
+if __name__ == '__main__':
+    unittest.main()
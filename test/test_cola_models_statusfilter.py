@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Tests the cola.models.statusfilter module."""
+
+import unittest
+
+from cola.models.statusfilter import StatusFilter
+from cola.models.statusfilter import is_glob
+
+
+class StatusFilterTestCase(unittest.TestCase):
+    """Tests filtering status lists by path."""
+
+    def setUp(self):
+        self.paths = ['README', 'cola/git.py', 'cola/widgets/grep.py',
+                      'share/doc/Git.txt', 'test/test_cola_git.py']
+        self.filter = StatusFilter(self.paths)
+
+    def test_is_glob(self):
+        """Test detecting glob patterns."""
+        self.assertTrue(is_glob('*.py'))
+        self.assertTrue(is_glob('test_[ab]'))
+        self.assertFalse(is_glob('cola/git'))
+
+    def test_substring(self):
+        """Test case-insensitive substring filters."""
+        self.assertEqual(self.filter.filter('git', self.paths),
+                         ['cola/git.py', 'share/doc/Git.txt',
+                          'test/test_cola_git.py'])
+
+    def test_refined_substring(self):
+        """Test that extending a filter narrows the previous matches."""
+        self.assertEqual(len(self.filter.filter('gi', self.paths)), 3)
+        self.assertEqual(self.filter.filter('git.p', self.paths),
+                         ['cola/git.py', 'test/test_cola_git.py'])
+        self.assertEqual(self.filter.filter('re', self.paths),
+                         ['README', 'cola/widgets/grep.py',
+                          'share/doc/Git.txt'])
+
+    def test_glob_basename(self):
+        """Test that globs without a slash match basenames."""
+        self.assertEqual(self.filter.filter('g*.py', self.paths),
+                         ['cola/git.py', 'cola/widgets/grep.py'])
+
+    def test_glob_path(self):
+        """Test globs that contain a slash."""
+        self.assertEqual(self.filter.filter('cola/*', self.paths),
+                         ['cola/git.py', 'cola/widgets/grep.py'])
+        self.assertEqual(self.filter.filter('doc/*.txt', self.paths),
+                         ['share/doc/Git.txt'])
+
+    def test_filter_keeps_order(self):
+        """Test that the order of the status list is kept."""
+        paths = ['test/test_cola_git.py', 'cola/git.py']
+        self.assertEqual(self.filter.filter('git.py', paths), paths)
+
+    def test_empty_filter(self):
+        """Test that an empty filter matches everything."""
+        self.assertEqual(self.filter.filter('', self.paths), self.paths)
+
+
+if __name__ == '__main__':
+    unittest.main()
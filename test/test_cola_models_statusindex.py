@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+"""Tests the cola.models.statusindex module."""
+
+import unittest
+
+from cola.models import statusindex
+from cola.models.statusindex import StatusIndex
+
+
+class StatusIndexTestCase(unittest.TestCase):
+    """Tests status lookups for paths and directories."""
+
+    def setUp(self):
+        self.index = StatusIndex(staged=['a/b/staged', 'both'],
+                                 modified=['a/modified', 'both'],
+                                 untracked=['new/dir/file'],
+                                 upstream_changed=['upstream'])
+
+    def test_files(self):
+        """Test the flags of individual files."""
+        self.assertEqual(self.index.status('a/b/staged'), statusindex.STAGED)
+        self.assertEqual(self.index.status('both'),
+                         statusindex.STAGED | statusindex.MODIFIED)
+        self.assertEqual(self.index.status('unchanged'), 0)
+
+    def test_directories(self):
+        """Test that directories aggregate their contents' flags."""
+        self.assertEqual(self.index.status('a'),
+                         statusindex.STAGED | statusindex.MODIFIED)
+        self.assertEqual(self.index.status('a/b'), statusindex.STAGED)
+        self.assertTrue(self.index.has('new', statusindex.UNTRACKED))
+        self.assertFalse(self.index.has('new', statusindex.STAGED))
+
+    def test_rows(self):
+        """Test the rows of paths within their status lists."""
+        self.assertEqual(self.index.row(statusindex.STAGED, 'both'), 1)
+        self.assertEqual(self.index.row(statusindex.MODIFIED, 'both'), 1)
+        self.assertEqual(self.index.row(statusindex.STAGED, 'a'), None)
+
+    def test_paths(self):
+        """Test listing paths with local changes."""
+        self.assertEqual(self.index.paths(),
+                         set(['a', 'a/b', 'a/b/staged', 'a/modified', 'both',
+                              'new', 'new/dir', 'new/dir/file']))
+
+
+if __name__ == '__main__':
+    unittest.main()
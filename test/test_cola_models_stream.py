@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""Tests the cola.models.stream module."""
+
+import os
+import time
+import unittest
+
+from cola.models import stream
+
+
+class LineReaderTestCase(unittest.TestCase):
+    """Tests reading lines with a timeout."""
+
+    def setUp(self):
+        read_fd, self.write_fd = os.pipe()
+        self.fh = os.fdopen(read_fd, 'rb')
+        self.reader = stream.LineReader(self.fh)
+
+    def tearDown(self):
+        if self.write_fd is not None:
+            os.close(self.write_fd)
+        self.reader.close()
+
+    def test_timeout(self):
+        """Test that readline() returns None while the writer is quiet."""
+        self.assertEqual(self.reader.readline(0.01), None)
+        os.write(self.write_fd, 'line\n')
+        self.assertEqual(self.reader.readline(1.0), 'line\n')
+        self.assertEqual(self.reader.readline(0.01), None)
+
+    def test_end(self):
+        """Test that the end of the file is reported once."""
+        os.write(self.write_fd, 'last\n')
+        os.close(self.write_fd)
+        self.write_fd = None
+        self.assertEqual(self.reader.readline(1.0), 'last\n')
+        self.assertEqual(self.reader.readline(1.0), '')
+
+
+class BatchedTestCase(unittest.TestCase):
+    """Tests grouping values into batches."""
+
+    def test_batch_size(self):
+        """Test that full batches are delivered."""
+        batches = list(stream.batched(iter(range(5)), 2, 60))
+        self.assertEqual(batches, [[0, 1], [2, 3], [4]])
+
+    def test_sparse_values(self):
+        """Test that a pending batch is delivered while nothing arrives."""
+        delivered = []
+
+        def items():
+            yield 'sparse'
+            while not delivered:
+                time.sleep(0.01)
+                yield None
+            yield 'next'
+
+        for batch in stream.batched(items(), 100, 0.05):
+            delivered.append(batch)
+        self.assertEqual(delivered, [['sparse'], ['next']])
+
+
+if __name__ == '__main__':
+    unittest.main()
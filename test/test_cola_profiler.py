@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""Tests the cola.profiler module."""
+
+import os
+import sys
+import tempfile
+import unittest
+from cStringIO import StringIO
+
+from cola import profiler
+
+
+class ProfilerTestCase(unittest.TestCase):
+    """Tests recording the startup profile."""
+
+    def setUp(self):
+        sys.modules.pop('colorsys', None)
+        profiler.enable()
+
+    def tearDown(self):
+        profiler.disable()
+
+    def test_import(self):
+        """Test that imports of new modules are recorded."""
+        import colorsys
+        names = [name for kind, name, depth, elapsed in profiler.events()
+                 if kind == 'import']
+        self.assertTrue('import colorsys' in names)
+
+    def test_steps(self):
+        """Test that construction steps are recorded and reported."""
+        profiler.begin('outer')
+        profiler.begin('inner')
+        profiler.end('inner')
+        profiler.end('outer')
+        steps = [(name, depth)
+                 for kind, name, depth, elapsed in profiler.events()
+                 if kind == 'build']
+        self.assertEqual(steps[-2:], [('outer', 0), ('inner', 1)])
+        fh = StringIO()
+        profiler.report(fh)
+        self.assertTrue('  inner\n' in fh.getvalue())
+        self.assertTrue('total startup time' in fh.getvalue())
+
+    def test_disable(self):
+        """Test that the import hook is removed."""
+        profiler.disable()
+        self.assertFalse(profiler.enabled())
+        import __builtin__
+        self.assertFalse(__builtin__.__import__ is profiler._profiled_import)
+
+
+class MilestoneTestCase(unittest.TestCase):
+    """Tests recording startup milestones."""
+
+    def test_milestones(self):
+        """Test that only the first time a milestone is reached counts."""
+        profiler.milestone('test_first')
+        first = dict(profiler.milestones())['test_first']
+        profiler.milestone('test_first')
+        self.assertTrue(profiler.reached('test_first'))
+        self.assertFalse(profiler.reached('test_missing'))
+        self.assertEqual(dict(profiler.milestones())['test_first'], first)
+
+    def test_write_milestones(self):
+        """Test that milestones are written as JSON."""
+        profiler.milestone('test_written')
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            profiler.write_milestones(path)
+            fh = open(path)
+            try:
+                values = profiler.json.load(fh)
+            finally:
+                fh.close()
+        finally:
+            os.unlink(path)
+        names = [entry['name'] for entry in values['milestones']]
+        self.assertTrue('test_written' in names)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -42,6 +42,64 @@ class ColaUtilsTestCase(unittest.TestCase):
         self.assertTrue('foo/bar' in path_set)
         self.assertTrue('foo' in path_set)
 
+    def test_list_diff(self):
+        """Test the utils.list_diff() function."""
+        old = ['a', 'b', 'c', 'e']
+        new = ['b', 'c', 'd', 'e', 'f']
+        removals, insertions = utils.list_diff(old, new)
+        self.assertEqual(removals, [0])
+        self.assertEqual(insertions, [(2, 'd'), (4, 'f')])
+
+        result = list(old)
+        for idx in reversed(removals):
+            del result[idx]
+        for idx, item in insertions:
+            result.insert(idx, item)
+        self.assertEqual(result, new)
+
+    def test_file_type(self):
+        """Test that cached file types match the uncached lookup."""
+        for name in ('a.py', 'dir.d/b.PNG', 'c.tar.gz', 'foo.c',
+                     'Makefile', '.gitignore', 'a.py'):
+            self.assertEqual(utils.file_type(name),
+                             utils.guess_file_type(name))
+
+    def test_file_type_lru(self):
+        """Test that names without an extension are bounded."""
+        for idx in range(utils.FILE_TYPE_CACHE_SIZE + 10):
+            utils.file_type('name%d' % idx)
+        self.assertEqual(len(utils._file_type_names),
+                         utils.FILE_TYPE_CACHE_SIZE)
+        self.assertEqual(len(utils._file_types_by_name),
+                         utils.FILE_TYPE_CACHE_SIZE)
+        self.assertTrue('name0' not in utils._file_types_by_name)
+
+    def test_list_diff_reordered(self):
+        """Test that utils.list_diff() rejects reordered items."""
+        self.assertEqual(utils.list_diff(['a', 'b'], ['b', 'a']), None)
+
+    def test_changed_values(self):
+        """Test that only items whose value changed are reported."""
+        exists = set(['a', 'b'])
+        icon = lambda x: x in exists and 'staged' or 'removed'
+        cache = {}
+        self.assertEqual(utils.changed_values(['a', 'b'], cache, icon),
+                         [(0, 'staged'), (1, 'staged')])
+        self.assertEqual(utils.changed_values(['a', 'b'], cache, icon), [])
+        # A staged file is deleted from the worktree and then restored
+        exists.remove('b')
+        self.assertEqual(utils.changed_values(['a', 'b'], cache, icon),
+                         [(1, 'removed')])
+        exists.add('b')
+        self.assertEqual(utils.changed_values(['b', 'c'], cache, icon),
+                         [(0, 'staged'), (1, 'removed')])
+        self.assertEqual(sorted(cache.keys()), ['b', 'c'])
+
+    def test_lazy_callable(self):
+        """Test that lazy callables import their module when called."""
+        dirname = utils.lazy_callable('posixpath', 'dirname')
+        self.assertEqual(dirname('a/b'), 'a')
+
 
 class WordWrapTestCase(unittest.TestCase):
     def setUp(self):